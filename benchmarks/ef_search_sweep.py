@@ -0,0 +1,98 @@
+"""Curva recall x latência do índice HNSW do Chroma para vários valores de ef_search
+
+A verdade de referência é a busca exata (força bruta com NumPy) sobre os mesmos vetores.
+Com vetores sintéticos (padrão) ou com os embeddings da coleção persistida:
+    python -m benchmarks.ef_search_sweep --vectors 100000 --dim 384
+    python -m benchmarks.ef_search_sweep --from-collection --distance cosine
+"""
+import argparse
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from benchmarks.load_test import percentile
+from src.config import settings
+from src.vector_index import DISTANCES, collection_metadata, set_ef_search
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Índices dos k vizinhos exatos de cada consulta"""
+    if space == "l2":
+        scores = -((queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :])
+    elif space == "cosine":
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.from_collection:
+        client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIRECTORY)
+        data = client.get_collection(settings.CHROMA_COLLECTION_NAME).get(include=["embeddings"])
+        return np.asarray(data["embeddings"], dtype=np.float32)
+    rng = np.random.default_rng(args.seed)
+    # Vetores agrupados, mais próximos de embeddings reais do que ruído uniforme
+    centers = rng.normal(size=(max(1, args.vectors // 100), args.dim))
+    vectors = centers[rng.integers(0, len(centers), args.vectors)] + 0.3 * rng.normal(size=(args.vectors, args.dim))
+    return vectors.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--from-collection", action="store_true", help="Usa os embeddings da coleção configurada")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=settings.CONTEXT_K)
+    parser.add_argument("--distance", choices=DISTANCES, default=settings.CHROMA_DISTANCE)
+    parser.add_argument("--m", type=int, default=settings.CHROMA_HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=settings.CHROMA_HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef-values", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    truth = exact_top_k(vectors, queries, args.k, args.distance)
+
+    path = tempfile.mkdtemp()
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection(
+        "ef-search-sweep",
+        metadata=collection_metadata(args.distance, args.m, args.ef_construction, max(args.ef_values)),
+        embedding_function=None,
+    )
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), 5000):
+        batch = vectors[offset:offset + 5000]
+        collection.add(ids=[str(i) for i in range(offset, offset + len(batch))], embeddings=batch)
+    print(f"{len(vectors)} vetores ({vectors.shape[1]} dim, {args.distance}, M={args.m}, "
+          f"ef_construction={args.ef_construction}) indexados em {time.perf_counter() - start:.1f}s")
+
+    print(f"{'ef_search':>9} {f'recall@{args.k}':>10} {'p50':>9} {'p95':>9}")
+    for ef_search in args.ef_values:
+        set_ef_search(collection, ef_search)
+        # O índice já carregado mantém o ef_search antigo; reabrir o cliente para aplicar o novo valor
+        SharedSystemClient.clear_system_cache()
+        collection = chromadb.PersistentClient(path=path).get_collection("ef-search-sweep")
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            begin = time.perf_counter()
+            result = collection.query(query_embeddings=[query], n_results=args.k, include=[])
+            latencies.append(time.perf_counter() - begin)
+            hits += len({int(i) for i in result["ids"][0]} & set(expected.tolist()))
+        recall = hits / (len(queries) * args.k)
+        print(f"{ef_search:>9} {recall:>10.3f} {percentile(latencies, 50) * 1000:>7.2f}ms "
+              f"{percentile(latencies, 95) * 1000:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Escalabilidade dos embeddings em múltiplos núcleos: no processo da aplicação x pool de processos
+
+Várias sessões (threads) calculam embeddings ao mesmo tempo, como num processo do Streamlit
+ou da API. No próprio processo, as sessões se revezam no GIL. Com o pool, o trabalho vai
+para os workers. Reporta a vazão (textos/s) e a latência p50/p95 de cada configuração.
+
+O modelo padrão é o configurado (sentence-transformers). --synthetic usa um modelo em Python
+puro, que segura o GIL o tempo todo e dispensa baixar o modelo:
+    python -m benchmarks.embedding_pool --workers 1,2,4 --sessions 8
+    python -m benchmarks.embedding_pool --synthetic --workers 1,2,4,8
+"""
+import argparse
+import functools
+import hashlib
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import settings
+from src.embedding_pool import EmbeddingPool, load_huggingface
+
+TEXTS = [
+    "A Terra orbita o Sol",
+    "Qual é a capital do Brasil?",
+    "A água ferve a 100°C ao nível do mar",
+    "Prefiro respostas formais e concisas",
+    "O que você sabe sobre a Lua?",
+    "A fotossíntese converte luz em energia química",
+    "Quantos planetas existem no Sistema Solar?",
+    "O Brasil tem 26 estados e um Distrito Federal",
+]
+
+
+class SyntheticEmbeddings:
+    """Modelo em Python puro com custo de CPU por texto (hashes encadeados)"""
+
+    def __init__(self, dimension: int = 384, rounds: int = 5000):
+        self.dimension = dimension
+        self.rounds = rounds
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            digest = text.encode("utf-8")
+            for _ in range(self.rounds):
+                digest = hashlib.sha256(digest).digest()
+            vectors.append([digest[i % len(digest)] / 255.0 for i in range(self.dimension)])
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def load_synthetic(dimension: int, rounds: int) -> SyntheticEmbeddings:
+    return SyntheticEmbeddings(dimension, rounds)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * (len(values) - 1)))]
+
+
+def run(embeddings, sessions: int, requests: int, batch: int):
+    """Cada requisição embute `batch` textos; retorna (segundos, latências)"""
+    def request(i):
+        texts = [TEXTS[(i + j) % len(TEXTS)] + f" #{i}.{j}" for j in range(batch)]
+        start = time.perf_counter()
+        embeddings.embed_documents(texts)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        latencies = list(executor.map(request, range(requests)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Números de workers do pool, separados por vírgula")
+    parser.add_argument("--sessions", type=int, default=8, help="Threads chamando o modelo ao mesmo tempo")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="Textos por requisição (1 = consulta)")
+    parser.add_argument("--synthetic", action="store_true", help="Modelo sintético em Python puro")
+    parser.add_argument("--rounds", type=int, default=5000, help="Custo do modelo sintético por texto (~5 ms)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        factory = functools.partial(load_synthetic, 384, args.rounds)
+    else:
+        factory = functools.partial(load_huggingface, settings.EMBEDDING_MODEL)
+
+    print(f"CPUs: {os.cpu_count()}; {args.sessions} sessões, {args.requests} requisições de {args.batch} texto(s)")
+    rows = []
+    in_process = factory()
+    in_process.embed_documents(TEXTS)  # aquecimento
+    rows.append(("no processo", *run(in_process, args.sessions, args.requests, args.batch)))
+    for workers in [int(value) for value in args.workers.split(",") if value.strip()]:
+        pool = EmbeddingPool(factory, workers=workers, threads_per_worker=settings.EMBEDDING_WORKER_THREADS)
+        try:
+            # Aquecimento: inicia os processos e carrega o modelo em todos os workers
+            run(pool, workers, workers * 2, 1)
+            rows.append((f"pool, {workers} worker(s)", *run(pool, args.sessions, args.requests, args.batch)))
+        finally:
+            pool.close()
+
+    baseline = args.requests * args.batch / rows[0][1]
+    print(f"{'configuração':<22} {'textos/s':>10} {'escala':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, seconds, latencies in rows:
+        throughput = args.requests * args.batch / seconds
+        print(f"{name:<22} {throughput:>10.1f} {throughput / baseline:>6.2f}x "
+              f"{statistics.median(latencies) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
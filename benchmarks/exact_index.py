@@ -0,0 +1,90 @@
+"""Latência de consulta do índice exato (NumPy) contra o Chroma (HNSW) para vários tamanhos
+
+Os dois recebem os mesmos vetores sintéticos; o tempo de embedding da consulta fica de fora.
+O recall do Chroma é medido contra o resultado exato.
+    python -m benchmarks.exact_index --sizes 1000 10000 100000 1000000 --dim 384
+"""
+import argparse
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from benchmarks.load_test import percentile
+from src.exact_index import ExactVectorStore
+from src.vector_index import collection_metadata
+
+CHROMA_BATCH = 5000
+
+
+def synthetic_vectors(size: int, dim: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((max(1, size // 100), dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)]
+    vectors += 0.3 * rng.standard_normal((size, dim), dtype=np.float32)
+    return vectors
+
+
+def timed_queries(search, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def report(name, size, build, latencies, recall=None):
+    recall_text = f"{recall:>8.3f}" if recall is not None else f"{'-':>8}"
+    print(f"{size:>9} {name:>7} {build:>9.1f}s {percentile(latencies, 50) * 1000:>8.2f}ms "
+          f"{percentile(latencies, 95) * 1000:>8.2f}ms {recall_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--skip-chroma", action="store_true", help="Mede apenas o índice exato")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'vetores':>9} {'backend':>7} {'carga':>10} {'p50':>10} {'p95':>10} {'recall':>8}")
+    for size in args.sizes:
+        vectors = synthetic_vectors(size, args.dim, rng)
+        ids = [str(i) for i in range(size)]
+        queries = vectors[rng.integers(0, size, args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim))
+
+        start = time.perf_counter()
+        store = ExactVectorStore(None, tempfile.mkdtemp(prefix="exact-bench-"), initial_capacity=size)
+        for offset in range(0, size, CHROMA_BATCH):
+            store.add_embeddings(ids[offset:offset + CHROMA_BATCH], vectors[offset:offset + CHROMA_BATCH],
+                                 ids=ids[offset:offset + CHROMA_BATCH])
+        build = time.perf_counter() - start
+        latencies, exact = timed_queries(lambda q: {row for row, _ in store.search(q, args.k)}, queries)
+        report("exact", size, build, latencies)
+        store.close()
+
+        if args.skip_chroma:
+            continue
+        client = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="chroma-bench-"))
+        # Mesma métrica do índice exato (cosseno) para que o recall seja comparável
+        collection = client.create_collection(
+            "bench", metadata=collection_metadata("cosine", 16, 100, 100), embedding_function=None
+        )
+        start = time.perf_counter()
+        for offset in range(0, size, CHROMA_BATCH):
+            collection.add(ids=ids[offset:offset + CHROMA_BATCH], embeddings=vectors[offset:offset + CHROMA_BATCH])
+        build = time.perf_counter() - start
+        latencies, approximate = timed_queries(
+            lambda q: {int(i) for i in collection.query(query_embeddings=[q], n_results=args.k, include=[])["ids"][0]},
+            queries,
+        )
+        recall = sum(len(a & e) for a, e in zip(approximate, exact)) / (len(queries) * args.k)
+        report("chroma", size, build, latencies, recall)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Teste de carga do pipeline completo contra o LLM falso, sem acesso à rede
+
+Uso:
+    python -m benchmarks.load_test --workers 8 --messages 200 --mean-ms 300 --error-rate 0.02
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MESSAGES = [
+    "A Terra orbita o Sol",
+    "Qual é a capital do Brasil?",
+    "Prefiro respostas formais e concisas",
+    "Gostei muito da sua resposta",
+    "A água ferve a 100°C ao nível do mar",
+    "O que você sabe sobre a Terra?",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--latency", default="lognormal")
+    parser.add_argument("--mean-ms", type=float, default=300.0)
+    parser.add_argument("--stddev-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # As configurações são lidas na importação, então o ambiente é preparado antes
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": args.latency,
+        "FAKE_LLM_MEAN_MS": str(args.mean_ms),
+        "FAKE_LLM_STDDEV_MS": str(args.stddev_ms),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "CHROMA_PERSIST_DIRECTORY": tempfile.mkdtemp(prefix="chatbot-load-"),
+    })
+    from src.chatbot import Chatbot
+
+    chatbot = Chatbot()
+
+    def send(i):
+        start = time.perf_counter()
+        result = chatbot.process_message(MESSAGES[i % len(MESSAGES)])
+        return time.perf_counter() - start, result.get("error")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(send, range(args.messages)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, error in results if error)
+    print(f"mensagens: {args.messages}  workers: {args.workers}  duração: {elapsed:.2f}s")
+    print(f"vazão: {args.messages / elapsed:.1f} msg/s  erros: {errors} ({errors / args.messages:.1%})")
+    print(f"latência média: {statistics.mean(latencies) * 1000:.0f}ms  "
+          f"p50: {percentile(latencies, 50) * 1000:.0f}ms  "
+          f"p95: {percentile(latencies, 95) * 1000:.0f}ms  "
+          f"p99: {percentile(latencies, 99) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
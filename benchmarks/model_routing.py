@@ -0,0 +1,62 @@
+"""Compara a latência por nó entre o modelo padrão e o modelo roteado de cada nó
+
+Usa o backend configurado (Groq, endpoint OpenAI ou LLM falso). Exemplo com Groq:
+    PROCESS_INPUT_MODEL=llama-3.1-8b-instant VALIDATE_FACT_MODEL=llama-3.1-8b-instant \\
+        python -m benchmarks.model_routing --runs 20
+"""
+import argparse
+import statistics
+import time
+
+from langchain.schema.messages import HumanMessage
+
+from src.chatbot import Chatbot, LLM_NODES
+from src.config import settings
+from src.llm import invoke_with_prefix
+from src.prompts import build_prefixes
+
+SAMPLE_INPUTS = {
+    "process_input": ["A Terra orbita o Sol", "Qual é a capital do Brasil?", "Prefiro respostas formais"],
+    "validate_fact": ["A água ferve a 100°C ao nível do mar", "Eu adoro chocolate"],
+    "update_preferences": ["Quero respostas formais e concisas", "Gosto de explicações detalhadas"],
+}
+
+
+def measure(llm, prefix, inputs, runs):
+    latencies = []
+    for i in range(runs):
+        message = HumanMessage(content=inputs[i % len(inputs)])
+        start = time.perf_counter()
+        invoke_with_prefix(llm, prefix, [message])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--nodes", nargs="*", default=list(SAMPLE_INPUTS))
+    args = parser.parse_args()
+
+    prefixes = build_prefixes()
+    baseline = Chatbot.create_llm(settings.MODEL_NAME)
+    print(f"{'nó':<20} {'modelo':<28} {'max_tokens':>10} {'p50 base':>9} {'p50 rot.':>9} "
+          f"{'p95 base':>9} {'p95 rot.':>9} {'economia p50':>13}")
+    for node in args.nodes:
+        if node not in LLM_NODES or node not in SAMPLE_INPUTS:
+            raise SystemExit(f"Nó sem amostras de entrada: {node}")
+        model_name = getattr(settings, f"{node.upper()}_MODEL") or settings.MODEL_NAME
+        max_tokens = getattr(settings, f"{node.upper()}_MAX_TOKENS") or None
+        routed = Chatbot.create_llm(model_name, max_tokens)
+
+        base_p50, base_p95 = measure(baseline, prefixes[node], SAMPLE_INPUTS[node], args.runs)
+        routed_p50, routed_p95 = measure(routed, prefixes[node], SAMPLE_INPUTS[node], args.runs)
+        saving = base_p50 - routed_p50
+        print(f"{node:<20} {model_name:<28} {str(max_tokens):>10} {base_p50 * 1000:>7.0f}ms {routed_p50 * 1000:>7.0f}ms "
+              f"{base_p95 * 1000:>7.0f}ms {routed_p95 * 1000:>7.0f}ms "
+              f"{saving * 1000:>7.0f}ms ({saving / base_p50:.0%})")
+
+
+if __name__ == "__main__":
+    main()
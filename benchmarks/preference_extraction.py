@@ -0,0 +1,136 @@
+"""Compara a extração local de preferências com a extração pelo LLM num corpus rotulado
+
+Reporta a exatidão de cada caminho em relação aos rótulos, a concordância entre os dois,
+a fração de entradas enviadas ao LLM pelo caminho local (confiança baixa) e a latência.
+Usa o backend configurado (Groq, endpoint OpenAI ou LLM falso); --local-only dispensa o LLM:
+    python -m benchmarks.preference_extraction
+    python -m benchmarks.preference_extraction --local-only
+"""
+import argparse
+import statistics
+import time
+
+from langchain.schema.messages import HumanMessage
+
+from src.chatbot import Chatbot
+from src.config import settings
+from src.llm import invoke_with_prefix
+from src.preferences import extract_preferences, parse_llm_preferences
+from src.prompts import build_prefixes
+
+# Mensagem e preferências esperadas (apenas as mencionadas)
+LABELLED = [
+    ("Prefiro um tom mais formal", {"tom": "formal"}),
+    ("Gosto de explicações detalhadas", {"verbosidade": "detalhada"}),
+    ("Quero respostas formais e concisas", {"tom": "formal", "verbosidade": "concisa"}),
+    ("Gosto de matemática", {}),
+    ("Seja mais breve, por favor", {"verbosidade": "concisa"}),
+    ("Pode responder de forma bem curta", {"verbosidade": "concisa"}),
+    ("Prefiro respostas resumidas e diretas ao ponto", {"verbosidade": "concisa"}),
+    ("Quero respostas mais completas e aprofundadas", {"verbosidade": "detalhada"}),
+    ("Me dê mais detalhes nas respostas", {"verbosidade": "detalhada"}),
+    ("Nem muito curto nem muito longo", {"verbosidade": "balanceada"}),
+    ("Prefiro respostas equilibradas", {"verbosidade": "balanceada"}),
+    ("Use um tom casual comigo", {"tom": "casual"}),
+    ("Pode ser mais descontraído", {"tom": "casual"}),
+    ("Fale de um jeito mais leve e amigável", {"tom": "casual"}),
+    ("Não seja tão formal", {"tom": "casual"}),
+    ("Menos detalhes, por favor", {"verbosidade": "concisa"}),
+    ("Evite respostas longas", {"verbosidade": "concisa"}),
+    ("Prefiro que fale de maneira informal", {"formalidade": "informal"}),
+    ("Pode usar gírias, sem formalidades", {"formalidade": "informal"}),
+    ("Use linguagem formal e norma culta", {"tom": "formal", "formalidade": "formal"}),
+    ("Me trate por senhor", {"formalidade": "formal"}),
+    ("Quero um tom profissional e respostas objetivas", {"tom": "formal", "verbosidade": "concisa"}),
+    ("Prefiro um estilo sério e detalhado", {"tom": "formal", "verbosidade": "detalhada"}),
+    ("Responda de forma sucinta", {"verbosidade": "concisa"}),
+    ("Gostaria de respostas extensas e minuciosas", {"verbosidade": "detalhada"}),
+    ("Quero respostas casuais e informais", {"tom": "casual", "formalidade": "informal"}),
+    ("Prefiro um meio-termo no tamanho das respostas", {"verbosidade": "balanceada"}),
+    ("Escreva formalmente", {"tom": "formal"}),
+    ("Quero conversar de forma coloquial", {"formalidade": "informal"}),
+    ("Explique tudo com bastante profundidade", {"verbosidade": "detalhada"}),
+    ("Vá direto ao assunto, sem enrolação", {"verbosidade": "concisa"}),
+    ("Prefiro que você seja mais caloroso", {"tom": "casual"}),
+    ("Seja breve mas detalhado nos números", {"verbosidade": "balanceada"}),
+    ("Eu gosto de café", {}),
+]
+
+
+def local_extract(text):
+    extraction = extract_preferences(text)
+    return extraction.preferences, extraction.confidence
+
+
+def llm_extract(llm, prefix, text):
+    result = invoke_with_prefix(llm, prefix, [HumanMessage(content=text)])
+    return parse_llm_preferences(result.content) or {}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[int(p * (len(values) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-confidence", type=float, default=settings.PREFERENCE_MIN_CONFIDENCE)
+    parser.add_argument("--local-only", action="store_true", help="Não chama o LLM")
+    args = parser.parse_args()
+
+    llm = None if args.local_only else Chatbot.create_llm(
+        settings.UPDATE_PREFERENCES_MODEL or settings.MODEL_NAME, settings.UPDATE_PREFERENCES_MAX_TOKENS or None
+    )
+    prefix = build_prefixes()["update_preferences"]
+    rows = []
+    for text, expected in LABELLED:
+        (local, confidence), local_seconds = timed(local_extract, text)
+        row = {"text": text, "expected": expected, "local": local, "confidence": confidence,
+               "local_seconds": local_seconds}
+        if llm is not None:
+            row["llm"], row["llm_seconds"] = timed(llm_extract, llm, prefix, text)
+        rows.append(row)
+
+    n = len(rows)
+    confident = [row for row in rows if row["confidence"] >= args.min_confidence]
+    print(f"Corpus: {n} mensagens rotuladas; limite de confiança {args.min_confidence}")
+    print(f"Local (todas):          exatidão {sum(r['local'] == r['expected'] for r in rows) / n:.0%}")
+    print(f"Local (confiança alta): exatidão {sum(r['local'] == r['expected'] for r in confident) / max(1, len(confident)):.0%} "
+          f"em {len(confident)} mensagens; {1 - len(confident) / n:.0%} vão ao LLM")
+    local_latencies = [row["local_seconds"] for row in rows]
+    print(f"Latência local: p50 {statistics.median(local_latencies) * 1e6:.0f}µs, "
+          f"p95 {percentile(local_latencies, 0.95) * 1e6:.0f}µs")
+    if llm is None:
+        for row in rows:
+            if row["local"] != row["expected"]:
+                print(f"  divergência: {row['text']!r}: local={row['local']} esperado={row['expected']} "
+                      f"(confiança {row['confidence']})")
+        return
+
+    # Caminho híbrido: local quando confiante, LLM caso contrário
+    hybrid = [(row["local"] if row["confidence"] >= args.min_confidence else row["llm"]) for row in rows]
+    llm_latencies = [row["llm_seconds"] for row in rows]
+    hybrid_latencies = [
+        row["local_seconds"] + (0 if row["confidence"] >= args.min_confidence else row["llm_seconds"]) for row in rows
+    ]
+    print(f"LLM:                    exatidão {sum(r['llm'] == r['expected'] for r in rows) / n:.0%}")
+    print(f"Híbrido:                exatidão {sum(h == r['expected'] for h, r in zip(hybrid, rows)) / n:.0%}")
+    print(f"Concordância local x LLM: {sum(r['local'] == r['llm'] for r in rows) / n:.0%} "
+          f"(confiança alta: {sum(r['local'] == r['llm'] for r in confident) / max(1, len(confident)):.0%})")
+    print(f"Latência LLM:     p50 {statistics.median(llm_latencies) * 1000:.0f}ms, p95 {percentile(llm_latencies, 0.95) * 1000:.0f}ms")
+    print(f"Latência híbrida: p50 {statistics.median(hybrid_latencies) * 1000:.0f}ms, "
+          f"p95 {percentile(hybrid_latencies, 0.95) * 1000:.0f}ms; "
+          f"economia total {(sum(llm_latencies) - sum(hybrid_latencies)) * 1000:.0f}ms em {n} mensagens")
+    for row in rows:
+        if row["local"] != row["llm"]:
+            print(f"  divergência: {row['text']!r}: local={row['local']} (confiança {row['confidence']}) llm={row['llm']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Reproduz um trace de tráfego gravado (TRAFFIC_RECORD_ENABLED) contra a versão atual do Chatbot
+
+As mensagens chegam com o mesmo padrão do trace, comprimido N vezes. As chegadas não esperam
+as respostas anteriores (carga em malha aberta). Um pool de threads faz o papel dos workers do
+servidor. O LLM é o ReplayChatModel: ele responde com a latência gravada de cada nó e repete a
+intenção, a validação e as preferências da mensagem original. Tudo o mais (embeddings, vector
+store, memória, escalonador) é o código atual. Para cada velocidade, reporta:
+
+- vazão oferecida e obtida
+- espera na fila: da chegada prevista até um worker livre
+- latência total (p50/p95/p99) e a latência gravada para comparação
+- a capacidade estimada: a maior velocidade que atende o SLO sem acumular fila, e a vazão
+  máxima obtida nas velocidades saturadas
+
+Uso:
+    python -m benchmarks.replay data/traffic/trace-*.jsonl.gz --speeds 1,2,4,8 --concurrency 16
+    python -m benchmarks.replay trace.jsonl.gz --speeds 1,10 --synthetic-embeddings --limit 500
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def create_chatbot(embeddings):
+    """Chatbot com o LLM de replay em todos os nós"""
+    from src.chatbot import Chatbot
+    from src.fake_llm import ReplayChatModel
+
+    chatbot = Chatbot(embeddings=embeddings)
+    chatbot.llm = ReplayChatModel()
+    chatbot.node_llms = {node: ReplayChatModel(max_tokens=getattr(llm, "max_tokens", None))
+                         for node, llm in chatbot.node_llms.items()}
+    return chatbot
+
+
+def replay(chatbot, entries, speed: float, concurrency: int):
+    """Envia as mensagens nos instantes do trace divididos por speed; retorna as medições por mensagem"""
+    from src.fake_llm import replaying
+
+    first = entries[0]["t"]
+    results = []
+    lock = threading.Lock()
+
+    def send(entry, scheduled):
+        started = time.perf_counter()
+        with replaying(entry):
+            result = chatbot.process_message(
+                entry["input"], session_id=entry.get("session") or "default", namespace=entry.get("namespace")
+            )
+        finished = time.perf_counter()
+        with lock:
+            results.append({
+                "queue": started - scheduled,
+                "latency": finished - scheduled,
+                "error": bool(result.get("error")),
+                "degraded": bool(result.get("degraded")),
+                "finished": finished,
+            })
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as executor:
+        start = time.perf_counter()
+        for entry in entries:
+            scheduled = start + (entry["t"] - first) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, entry, scheduled)
+    return start, results
+
+
+def summarize(entries, speed, start, results, slo_ms):
+    span = (entries[-1]["t"] - entries[0]["t"]) / speed
+    elapsed = max(result["finished"] for result in results) - start
+    latencies = [result["latency"] for result in results]
+    queue = [result["queue"] for result in results]
+    offered = len(entries) / span if span > 0 else float("inf")
+    achieved = len(results) / elapsed
+    p95 = percentile(latencies, 95)
+    return {
+        "speed": speed,
+        "offered": offered,
+        "achieved": achieved,
+        "queue_p50": percentile(queue, 50),
+        "queue_p95": percentile(queue, 95),
+        "p50": percentile(latencies, 50),
+        "p95": p95,
+        "p99": percentile(latencies, 99),
+        "errors": sum(result["error"] for result in results) / len(results),
+        "degraded": sum(result["degraded"] for result in results) / len(results),
+        # Dentro da capacidade: p95 (com a fila) no SLO e a vazão acompanha a chegada (o final do
+        # trace ainda em processamento reduz um pouco a vazão obtida em traces curtos)
+        "ok": p95 * 1000 <= slo_ms and achieved >= 0.8 * offered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+", help="Arquivos de trace (.jsonl ou .jsonl.gz)")
+    parser.add_argument("--speeds", default="1,2,4", help="Fatores de aceleração, separados por vírgula")
+    parser.add_argument("--concurrency", type=int, default=16, help="Mensagens processadas ao mesmo tempo")
+    parser.add_argument("--limit", type=int, default=0, help="Reproduz apenas as primeiras N mensagens")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="Latência p95 aceitável")
+    parser.add_argument("--synthetic-embeddings", action="store_true",
+                        help="Modelo de embeddings sintético (não baixa o sentence-transformers)")
+    args = parser.parse_args()
+
+    # As configurações são lidas na importação, então o ambiente é preparado antes
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "TRAFFIC_RECORD_ENABLED": "false",
+        "HEDGE_ENABLED": "false",
+        "SPECULATIVE_FACT_RESPONSES": "false",
+        "SESSION_OFFLOAD_DIRECTORY": tempfile.mkdtemp(prefix="chatbot-replay-sessions-"),
+    })
+    from src.config import settings
+    from src.traffic import read_trace
+
+    entries = read_trace(args.traces)
+    if args.limit:
+        entries = entries[:args.limit]
+    if len(entries) < 2:
+        parser.error("O trace precisa de ao menos duas mensagens")
+    recorded = [entry["seconds"] for entry in entries]
+    span = entries[-1]["t"] - entries[0]["t"]
+    print(f"Trace: {len(entries)} mensagens em {span:.1f}s ({len(entries) / span:.2f} msg/s); "
+          f"latência gravada p50 {percentile(recorded, 50) * 1000:.0f}ms, p95 {percentile(recorded, 95) * 1000:.0f}ms")
+
+    embeddings = None
+    if args.synthetic_embeddings:
+        from benchmarks.embedding_pool import SyntheticEmbeddings
+        embeddings = SyntheticEmbeddings()
+
+    rows = []
+    for speed in [float(value) for value in args.speeds.split(",") if value.strip()]:
+        # Coleção e memória novas a cada velocidade, como na gravação
+        settings.CHROMA_PERSIST_DIRECTORY = tempfile.mkdtemp(prefix="chatbot-replay-")
+        settings.EXACT_INDEX_DIRECTORY = tempfile.mkdtemp(prefix="chatbot-replay-exact-")
+        chatbot = create_chatbot(embeddings)
+        try:
+            start, results = replay(chatbot, entries, speed, args.concurrency)
+        finally:
+            chatbot.close()
+        rows.append(summarize(entries, speed, start, results, args.slo_ms))
+
+    print(f"{'vel.':>5} {'oferecida':>10} {'obtida':>8} {'fila p50':>9} {'fila p95':>9} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'erros':>6} {'degr.':>6}")
+    for row in rows:
+        print(f"{row['speed']:>4g}x {row['offered']:>8.2f}/s {row['achieved']:>6.2f}/s "
+              f"{row['queue_p50'] * 1000:>7.0f}ms {row['queue_p95'] * 1000:>7.0f}ms "
+              f"{row['p50'] * 1000:>5.0f}ms {row['p95'] * 1000:>5.0f}ms {row['p99'] * 1000:>5.0f}ms "
+              f"{row['errors']:>6.1%} {row['degraded']:>6.1%}{'' if row['ok'] else '  acima da capacidade'}")
+    within = [row for row in rows if row["ok"]]
+    if within:
+        best = max(within, key=lambda row: row["speed"])
+        print(f"Capacidade estimada: ao menos {best['achieved']:.2f} msg/s ({best['speed']:g}x o tráfego gravado) "
+              f"com p95 dentro de {args.slo_ms:.0f}ms e {args.concurrency} mensagens simultâneas")
+    saturated = [row for row in rows if row["achieved"] < 0.8 * row["offered"]]
+    if saturated:
+        print(f"Saturação: vazão máxima obtida {max(row['achieved'] for row in saturated):.2f} msg/s")
+    if not within:
+        print(f"Nenhuma velocidade atende o SLO de {args.slo_ms:.0f}ms com {args.concurrency} mensagens simultâneas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# Configuração do Gunicorn para a API do Chatbot (src/api.py)
+import os
+
+# O modelo de embeddings é carregado no processo mestre e herdado pelos workers via fork
+# (copy-on-write); ChromaDB e o cliente do LLM são criados em cada worker.
+#
+# Um worker por padrão. Cada worker mantém em memória as próprias sessões (a mensagem seguinte de
+# uma sessão pode cair em um worker sem o histórico), abre o próprio ChromaDB embutido sobre o mesmo
+# diretório (o modo embutido não suporta vários processos escrevendo) e roda as próprias threads
+# de validação e de camadas, reenfileirando os mesmos fatos pendentes. Mais de um worker exige, no
+# mínimo, sessões presas a um worker no balanceador (sticky sessions) e aceita esses limites.
+os.environ.setdefault("API_PRELOAD_EMBEDDINGS", "1")
+preload_app = True
+
+bind = os.environ.get("API_BIND", "0.0.0.0:8080")
+workers = int(os.environ.get("API_WORKERS", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+graceful_timeout = 30
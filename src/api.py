@@ -0,0 +1,229 @@
+"""API HTTP (ASGI) do Chatbot, para uso por outros serviços
+
+Execução com um worker:
+    uvicorn src.api:app --port 8080
+
+Com o gunicorn, que pré-carrega o modelo de embeddings (um worker por padrão; ver gunicorn.conf.py
+para os limites de vários workers):
+    gunicorn -c gunicorn.conf.py src.api:app
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool
+
+from src.config import settings
+from src.llm import GenerationOptions
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Modelo de embeddings carregado no processo mestre antes do fork (ver gunicorn.conf.py)
+_preloaded_embeddings = None
+
+
+def preload_embeddings() -> None:
+    """Carrega o modelo de embeddings uma única vez para ser herdado pelos workers"""
+    global _preloaded_embeddings
+    if _preloaded_embeddings is None:
+        from src.chatbot import create_embeddings
+        _preloaded_embeddings = create_embeddings()
+        logger.info("Modelo de embeddings pré-carregado")
+
+
+class MessageRequest(BaseModel):
+    message: str
+    # Sem session_id, cada requisição ganha uma sessão própria (devolvida no resultado) em vez de
+    # compartilhar o histórico de uma sessão padrão com outros chamadores
+    session_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    include_pending: bool = False
+    namespace: Optional[str] = None
+    profile: bool = False
+    # Idempotência e checkpoints; restrito para poder ser registrado e usado em nomes com segurança
+    request_id: Optional[str] = Field(None, max_length=128, pattern=r"^[A-Za-z0-9_-]+$")
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    model: Optional[str] = None
+
+    def resolve_namespace(self, http_request: Request) -> Optional[str]:
+        """Namespace da requisição: o do cabeçalho do proxy de autenticação, se configurado
+
+        Sem API_NAMESPACE_HEADER, vale o do corpo, e a API precisa estar atrás de um proxy que o controle.
+        """
+        if not settings.API_NAMESPACE_HEADER:
+            return self.namespace
+        namespace = http_request.headers.get(settings.API_NAMESPACE_HEADER) or None
+        if self.namespace is not None and self.namespace != namespace:
+            raise HTTPException(status_code=403, detail="Namespace diferente do chamador autenticado")
+        return namespace
+
+    def profiling(self) -> bool:
+        """Perfil pedido pelo cliente, atendido apenas se o servidor permitir (PROFILING_ALLOW_PER_REQUEST)"""
+        if self.profile and not settings.PROFILING_ALLOW_PER_REQUEST:
+            logger.warning("Perfil por requisição pedido pela API, mas desabilitado; ignorado")
+            return False
+        return self.profile
+
+    def generation_options(self) -> Optional[GenerationOptions]:
+        """Parâmetros de geração da requisição (422 se inválidos)"""
+        if self.temperature is None and self.max_tokens is None and not self.model:
+            return None
+        try:
+            return GenerationOptions(self.temperature, self.max_tokens, self.model)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+
+class AdmissionController:
+    """Limita as requisições em execução e a fila de espera, rejeitando com 429 quando saturado"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            metrics.inc("api_rejected_total", reason="queue_full")
+            raise HTTPException(status_code=429, detail="Servidor saturado, tente novamente")
+        self._waiting += 1
+        metrics.set("api_queue_depth", self._waiting)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("api_rejected_total", reason="queue_timeout")
+            raise HTTPException(status_code=429, detail="Tempo de espera na fila excedido")
+        finally:
+            self._waiting -= 1
+            metrics.set("api_queue_depth", self._waiting)
+        metrics.observe("api_queue_seconds", time.monotonic() - start)
+        metrics.add("api_in_flight", 1)
+
+    def release(self) -> None:
+        metrics.add("api_in_flight", -1)
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """StreamingResponse que executa on_close em qualquer desfecho
+
+    Inclui o cliente que desconecta antes de o corpo ser iterado, quando o finally do gerador não roda.
+    """
+
+    def __init__(self, content: Any, on_close: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+
+def create_app(chatbot_factory: Optional[Callable[[], Any]] = None) -> FastAPI:
+    """Cria a aplicação ASGI; o Chatbot é criado por worker, após o fork"""
+
+    def default_factory():
+        from src.chatbot import Chatbot
+        return Chatbot(embeddings=_preloaded_embeddings)
+
+    factory = chatbot_factory or default_factory
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.chatbot = factory()
+        app.state.executor = ThreadPoolExecutor(
+            max_workers=settings.API_MAX_CONCURRENCY, thread_name_prefix="chatbot-api"
+        )
+        app.state.admission = AdmissionController(
+            settings.API_MAX_CONCURRENCY, settings.API_MAX_QUEUE, settings.API_QUEUE_TIMEOUT
+        )
+        logger.info(f"API do Chatbot pronta (pid {os.getpid()})")
+        yield
+        app.state.executor.shutdown(wait=False)
+        app.state.chatbot.close()
+
+    app = FastAPI(title="Chatbot de Aprendizado", lifespan=lifespan)
+
+    @app.post("/v1/messages")
+    async def process_message(request: MessageRequest, http_request: Request):
+        start = time.monotonic()
+        options = request.generation_options()
+        namespace = request.resolve_namespace(http_request)
+        async with app.state.admission.slot():
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                app.state.executor, app.state.chatbot.process_message,
+                request.message, request.session_id, request.include_pending, options, namespace,
+                request.profiling(), request.request_id
+            )
+        metrics.observe("api_request_seconds", time.monotonic() - start, endpoint="messages")
+        metrics.inc("api_requests_total", endpoint="messages", status="error" if result.get("error") else "ok")
+        return {**result, "session_id": request.session_id}
+
+    @app.post("/v1/messages/stream")
+    async def stream_message(request: MessageRequest, http_request: Request):
+        options = request.generation_options()
+        namespace = request.resolve_namespace(http_request)
+        # A vaga é obtida antes de responder, para que a saturação ainda possa retornar 429
+        await app.state.admission.acquire()
+        start = time.monotonic()
+        # Sem o evento final, o cliente desconectou antes do fim
+        outcome = {"status": "disconnected"}
+
+        async def events():
+            stream = app.state.chatbot.stream_message(
+                request.message, request.session_id, request.include_pending, options, namespace,
+                request.profiling(), request.request_id
+            )
+            async for event in iterate_in_threadpool(stream):
+                if event.get("type") == "result":
+                    outcome["status"] = "error" if event.get("error") else "ok"
+                    event = {**event, "session_id": request.session_id}
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        def on_close():
+            app.state.admission.release()
+            metrics.observe("api_request_seconds", time.monotonic() - start, endpoint="stream")
+            metrics.inc("api_requests_total", endpoint="stream", status=outcome["status"])
+
+        return ReleasingStreamingResponse(events(), on_close, media_type="text/event-stream")
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok", "pid": os.getpid()}
+
+    return app
+
+
+if os.environ.get("API_PRELOAD_EMBEDDINGS", "").lower() in ("1", "true"):
+    preload_embeddings()
+
+app = create_app()
@@ -0,0 +1,57 @@
+import json
+import logging
+import urllib.request
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from src.llm import GenerationOptions
+
+logger = logging.getLogger(__name__)
+
+
+class ChatbotApiClient:
+    """Cliente da API HTTP do Chatbot com a mesma interface de process_message"""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def process_message(
+        self,
+        message: str,
+        session_id: str = "default",
+        include_pending: bool = False,
+        options: Optional[GenerationOptions] = None,
+        namespace: Optional[str] = None,
+        profile: bool = False,
+        request_id: Optional[str] = None
+    ) -> Dict:
+        payload = {"message": message, "session_id": session_id, "include_pending": include_pending}
+        if namespace:
+            payload["namespace"] = namespace
+        if profile:
+            payload["profile"] = True
+        if request_id:
+            payload["request_id"] = request_id
+        if options:
+            payload.update({key: value for key, value in asdict(options).items() if value is not None})
+        body = json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.base_url}/v1/messages",
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except Exception as e:
+            error_msg = f"Erro ao chamar a API do Chatbot: {e}"
+            logger.error(error_msg)
+            return {
+                "response": f"Desculpe, ocorreu um erro ao processar sua mensagem: {error_msg}",
+                "is_valid": False,
+                "error": str(e),
+                "intent": "",
+                "preferences": {}
+            }
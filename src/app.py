@@ -1,6 +1,11 @@
+import uuid
+
 import streamlit as st
 from dotenv import load_dotenv
+from src.api_client import ChatbotApiClient
 from src.chatbot import Chatbot, logger
+from src.config import settings
+from src.llm import GenerationOptions
 
 # Load environment variables
 load_dotenv()
@@ -46,14 +51,9 @@ with st.sidebar:
         st.session_state.total_messages = 0
     if "facts_learned" not in st.session_state:
         st.session_state.facts_learned = 0
-        
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric("Total de Mensagens", st.session_state.total_messages)
-        st.metric("Fatos Aprendidos", st.session_state.facts_learned)
-    with col2:
-        st.metric("Perguntas Feitas", st.session_state.message_counts["question"])
-        st.metric("Preferências Definidas", st.session_state.message_counts["preference"])
+    
+    # Preenchido pelo fragmento do chat, que é reexecutado a cada mensagem sem a barra lateral
+    stats_placeholder = st.empty()
     
     # Preferências Atuais
     st.subheader("🎯 Preferências Atuais")
@@ -92,15 +92,39 @@ Bem-vindo! Sou um chatbot que pode aprender com nossas conversas.
 - Forneça feedback para me ajudar a melhorar
 """)
 
-# Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+@st.cache_resource(show_spinner=False)
+def get_chatbot():
+    """Chatbot compartilhado por todas as sessões do servidor (modelos carregados uma única vez)"""
     logger.info("Initializing chatbot...")
-    st.session_state.chatbot = Chatbot()
+    if settings.CHATBOT_API_URL:
+        # Cliente leve: o processamento acontece no serviço da API
+        chatbot = ChatbotApiClient(settings.CHATBOT_API_URL)
+    else:
+        chatbot = Chatbot()
     logger.info("Chatbot initialized successfully")
+    return chatbot
 
-# Display chat messages
-for message in st.session_state.messages:
+
+def render_stats(placeholder) -> None:
+    """Contadores da sessão na barra lateral"""
+    with placeholder.container():
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Total de Mensagens", st.session_state.total_messages)
+            st.metric("Fatos Aprendidos", st.session_state.facts_learned)
+        with col2:
+            st.metric("Perguntas Feitas", st.session_state.message_counts["question"])
+            st.metric("Preferências Definidas", st.session_state.message_counts["preference"])
+
+
+
+@st.cache_data(show_spinner=False)
+def preferences_markdown(preferences: tuple) -> str:
+    """Lista de preferências em um único bloco, em vez de uma caixa por preferência"""
+    return "\n".join(f"- **{pref.title()}**: {value}" for pref, value in preferences)
+
+
+def render_message(message: dict) -> None:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
         
@@ -117,24 +141,60 @@ for message in st.session_state.messages:
         # Mostrar preferências atualizadas
         if message.get("preferences") and message["role"] == "assistant":
             with st.expander("Preferências Atualizadas"):
-                for pref, value in message["preferences"].items():
-                    st.info(f"{pref.title()}: {value}")
+                st.markdown(preferences_markdown(tuple(message["preferences"].items())))
+
+
+# Initialize session state
+if "messages" not in st.session_state:
+    st.session_state.messages = []
+if "chatbot" not in st.session_state:
+    st.session_state.chatbot = get_chatbot()
+if "session_id" not in st.session_state:
+    # Cada sessão do navegador tem sua própria memória de conversa no Chatbot compartilhado
+    st.session_state.session_id = uuid.uuid4().hex
+if "history_window" not in st.session_state:
+    st.session_state.history_window = settings.UI_HISTORY_PAGE_SIZE
+
+# Em uma execução completa todo o histórico é desenhado aqui; o fragmento abaixo desenha apenas as novas mensagens
+st.session_state.live_start = len(st.session_state.messages)
+hidden = max(0, len(st.session_state.messages) - st.session_state.history_window)
+if hidden and st.button(f"Carregar mensagens anteriores ({hidden} ocultas)"):
+    st.session_state.history_window += settings.UI_HISTORY_PAGE_SIZE
+    st.rerun()
 
-# Chat input
-if prompt := st.chat_input("O que você gostaria de discutir?"):
+# Display chat messages
+for message in st.session_state.messages[hidden:]:
+    render_message(message)
+
+
+@st.fragment
+def chat_fragment():
+    """Entrada do chat e mensagens novas; enviar uma mensagem reexecuta apenas este trecho"""
+    for message in st.session_state.messages[st.session_state.live_start:]:
+        render_message(message)
+    
+    prompt = st.chat_input("O que você gostaria de discutir?")
+    if prompt:
+        process_prompt(prompt)
+    # Os contadores mudam a cada mensagem; a barra lateral só é redesenhada em execuções completas
+    render_stats(stats_placeholder)
+
+
+def process_prompt(prompt: str) -> None:
+    """Envia a mensagem ao Chatbot e desenha a resposta"""
     # Increment message counter
     st.session_state.total_messages += 1
     
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    user_message = {"role": "user", "content": prompt}
+    st.session_state.messages.append(user_message)
+    render_message(user_message)
     
     # Process the message
     try:
-        # Atualizar temperatura do modelo
-        st.session_state.chatbot.llm.temperature = st.session_state.temperature
-        
-        # Processar mensagem
-        response = st.session_state.chatbot.process_message(prompt)
+        # Temperatura aplicada apenas a esta requisição; o Chatbot é compartilhado entre sessões
+        options = GenerationOptions(temperature=st.session_state.temperature)
+        response = st.session_state.chatbot.process_message(prompt, st.session_state.session_id, options=options)
         
         # Atualizar contadores
         if response.get("intent"):
@@ -150,19 +210,27 @@ if prompt := st.chat_input("O que você gostaria de discutir?"):
         if response.get("error"):
             st.error(response["response"])
         else:
-            # Display response
-            st.markdown(response["response"])
-            
-            # Add response to chat history
-            st.session_state.messages.append({
+            # Add response to chat history and display it
+            assistant_message = {
                 "role": "assistant",
                 "content": response["response"],
                 "is_valid": response["is_valid"],
                 "intent": response["intent"],
                 "preferences": response["preferences"]
-            })
+            }
+            st.session_state.messages.append(assistant_message)
+            render_message(assistant_message)
+            
+            # Manter o histórico exibido limitado; o contexto antigo vive no resumo do Chatbot
+            excess = len(st.session_state.messages) - settings.UI_MAX_MESSAGES
+            if excess > 0:
+                del st.session_state.messages[:excess]
+                st.session_state.live_start = max(0, st.session_state.live_start - excess)
             
     except Exception as e:
         error_msg = f"Erro ao processar mensagem: {e}"
         logger.error(error_msg)
         st.error(error_msg)
+
+
+chat_fragment()
@@ -1,15 +1,62 @@
+import functools
+import hashlib
 import os
-from typing import Dict, List, TypedDict
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple, TypedDict
 import logging
 import json
 from langchain_groq import ChatGroq
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
+from chromadb.config import Settings as ChromaSettings
 from langchain.schema import Document
 from langgraph.graph import StateGraph, END
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema.messages import HumanMessage, SystemMessage
+from langchain.schema.messages import HumanMessage
+from src.checkpointing import CheckpointExpiry, create_checkpointer, resumable
 from src.config import settings
+from src.degraded import DegradedModeError, degraded_reason, degraded_response, guess_intent
+from src.embedding_pool import EmbeddingPool, load_huggingface
+from src.exact_index import ExactVectorStore
+from src.fact_validation import FactValidator
+from src.llm import (
+    GenerationOptions,
+    SlotPinningPrefixCacheAdapter,
+    create_chat_model,
+    invoke_with_prefix,
+    stream_with_prefix,
+)
+from src.memory import ConversationMemory, Turn
+from src.hedging import get_hedger
+from src.metrics import metrics
+from src.profiling import profile_request, profiled
+from src.preferences import Extraction, extract_preferences, parse_llm_preferences
+from src.namespaces import COLD, HOT, ShardRouter, shard_name
+from src.resilience import DeadlineExceededError, get_llm_guard
+from src.scheduler import (
+    INGESTION,
+    SUMMARIZATION,
+    VALIDATION,
+    ScheduledEmbeddings,
+    current_lane,
+    get_embedding_scheduler,
+    lane,
+)
+from src.sessions import SessionManager
+from src.tiering import FactTiering, find_documents, update_metadatas
+from src.traffic import TrafficRecorder
+from src.speculation import CandidateReplayModel, SpeculationRegistry, SpeculativeGeneration
+from src.vector_index import collection_metadata_from_settings, lock_store, set_ef_search
+from src.prompts import (
+    build_prefixes,
+    count_message_tokens,
+    format_context,
+    format_numbered,
+    format_preferences,
+    pack_context,
+    parse_numbered_verdicts,
+)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -23,32 +70,195 @@ class ChatState(TypedDict):
     error: str | None
     preferences: Dict[str, str]
     context: List[Dict]
+    prompt_tokens: Dict[str, int]
+    llm_seconds: Dict[str, float]
+    session_id: str
+    request_id: str
+    pending: bool
+    include_pending: bool
+    generation: Dict
+    namespace: Optional[str]
+    deadline: Optional[float]
+    degraded: Optional[str]
+
+DEFAULT_SESSION = "default"
+
+
+def document_id(state: ChatState) -> str:
+    """Id do documento gravado pela requisição: repetir a requisição sobrescreve em vez de duplicar"""
+    if not state.get("request_id"):
+        return uuid.uuid4().hex
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"chatbot:{state['request_id']}:{state['input']}").hex
+
+
+def session_key(session_id: str, namespace: Optional[str] = None) -> str:
+    """Chave da memória de conversa: o mesmo session_id em namespaces diferentes são sessões distintas"""
+    return json.dumps([namespace, session_id])
+
+
+def checkpoint_thread_id(state: ChatState) -> str:
+    """Thread do checkpoint da requisição, restrita à sessão e ao namespace de quem a enviou"""
+    key = json.dumps([state.get("session_id"), state.get("namespace"), state["request_id"]])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# Veredito da validação informado ao LLM na resposta a um fato
+FACT_VERDICTS = {
+    True: "Resultado da validação: o fato foi validado e armazenado.",
+    False: "Resultado da validação: o fato não pôde ser validado e não foi armazenado.",
+}
+
+# Confirmação imediata de um fato cuja validação ocorrerá em segundo plano
+PENDING_FACT_ACK = "Obrigado! Registrei essa informação e vou verificá-la em seguida."
+
+# Fatos aguardando validação não aparecem no contexto (documentos sem status são considerados validados)
+VALIDATED_FILTER = {"status": {"$ne": "pending"}}
+
+# Nós que chamam o LLM; cada um pode ter modelo e limite de tokens próprios nas configurações
+LLM_NODES = (
+    "process_input",
+    "validate_fact",
+    "validate_fact_batch",
+    "update_preferences",
+    "generate_response",
+    "summarize_history",
+)
+
+def create_embeddings():
+    """Carrega o modelo de embeddings (pode ser pré-carregado e compartilhado entre instâncias)"""
+    if settings.EMBEDDING_WORKERS > 0:
+        # Os workers carregam o modelo no primeiro uso de cada processo
+        return EmbeddingPool(
+            functools.partial(load_huggingface, settings.EMBEDDING_MODEL),
+            workers=settings.EMBEDDING_WORKERS,
+            batch_size=settings.EMBEDDING_WORKER_BATCH_SIZE,
+            threads_per_worker=settings.EMBEDDING_WORKER_THREADS
+        )
+    return HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL,
+        model_kwargs={'device': 'cpu'}
+    )
+
+def chroma_client_settings() -> Optional[ChromaSettings]:
+    """Configuração do cliente do Chroma com cache LRU dos índices carregados, se houver limite"""
+    if settings.CHROMA_MEMORY_LIMIT_BYTES <= 0:
+        return None
+    return ChromaSettings(
+        chroma_segment_cache_policy="LRU",
+        chroma_memory_limit_bytes=settings.CHROMA_MEMORY_LIMIT_BYTES
+    )
 
 class Chatbot:
-    def __init__(self):
+    def __init__(self, embeddings=None):
         try:
             logger.info("Inicializando Chatbot...")
-            self.llm = ChatGroq(
-                api_key=settings.GROQ_API_KEY,
-                model_name=settings.MODEL_NAME,
-                temperature=settings.TEMPERATURE,
-                max_retries=3,
-                request_timeout=30
-            )
+            self.llm = self.create_llm(settings.MODEL_NAME)
+            
+            # Clientes dedicados para os nós com modelo ou limite de tokens próprios
+            self.node_llms = {}
+            self.node_models = {}
+            for node in LLM_NODES:
+                model_name = getattr(settings, f"{node.upper()}_MODEL") or settings.MODEL_NAME
+                max_tokens = getattr(settings, f"{node.upper()}_MAX_TOKENS") or None
+                self.node_models[node] = model_name
+                if model_name != settings.MODEL_NAME or max_tokens:
+                    self.node_llms[node] = self.create_llm(model_name, max_tokens)
+                    logger.info(f"Nó {node} usando modelo {model_name} (max_tokens={max_tokens})")
             logger.info("LLM inicializado com sucesso")
             
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name=settings.EMBEDDING_MODEL,
-                model_kwargs={'device': 'cpu'}
+            # Prefixos estáticos dos prompts, construídos uma única vez
+            self.prefixes = build_prefixes()
+            
+            # Limite de taxa, concorrência e disjuntor compartilhados por todos os nós
+            self.guard = get_llm_guard()
+            self.hedged_nodes = (
+                {node.strip() for node in settings.HEDGE_NODES.split(",") if node.strip()}
+                if settings.HEDGE_ENABLED else set()
+            )
+            # Prazo por mensagem e respostas sem LLM quando ele está lento ou indisponível
+            self.request_deadline = settings.REQUEST_DEADLINE_SECONDS
+            self.degraded_mode = settings.DEGRADED_MODE_ENABLED
+            self.degraded_min_budget = settings.DEGRADED_MIN_BUDGET_SECONDS
+            # Preferências extraídas localmente, com o LLM apenas para entradas de baixa confiança
+            self.preference_extractor = settings.PREFERENCE_EXTRACTOR
+            self.preference_min_confidence = settings.PREFERENCE_MIN_CONFIDENCE
+            # Perfil de CPU e memória por nó, para todas as mensagens ou apenas as que pedirem
+            self.profiling = settings.PROFILING_ENABLED
+            
+            # Chamadas ao modelo de embeddings passam pelo escalonador, na pista do contexto
+            self.embeddings = ScheduledEmbeddings(
+                embeddings or create_embeddings(),
+                get_embedding_scheduler(),
+                timeout=settings.EMBEDDING_QUEUE_TIMEOUT
             )
             logger.info("Modelo de embeddings inicializado com sucesso")
             
-            self.vector_store = Chroma(
-                persist_directory="data/chromadb",
-                embedding_function=self.embeddings
+            # Impede rebuild e vacuum do índice enquanto este processo usa as coleções
+            self.store_lock = None
+            if settings.VECTOR_STORE_BACKEND != "exact":
+                self.store_lock = lock_store(settings.CHROMA_PERSIST_DIRECTORY)
+            
+            # Coleção global e coleções por namespace, consultadas em conjunto
+            self.shards = ShardRouter(
+                self.create_vector_store(),
+                self.open_shard,
+                lambda query: self.embeddings.embed_query(query),
+                max_open=settings.NAMESPACE_MAX_OPEN_SHARDS,
+                close_shard=self.close_vector_store
             )
+            # Namespace de cada fato pendente, para promovê-lo ou removê-lo na coleção certa
+            self.pending_namespaces: Dict[str, Optional[str]] = {}
+            # Fatos sem acesso dentro do TTL vão para a camada fria
+            self.tiering = FactTiering(
+                self.shards,
+                ttl=settings.FACT_HOT_TTL,
+                min_relevance=settings.FACT_TIERING_MIN_RELEVANCE,
+                sweep_interval=settings.FACT_TIERING_SWEEP_INTERVAL
+            ) if settings.FACT_TIERING_ENABLED else None
             logger.info("Vector store inicializado com sucesso")
             
+            # Memória de conversa por sessão; sessões ociosas ou além dos limites vão para o disco
+            self.sessions = SessionManager(
+                self.create_memory,
+                idle_ttl=settings.SESSION_IDLE_TTL,
+                max_bytes=settings.SESSION_MEMORY_MAX_BYTES,
+                max_sessions=settings.MAX_SESSIONS,
+                offload_directory=settings.SESSION_OFFLOAD_DIRECTORY,
+                sweep_interval=settings.SESSION_SWEEP_INTERVAL
+            )
+            
+            # Respostas candidatas de fatos geradas enquanto a validação ocorre
+            self.speculative_facts = settings.SPECULATIVE_FACT_RESPONSES
+            self.speculations = SpeculationRegistry()
+            
+            # Validação adiada: fatos armazenados como pendentes e validados em lotes
+            self.deferred_facts = settings.DEFERRED_FACT_VALIDATION
+            self.fact_validator = FactValidator(
+                self.validate_fact_batch,
+                self.promote_facts,
+                self.reject_facts,
+                batch_size=settings.FACT_VALIDATION_BATCH_SIZE,
+                workers=settings.FACT_VALIDATION_WORKERS,
+                batch_wait=settings.FACT_VALIDATION_BATCH_WAIT,
+                retry_backoff=settings.FACT_VALIDATION_RETRY_BACKOFF,
+                max_backoff=settings.FACT_VALIDATION_MAX_BACKOFF
+            )
+            # Fatos que ficaram pendentes antes de um reinício (as coleções de namespaces, ao abrir)
+            self.requeue_pending_facts(None, self.vector_store)
+            
+            # Checkpoints por requisição: uma nova tentativa retoma do nó que falhou
+            self.checkpointer = create_checkpointer(settings.CHECKPOINT_BACKEND, settings.CHECKPOINT_SQLITE_PATH)
+            self.checkpoint_expiry = (
+                CheckpointExpiry(self.checkpointer, settings.CHECKPOINT_TTL) if self.checkpointer is not None else None
+            )
+            
+            # Gravação anonimizada do tráfego, para reprodução com benchmarks/replay.py
+            self.traffic_recorder = TrafficRecorder(
+                settings.TRAFFIC_RECORD_PATH,
+                salt=settings.TRAFFIC_RECORD_SALT,
+                sample_rate=settings.TRAFFIC_RECORD_SAMPLE_RATE
+            ) if settings.TRAFFIC_RECORD_ENABLED else None
+            
             self.setup_graph()
             logger.info("Configuração do grafo completada")
             
@@ -63,6 +273,99 @@ class Chatbot:
             logger.error(f"Erro ao inicializar Chatbot: {e}")
             raise
 
+    @property
+    def vector_store(self):
+        """Coleção global (compartilhada por todos os namespaces)"""
+        return self.shards.global_store
+
+    @vector_store.setter
+    def vector_store(self, store) -> None:
+        self.shards.global_store = store
+
+    def create_vector_store(self, namespace: Optional[str] = None, tier: str = HOT):
+        """Cria o armazenamento vetorial do backend configurado (global ou de um namespace)"""
+        if settings.VECTOR_STORE_BACKEND == "exact":
+            directory = settings.EXACT_INDEX_DIRECTORY
+            if namespace:
+                directory = os.path.join(directory, "namespaces", shard_name("ns", namespace))
+            if tier == COLD:
+                directory = os.path.join(directory, "cold")
+            return ExactVectorStore(
+                self.embeddings,
+                directory,
+                compact_ratio=settings.EXACT_INDEX_COMPACT_RATIO
+            )
+        collection_name = settings.CHROMA_COLLECTION_NAME
+        if namespace:
+            collection_name = shard_name(collection_name, namespace)
+        if tier == COLD:
+            collection_name = f"{collection_name}-cold"
+        shard = namespace is not None or tier != HOT
+        vector_store = Chroma(
+            collection_name=collection_name,
+            persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
+            embedding_function=self.embeddings,
+            collection_metadata=collection_metadata_from_settings(),
+            # Os shards compartilham o cliente (e o SQLite) da coleção global
+            client=self.vector_store._client if shard else None,
+            client_settings=None if shard else chroma_client_settings()
+        )
+        try:
+            # ef_search pode mudar sem reconstruir o índice; os demais parâmetros valem na criação.
+            # Sem valor configurado, prevalece o da coleção (ex.: definido com `vector_index set-ef-search`)
+            if settings.CHROMA_HNSW_EF_SEARCH:
+                set_ef_search(vector_store._collection, settings.CHROMA_HNSW_EF_SEARCH)
+        except Exception as e:
+            logger.warning(f"Não foi possível ajustar o ef_search da coleção: {e}")
+        return vector_store
+
+    def open_shard(self, namespace: Optional[str], tier: str = HOT):
+        """Abre a coleção de um namespace, reenviando à validação os fatos pendentes dela"""
+        store = self.create_vector_store(namespace, tier)
+        if tier == HOT:
+            self.requeue_pending_facts(namespace, store)
+        return store
+
+    def requeue_pending_facts(self, namespace: Optional[str], store) -> int:
+        """Envia ao validador os fatos pendentes da coleção que ainda não estão na fila"""
+        try:
+            pending = [
+                (doc_id, text) for doc_id, text in find_documents(store, {"status": "pending"})
+                if doc_id not in self.pending_namespaces
+            ]
+        except Exception as e:
+            logger.error(f"Erro ao buscar fatos pendentes: {e}")
+            return 0
+        for doc_id, text in pending:
+            self.pending_namespaces[doc_id] = namespace
+            self.fact_validator.submit(doc_id, text)
+        if pending:
+            logger.info(f"{len(pending)} fatos pendentes reenviados à validação")
+        return len(pending)
+
+    @staticmethod
+    def create_llm(model_name: str, max_tokens: Optional[int] = None):
+        """Cria o cliente de LLM do backend configurado"""
+        if settings.LLM_BACKEND == "groq":
+            llm = ChatGroq(
+                api_key=settings.GROQ_API_KEY,
+                model_name=model_name,
+                temperature=settings.TEMPERATURE,
+                max_tokens=max_tokens,
+                max_retries=0,  # retentativas feitas pelo LLMGuard
+                request_timeout=settings.LLM_REQUEST_TIMEOUT
+            )
+        else:
+            logger.info(f"Usando backend de LLM: {settings.LLM_BACKEND}")
+            llm = create_chat_model(settings.LLM_BACKEND, model_name, settings.TEMPERATURE, max_tokens)
+        if settings.LLM_PREFIX_CACHE == "slot":
+            llm = SlotPinningPrefixCacheAdapter(llm, n_slots=settings.LLM_PREFIX_CACHE_SLOTS)
+        return llm
+
+    def llm_for(self, node: str):
+        """Cliente de LLM usado por um nó"""
+        return self.node_llms.get(node, self.llm)
+
     def setup_graph(self):
         try:
             # Define the conversation flow graph
@@ -88,41 +391,21 @@ class Chatbot:
             self.graph.set_entry_point("process_input")
 
             # Compile the graph
-            self.workflow = self.graph.compile()
+            self.workflow = self.graph.compile(checkpointer=self.checkpointer)
         except Exception as e:
             logger.error(f"Erro ao configurar o grafo: {e}")
             raise
 
+    @profiled
+    @resumable
     def process_input(self, state: ChatState) -> ChatState:
         """Processa a entrada do usuário e determina a intenção"""
         try:
             logger.info(f"Processando entrada: {state['input']}")
             
-            system_content = """Você é um classificador de intenções.
-            
-            IMPORTANTE: Responda APENAS com UMA das seguintes palavras, sem pontuação ou texto adicional:
-            - fact (quando o usuário compartilha uma informação factual)
-            - question (quando o usuário faz uma pergunta)
-            - preference (quando o usuário expressa uma preferência ou gosto)
-            - feedback (quando o usuário fornece feedback)
-            
-            Exemplos:
-            Entrada: "A Terra é redonda"
-            Resposta: fact
-            
-            Entrada: "Qual é a capital do Brasil?"
-            Resposta: question
-            
-            Entrada: "Eu prefiro explicações detalhadas"
-            Resposta: preference
-            
-            Entrada: "Gostei muito da sua resposta"
-            Resposta: feedback"""
-            
-            system_message = SystemMessage(content=system_content)
             human_message = HumanMessage(content=state["input"])
             
-            result = self.llm.invoke([system_message, human_message])
+            result = self.call_llm(state, "process_input", [human_message])
             
             # Limpar e validar a resposta
             intent = result.content.strip().lower()
@@ -138,24 +421,35 @@ class Chatbot:
             logger.info(f"Intenção detectada: {state['intent']}")
             return state
         except Exception as e:
+            if self.degrade(state, e):
+                state["intent"] = guess_intent(state["input"])
+                state["error"] = None
+                logger.info(f"Intenção estimada sem o LLM: {state['intent']}")
+                return state
             error_msg = f"Erro ao processar entrada: {e}"
             logger.error(error_msg)
             state["error"] = error_msg
             return state
 
+    @profiled
+    @resumable
     def get_context(self, state: ChatState) -> ChatState:
         """Recupera contexto relevante do armazenamento vetorial"""
         try:
             logger.info("Buscando contexto relevante")
             if state["intent"] in ["question", "fact"]:
-                docs = self.vector_store.similarity_search(
+                search = self.tiering.search if self.tiering else self.shards.search
+                docs = search(
                     state["input"],
-                    k=3
+                    state.get("namespace"),
+                    k=settings.CONTEXT_K,
+                    filter=None if state.get("include_pending") else VALIDATED_FILTER
                 )
-                state["context"] = [
+                # Documentos já vêm ordenados por relevância; manter apenas os que cabem no orçamento
+                state["context"] = pack_context([
                     {"content": doc.page_content, "metadata": doc.metadata}
                     for doc in docs
-                ]
+                ], settings.CONTEXT_TOKEN_BUDGET)
                 logger.info(f"Encontrados {len(state['context'])} documentos relevantes")
             else:
                 state["context"] = []
@@ -165,43 +459,28 @@ class Chatbot:
             state["error"] = str(e)
             return state
 
+    @profiled
+    @resumable
     def validate_fact(self, state: ChatState) -> ChatState:
         """Valida se a entrada contém um fato verificável"""
         try:
-            if state["intent"] == "fact":
+            if state["intent"] == "fact" and self.deferred_facts:
+                # Validação feita depois, em lote; o fato é armazenado como pendente
+                logger.info("Validação do fato adiada")
+                state["is_valid"] = False
+                state["pending"] = True
+            elif state["intent"] == "fact":
                 logger.info("Validando fato")
                 
-                # Preparar contexto para validação
-                context_str = ""
-                if state["context"]:
-                    context_str = "\n".join([
-                        f"- {doc['content']}" for doc in state["context"]
-                    ])
-                
-                system_message = SystemMessage(content="""Você é um assistente especializado em validar fatos em português.
-                
-                Analise cuidadosamente a entrada do usuário e determine se é uma afirmação factual que pode ser validada.
-                
-                Responda apenas com:
-                - true: se for um fato claro e verificável
-                - false: se for opinião, preferência ou não puder ser verificado
+                if self.speculative_facts and not state.get("degraded"):
+                    self.start_speculation(state)
                 
-                Exemplos de fatos válidos:
-                - "A água ferve a 100°C ao nível do mar"
-                - "O Brasil é o maior país da América do Sul"
-                
-                Exemplos de não-fatos:
-                - "Eu adoro chocolate"
-                - "O azul é a cor mais bonita"
-                
-                Considere apenas a verificabilidade, não a veracidade.
-                
-                Contexto conhecido:
-                {context}""")
-                
-                human_message = HumanMessage(content=state["input"])
+                messages = []
+                if state["context"]:
+                    messages.append(HumanMessage(content="Contexto conhecido:\n" + format_context(state["context"])))
+                messages.append(HumanMessage(content=state["input"]))
                 
-                result = self.llm.invoke([system_message, human_message])
+                result = self.call_llm(state, "validate_fact", messages)
                 
                 # Extrair apenas true/false da resposta
                 response = result.content.strip().lower()
@@ -213,108 +492,66 @@ class Chatbot:
                 state["is_valid"] = False
             return state
         except Exception as e:
+            if self.degrade(state, e):
+                # Armazenado como pendente; o validador em lote o confirma quando o LLM voltar
+                state["is_valid"] = False
+                state["pending"] = True
+                return state
             logger.error(f"Erro ao validar fato: {e}")
             state["error"] = str(e)
             return state
 
+    @profiled
+    @resumable
     def update_preferences(self, state: ChatState) -> ChatState:
         """Atualiza preferências do usuário com base na entrada"""
+        extraction = Extraction()
         try:
             if state["intent"] == "preference":
                 logger.info("Processando atualização de preferências")
                 
-                # Definir valores válidos
-                valid_values = {
-                    "tom": ["formal", "casual"],
-                    "verbosidade": ["concisa", "balanceada", "detalhada"],
-                    "formalidade": ["formal", "informal"]
-                }
-                
-                system_content = """Você é um analisador de preferências.
-                
-                IMPORTANTE: Sua resposta deve ser EXATAMENTE um objeto JSON válido, sem texto adicional.
-                
-                Analise a mensagem e identifique preferências relacionadas a:
-                - tom: formal ou casual
-                - verbosidade: concisa, balanceada ou detalhada
-                - formalidade: formal ou informal
-                
-                Se nenhuma preferência for identificada, retorne {}.
-                Se identificar uma preferência, inclua APENAS as preferências mencionadas.
-                
-                Exemplos:
-                
-                Entrada: "Prefiro um tom mais formal"
-                Resposta: {"tom": "formal"}
-                
-                Entrada: "Gosto de explicações detalhadas"
-                Resposta: {"verbosidade": "detalhada"}
-                
-                Entrada: "Quero respostas formais e concisas"
-                Resposta: {"tom": "formal", "verbosidade": "concisa"}
-                
-                Entrada: "Gosto de matemática"
-                Resposta: {}"""
-                
-                system_message = SystemMessage(content=system_content)
-                human_message = HumanMessage(content=state["input"])
+                # Extração local primeiro; o LLM só é chamado quando a confiança é baixa
+                start = time.perf_counter()
+                extraction = extract_preferences(state["input"])
+                source = "local"
+                new_prefs = extraction.preferences
+                if self.preference_extractor == "llm" or extraction.confidence < self.preference_min_confidence:
+                    source = "llm"
+                    new_prefs = self.extract_preferences_llm(state)
+                metrics.inc("preference_extractions_total", source=source)
+                metrics.observe("preference_extraction_seconds", time.perf_counter() - start, source=source)
                 
-                # Registrar a entrada para debug
-                logger.debug(f"Entrada do usuário: {state['input']}")
-                
-                # Obter resposta do LLM
-                result = self.llm.invoke([system_message, human_message])
-                
-                # Registrar a resposta bruta
-                logger.debug(f"Resposta bruta do LLM: {result.content}")
-                
-                try:
-                    # Extrair apenas o JSON da resposta
-                    json_str = result.content.strip()
-                    if json_str.startswith('```json'):
-                        json_str = json_str.replace('```json', '').replace('```', '').strip()
-                    elif json_str.startswith('{'):
-                        # Já está no formato JSON
-                        pass
-                    else:
-                        # Se não encontrar JSON válido, usar objeto vazio
-                        json_str = '{}'
-                    
-                    # Tentar fazer o parse do JSON
-                    new_prefs = json.loads(json_str)
-                    logger.debug(f"JSON parseado: {new_prefs}")
-                    
-                    # Filtrar e validar preferências
-                    filtered_prefs = {}
-                    for key, value in new_prefs.items():
-                        if key in valid_values and isinstance(value, str):
-                            value_lower = value.lower()
-                            if value_lower in valid_values[key]:
-                                filtered_prefs[key] = value_lower
-                    
-                    # Atualizar preferências mantendo valores padrão para campos não especificados
-                    state["preferences"] = {**self.default_preferences, **filtered_prefs}
-                    logger.info(f"Preferências atualizadas: {state['preferences']}")
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"Erro ao decodificar JSON: {e}")
-                    logger.error(f"Conteúdo que causou erro: {json_str}")
-                    state["preferences"] = self.default_preferences
-                except Exception as e:
-                    logger.error(f"Erro ao processar preferências: {e}")
-                    logger.error(f"Conteúdo que causou erro: {result.content}")
-                    state["preferences"] = self.default_preferences
+                # Atualizar preferências mantendo valores padrão para campos não especificados
+                state["preferences"] = {**self.default_preferences, **new_prefs}
+                logger.info(f"Preferências atualizadas ({source}): {state['preferences']}")
             else:
                 state["preferences"] = self.default_preferences
             
             return state
             
         except Exception as e:
+            if self.degrade(state, e):
+                # Sem o LLM, vale o que a extração local reconheceu
+                state["preferences"] = {**self.default_preferences, **extraction.preferences}
+                return state
             error_msg = f"Erro ao atualizar preferências: {e}"
             logger.error(error_msg)
             state["error"] = error_msg
             return state
 
+    def extract_preferences_llm(self, state: ChatState) -> Dict[str, str]:
+        """Preferências extraídas pelo LLM (objeto JSON validado contra os valores permitidos)"""
+        human_message = HumanMessage(content=state["input"])
+        result = self.call_llm(state, "update_preferences", [human_message])
+        logger.debug(f"Resposta bruta do LLM: {result.content}")
+        preferences = parse_llm_preferences(result.content)
+        if preferences is None:
+            logger.error(f"Erro ao decodificar JSON das preferências: {result.content}")
+            return {}
+        return preferences
+
+    @profiled
+    @resumable
     def store_information(self, state: ChatState) -> ChatState:
         """Armazena informações validadas no armazenamento vetorial"""
         try:
@@ -322,12 +559,22 @@ class Chatbot:
                 logger.warning("Pulando armazenamento de informações devido a erro anterior")
                 return state
 
-            if state["is_valid"] and state["intent"] in ["fact", "preference"]:
+            if state.get("pending") and state["intent"] == "fact":
+                logger.info("Armazenando fato pendente de validação")
+                doc_id = document_id(state)
+                self.shards.shard(state.get("namespace")).add_documents(
+                    [Document(page_content=state["input"], metadata={"type": "fact", "status": "pending"})],
+                    ids=[doc_id]
+                )
+                self.pending_namespaces[doc_id] = state.get("namespace")
+                self.fact_validator.submit(doc_id, state["input"])
+            elif state["is_valid"] and state["intent"] in ["fact", "preference"]:
                 logger.info("Armazenando informações validadas")
                 
                 # Preparar metadados
                 metadata = {
-                    "type": state["intent"]
+                    "type": state["intent"],
+                    "status": "validated"
                 }
                 
                 # Se for uma preferência, converter o dicionário em string JSON
@@ -338,7 +585,7 @@ class Chatbot:
                     page_content=state["input"],
                     metadata=metadata
                 )
-                self.vector_store.add_documents([doc])
+                self.shards.shard(state.get("namespace")).add_documents([doc], ids=[document_id(state)])
                 logger.info("Informações armazenadas com sucesso")
             else:
                 logger.info("Informações não válidas ou não armazenáveis, pulando armazenamento")
@@ -349,109 +596,481 @@ class Chatbot:
             state["error"] = error_msg
             return state
 
+    @profiled
+    @resumable
     def generate_response(self, state: ChatState) -> ChatState:
         """Gera uma resposta baseada no estado da conversa"""
         try:
-            # Preparar contexto para a resposta
-            context_str = ""
-            if state["context"]:
-                context_str = "\n".join([
-                    f"- {doc['content']}" for doc in state["context"]
-                ])
-
             logger.info("Gerando resposta")
             
-            # Formatar preferências para o prompt
-            prefs_str = "\n".join([
-                f"- {key}: {value}"
-                for key, value in state["preferences"].items()
-            ])
-            
-            system_content = f"""Você é um assistente amigável em português que aprende com conversas.
-            
-            Analise a entrada do usuário e o contexto fornecido. Se houver informações relevantes no contexto,
-            use-as para enriquecer sua resposta.
-            
-            Preferências do usuário:
-            {prefs_str}
-            
-            Adapte seu tom e estilo de acordo com as preferências do usuário.
-            
-            Diretrizes para resposta:
-            - Se for um fato: confirme se foi validado e armazenado
-            - Se for uma pergunta: use o contexto para fornecer uma resposta precisa
-            - Se for uma preferência: confirme as mudanças
-            - Se for um feedback: agradeça e explique como isso ajuda a melhorar
-            
-            Mantenha suas respostas em português, de forma concisa e relevante.
-            Use uma linguagem natural e amigável."""
-            
-            system_message = SystemMessage(content=system_content)
-            
-            # Preparar mensagem de contexto
-            context_content = "Contexto disponível: " + context_str if context_str else "Nenhum contexto relevante disponível."
-            context_message = HumanMessage(content=context_content)
-            
-            # Mensagem do usuário
-            user_message = HumanMessage(content=state["input"])
+            if state.get("pending"):
+                # Confirmação imediata, sem chamada ao LLM
+                state["response"] = PENDING_FACT_ACK
+                return state
             
-            # Invocar o LLM com todas as mensagens
-            result = self.llm.invoke([
-                system_message,
-                context_message,
-                user_message
-            ])
+            candidate = None
+            if state.get("request_id"):
+                candidate = self.speculations.take(state["request_id"], state["is_valid"])
+            if candidate is not None:
+                # Reproduzir a candidata do veredito obtido; apenas ela é transmitida
+                metrics.inc("speculative_responses_total", outcome="used")
+                result = CandidateReplayModel(candidate=candidate).invoke(state["input"])
+                if candidate.seconds is not None:
+                    state.setdefault("llm_seconds", {})["generate_response"] = candidate.seconds
+            else:
+                result = self.call_llm(
+                    state,
+                    "generate_response",
+                    self.response_messages(state, state["is_valid"]),
+                    **state.get("generation", {})
+                )
             
             state["response"] = result.content
             return state
             
         except Exception as e:
+            if self.degrade(state, e):
+                state["response"] = degraded_response(
+                    state["intent"], state["input"], state["context"], state["is_valid"]
+                )
+                return state
             logger.error(f"Erro ao gerar resposta: {e}")
             state["error"] = str(e)
             state["response"] = "Desculpe, ocorreu um erro ao processar sua mensagem. Por favor, tente novamente."
             return state
 
-    def process_message(self, message: str) -> Dict:
-        """Processa uma mensagem e retorna a resposta"""
-        try:
-            logger.info("Iniciando processamento de mensagem")
-            initial_state = ChatState(
-                input=message,
-                intent="",
-                is_valid=False,
-                response="",
-                error=None,
-                preferences=self.default_preferences.copy(),
-                context=[]
+    def response_messages(self, state: ChatState, verdict: bool) -> List:
+        """Mensagens dinâmicas da resposta: histórico, contexto, preferências e a entrada do usuário"""
+        # Histórico limitado da conversa (resumo + últimos turnos), estável entre chamadas da sessão
+        history = self.get_memory(state.get("session_id", DEFAULT_SESSION), state.get("namespace")).get_messages()
+        
+        # Partes dinâmicas ficam no final para preservar o prefixo estático
+        context_str = format_context(state["context"])
+        context_content = "Contexto disponível:\n" + context_str if context_str else "Nenhum contexto relevante disponível."
+        dynamic_content = f"{context_content}\n{format_preferences(state['preferences'])}"
+        if state["intent"] == "fact":
+            dynamic_content += f"\n{FACT_VERDICTS[verdict]}"
+        
+        # Mensagem do usuário
+        user_message = HumanMessage(content=state["input"])
+        return [*history, HumanMessage(content=dynamic_content), user_message]
+
+    def start_speculation(self, state: ChatState) -> None:
+        """Inicia a geração das duas respostas possíveis a um fato enquanto ele é validado"""
+        prefix = self.prefixes["generate_response"]
+        llm = self.llm_for("generate_response")
+        generation = state.get("generation", {})
+        # As preferências não mudam para fatos; usar os valores finais já conhecidos
+        speculative_state = {**state, "preferences": self.default_preferences}
+        # As candidatas são geradas em outras threads, mas na pista da requisição
+        request_lane = current_lane()
+        candidates = {}
+        for verdict in (True, False):
+            messages = self.response_messages(speculative_state, verdict)
+            tokens = self.record_prompt_tokens(state, "generate_response", [*prefix.messages, *messages])
+            candidate = SpeculativeGeneration()
+            candidates[verdict] = candidate.start(
+                lambda candidate=candidate, messages=messages, tokens=tokens: self.guard.call(
+                    lambda: candidate.consume(stream_with_prefix(llm, prefix, messages, **generation)),
+                    tokens=tokens,
+                    node="generate_response",
+                    model=generation.get("model") or self.node_models.get("generate_response", ""),
+                    lane=request_lane,
+                    can_retry=candidate.can_retry
+                )
             )
-            
-            final_state = self.workflow.invoke(initial_state)
-            
-            if final_state.get("error"):
-                logger.error(f"Processamento de mensagem falhou: {final_state['error']}")
-                return {
-                    "response": f"Desculpe, ocorreu um erro ao processar sua mensagem: {final_state['error']}",
-                    "is_valid": False,
-                    "error": final_state["error"],
-                    "intent": final_state.get("intent", ""),
-                    "preferences": final_state.get("preferences", {})
-                }
-            
-            logger.info("Processamento de mensagem concluído com sucesso")
-            return {
-                "response": final_state["response"],
-                "is_valid": final_state["is_valid"],
-                "error": None,
-                "intent": final_state["intent"],
-                "preferences": final_state["preferences"]
-            }
-        except Exception as e:
-            error_msg = f"Erro ao processar mensagem: {e}"
-            logger.error(error_msg)
+        metrics.inc("speculative_responses_total", 2, outcome="started")
+        self.speculations.put(state["request_id"], candidates)
+
+    def validate_fact_batch(self, facts: List[str]) -> List[bool]:
+        """Valida vários fatos pendentes em uma única chamada ao LLM"""
+        prefix = self.prefixes["validate_fact_batch"]
+        human_message = HumanMessage(content=format_numbered(facts))
+        result = self.guard.call(
+            lambda: invoke_with_prefix(self.llm_for("validate_fact_batch"), prefix, [human_message]),
+            tokens=prefix.tokens + count_message_tokens([human_message]),
+            node="validate_fact_batch",
+            model=self.node_models.get("validate_fact_batch", ""),
+            lane=VALIDATION
+        )
+        return parse_numbered_verdicts(result.content, len(facts))
+
+    def ingest_facts(self, facts: List[str], namespace: Optional[str] = None, batch_size: int = 64) -> List[str]:
+        """Ingestão em lote: armazena os fatos como pendentes e os envia à validação em segundo plano
+
+        Os embeddings são calculados na pista de ingestão, um lote por vez, para que as mensagens
+        do chat passem à frente entre os lotes.
+        """
+        ids = []
+        with lane(INGESTION):
+            for start in range(0, len(facts), batch_size):
+                batch = facts[start:start + batch_size]
+                batch_ids = [uuid.uuid4().hex for _ in batch]
+                self.shards.shard(namespace).add_documents(
+                    [Document(page_content=fact, metadata={"type": "fact", "status": "pending"}) for fact in batch],
+                    ids=batch_ids
+                )
+                for doc_id, fact in zip(batch_ids, batch):
+                    self.pending_namespaces[doc_id] = namespace
+                    self.fact_validator.submit(doc_id, fact)
+                ids.extend(batch_ids)
+        metrics.inc("facts_ingested_total", len(ids))
+        logger.info(f"{len(ids)} fatos ingeridos como pendentes")
+        return ids
+
+    def pending_by_shard(self, ids: List[str]) -> Dict[Optional[str], List[str]]:
+        """Agrupa fatos pendentes pelo namespace em que foram armazenados"""
+        groups: Dict[Optional[str], List[str]] = {}
+        for doc_id in ids:
+            groups.setdefault(self.pending_namespaces.get(doc_id), []).append(doc_id)
+        return groups
+
+    def promote_facts(self, ids: List[str]) -> None:
+        """Marca fatos pendentes como validados, sem recalcular os embeddings"""
+        for namespace, shard_ids in self.pending_by_shard(ids).items():
+            metadatas = [{"type": "fact", "status": "validated"} for _ in shard_ids]
+            update_metadatas(self.shards.shard(namespace), shard_ids, metadatas)
+            # Removidos só após a gravação: se ela falhar, a nova tentativa usa o mesmo namespace
+            self.forget_pending(shard_ids)
+
+    def reject_facts(self, ids: List[str]) -> None:
+        """Remove fatos pendentes reprovados na validação"""
+        for namespace, shard_ids in self.pending_by_shard(ids).items():
+            self.shards.shard(namespace).delete(ids=shard_ids)
+            self.forget_pending(shard_ids)
+
+    def forget_pending(self, ids: List[str]) -> None:
+        for doc_id in ids:
+            self.pending_namespaces.pop(doc_id, None)
+
+    def call_llm(self, state: ChatState, node: str, messages: List, **kwargs):
+        """Invoca o LLM com o prefixo estático do nó seguido das mensagens dinâmicas
+
+        kwargs (temperature, max_tokens, model) valem apenas para esta chamada; o cliente não é alterado.
+        """
+        deadline = state.get("deadline")
+        if self.degraded_mode:
+            self.check_budget(state, node)
+        if deadline is not None:
+            # Cada tentativa também não passa do prazo restante
+            kwargs = {**kwargs, "timeout": max(0.0, deadline - time.monotonic())}
+        prefix = self.prefixes[node]
+        tokens = self.record_prompt_tokens(state, node, [*prefix.messages, *messages])
+        llm = self.llm_for(node)
+        # A duplicata do hedging roda em outra thread; a pista é fixada aqui
+        request_lane = current_lane()
+
+        def invoke():
+            start = time.perf_counter()
+            result = invoke_with_prefix(llm, prefix, messages, **kwargs)
+            # Latência do provedor, sem fila nem retentativas (reproduzida pelo replay de tráfego)
+            state.setdefault("llm_seconds", {})[node] = time.perf_counter() - start
+            return result
+
+        def call():
+            return self.guard.call(
+                invoke,
+                tokens=tokens,
+                node=node,
+                model=kwargs.get("model") or self.node_models.get(node, ""),
+                deadline=deadline,
+                lane=request_lane
+            )
+
+        # Chamadas curtas de classificação podem ser duplicadas para cortar a cauda de latência
+        if node in self.hedged_nodes:
+            return get_hedger().call(call, node)
+        return call()
+
+    def check_budget(self, state: ChatState, node: str) -> None:
+        """Evita chamar o LLM numa requisição já degradada ou sem tempo para uma resposta"""
+        if state.get("degraded"):
+            raise DegradedModeError(state["degraded"])
+        deadline = state.get("deadline")
+        if deadline is not None and deadline - time.monotonic() < self.degraded_min_budget:
+            raise DeadlineExceededError(f"Tempo restante insuficiente para chamar o LLM em {node}")
+
+    def degrade(self, state: ChatState, error: Exception) -> bool:
+        """Marca a requisição como degradada se o erro indicar LLM lento ou indisponível"""
+        reason = degraded_reason(error) if self.degraded_mode else None
+        if reason is None:
+            return False
+        if not state.get("degraded"):
+            logger.warning(f"Respondendo em modo degradado ({reason}): {error}")
+            state["degraded"] = reason
+            metrics.inc("degraded_responses_total", reason=reason)
+        return True
+
+    def record_prompt_tokens(self, state: ChatState, node: str, messages: List) -> int:
+        """Registra no estado o número de tokens do prompt enviado por um nó"""
+        tokens = count_message_tokens(messages)
+        state.setdefault("prompt_tokens", {})[node] = tokens
+        logger.info(f"Tokens de prompt em {node}: {tokens}")
+        return tokens
+
+    def summarize_history(self, summary: str, turns: List[Turn]) -> str:
+        """Incorpora turnos antigos ao resumo da conversa"""
+        turns_str = "\n".join([
+            f"Usuário: {user}\nAssistente: {assistant}"
+            for user, assistant in turns
+        ])
+        human_message = HumanMessage(
+            content=f"Resumo atual: {summary or 'vazio'}\n\nNovos turnos:\n{turns_str}"
+        )
+        prefix = self.prefixes["summarize_history"]
+        result = self.guard.call(
+            lambda: invoke_with_prefix(self.llm_for("summarize_history"), prefix, [human_message]),
+            tokens=prefix.tokens + count_message_tokens([human_message]),
+            node="summarize_history",
+            model=self.node_models.get("summarize_history", ""),
+            lane=SUMMARIZATION
+        )
+        return result.content
+
+    def close(self) -> None:
+        """Persiste as sessões em memória (chamado no encerramento do processo)"""
+        self.sessions.close()
+        if self.traffic_recorder:
+            self.traffic_recorder.close()
+        if self.tiering:
+            self.tiering.close()
+        self.shards.close()
+        self.close_vector_store(self.vector_store)
+        if self.store_lock:
+            self.store_lock.close()
+
+    @staticmethod
+    def close_vector_store(store) -> None:
+        # O Chroma não mantém arquivos abertos por coleção; o índice exato mantém o log e o mapeamento
+        if isinstance(store, ExactVectorStore):
+            store.close()
+
+    def create_memory(self) -> ConversationMemory:
+        return ConversationMemory(
+            summarizer=self.summarize_history,
+            max_turns=settings.MEMORY_MAX_TURNS,
+            max_tokens=settings.MEMORY_MAX_TOKENS,
+            summary_max_tokens=settings.MEMORY_SUMMARY_MAX_TOKENS
+        )
+
+    def get_memory(self, session_id: str = DEFAULT_SESSION, namespace: Optional[str] = None) -> ConversationMemory:
+        """Retorna a memória de conversa da sessão no namespace, restaurando-a ou criando-a se necessário"""
+        return self.sessions.get(session_key(session_id, namespace))
+
+    def create_initial_state(
+        self,
+        message: str,
+        session_id: str = DEFAULT_SESSION,
+        include_pending: bool = False,
+        options: Optional[GenerationOptions] = None,
+        namespace: Optional[str] = None,
+        request_id: Optional[str] = None
+    ) -> ChatState:
+        return ChatState(
+            input=message,
+            intent="",
+            is_valid=False,
+            response="",
+            error=None,
+            preferences=self.default_preferences.copy(),
+            context=[],
+            prompt_tokens={},
+            llm_seconds={},
+            session_id=session_id,
+            request_id=request_id or uuid.uuid4().hex,
+            pending=False,
+            include_pending=include_pending,
+            generation=options.to_kwargs() if options else {},
+            namespace=namespace,
+            deadline=time.monotonic() + self.request_deadline if self.request_deadline > 0 else None,
+            degraded=None
+        )
+
+    def build_result(self, final_state: ChatState, session_id: str = DEFAULT_SESSION, record: bool = True,
+                     namespace: Optional[str] = None) -> Dict:
+        """Converte o estado final do grafo no resultado retornado ao chamador
+
+        record registra o turno na memória da sessão (falso ao devolver uma requisição já concluída).
+        """
+        if final_state.get("error"):
+            logger.error(f"Processamento de mensagem falhou: {final_state['error']}")
             return {
-                "response": f"Desculpe, ocorreu um erro ao processar sua mensagem: {error_msg}",
+                "response": f"Desculpe, ocorreu um erro ao processar sua mensagem: {final_state['error']}",
                 "is_valid": False,
-                "error": str(e),
-                "intent": "",
-                "preferences": self.default_preferences.copy()
+                "error": final_state["error"],
+                "intent": final_state.get("intent", ""),
+                "preferences": final_state.get("preferences", {}),
+                "prompt_tokens": final_state.get("prompt_tokens", {}),
+                "llm_seconds": final_state.get("llm_seconds", {}),
+                "request_id": final_state.get("request_id")
             }
+        
+        if record:
+            self.sessions.update(
+                session_key(session_id, namespace),
+                lambda memory: memory.add_turn(final_state["input"], final_state["response"])
+            )
+        
+        logger.info("Processamento de mensagem concluído com sucesso")
+        return {
+            "response": final_state["response"],
+            "is_valid": final_state["is_valid"],
+            "error": None,
+            "intent": final_state["intent"],
+            "preferences": final_state["preferences"],
+            "prompt_tokens": final_state.get("prompt_tokens", {}),
+            "llm_seconds": final_state.get("llm_seconds", {}),
+            "pending": final_state.get("pending", False),
+            "degraded": bool(final_state.get("degraded")),
+            "degraded_reason": final_state.get("degraded"),
+            "request_id": final_state.get("request_id")
+        }
+
+    def error_result(self, e: Exception, request_id: Optional[str] = None) -> Dict:
+        """Resultado de uma falha; com checkpoints, repetir o request_id retoma do nó que falhou"""
+        error_msg = f"Erro ao processar mensagem: {e}"
+        logger.error(error_msg)
+        return {
+            "response": f"Desculpe, ocorreu um erro ao processar sua mensagem: {error_msg}",
+            "is_valid": False,
+            "error": str(e),
+            "intent": "",
+            "preferences": self.default_preferences.copy(),
+            "prompt_tokens": {},
+            "llm_seconds": {},
+            "pending": False,
+            "degraded": False,
+            "degraded_reason": None,
+            "request_id": request_id
+        }
+
+    def profile_request(self, request_id: str, profile: bool, request_scope: bool = True):
+        return profile_request(
+            request_id,
+            profile or self.profiling,
+            settings.PROFILING_DIRECTORY,
+            request_scope=request_scope,
+            interval=settings.PROFILING_INTERVAL_MS / 1000,
+            top=settings.PROFILING_TOP_ALLOCATIONS
+        )
+
+    def workflow_input(self, state: ChatState) -> Tuple[Optional[ChatState], Optional[Dict], Optional[ChatState]]:
+        """Entrada e configuração do grafo para a requisição
+
+        Retorna (entrada, config, estado final gravado). Com checkpoints, uma requisição interrompida
+        é retomada do nó que falhou (entrada None) e uma já concluída devolve o estado gravado.
+        """
+        if self.checkpointer is None:
+            return state, None, None
+        request_id = state["request_id"]
+        thread_id = checkpoint_thread_id(state)
+        config = {"configurable": {"thread_id": thread_id}}
+        self.checkpoint_expiry.prune()
+        self.checkpoint_expiry.touch(thread_id)
+        snapshot = self.workflow.get_state(config)
+        if not snapshot.values:
+            return state, config, None
+        if snapshot.values.get("input") != state["input"]:
+            # Mesmo request_id com outra mensagem: não é uma nova tentativa; executar do início
+            logger.warning(f"Requisição {request_id} repetida com outra mensagem; checkpoint ignorado")
+            metrics.inc("graph_checkpoint_conflicts_total")
+            return state, config, None
+        if not snapshot.next:
+            logger.info(f"Requisição {request_id} já concluída; devolvendo o resultado gravado")
+            metrics.inc("graph_checkpoint_replays_total")
+            return None, config, snapshot.values
+        logger.info(f"Retomando a requisição {request_id} a partir de {snapshot.next[0]}")
+        metrics.inc("graph_checkpoint_resumes_total", node=snapshot.next[0])
+        # Prazo, modo degradado e opções de geração valem para a nova tentativa
+        self.workflow.update_state(config, {
+            "deadline": state["deadline"],
+            "degraded": None,
+            "generation": state["generation"]
+        })
+        return None, config, None
+
+    def process_message(
+        self,
+        message: str,
+        session_id: str = DEFAULT_SESSION,
+        include_pending: bool = False,
+        options: Optional[GenerationOptions] = None,
+        namespace: Optional[str] = None,
+        profile: bool = False,
+        request_id: Optional[str] = None
+    ) -> Dict:
+        """Processa uma mensagem e retorna a resposta
+
+        include_pending inclui fatos ainda não validados no contexto; options ajusta a geração da resposta;
+        namespace (tenant ou usuário) isola os fatos armazenados, consultados junto com a coleção global;
+        profile grava o perfil de CPU e memória de cada nó (ver src/profiling.py); request_id identifica
+        a requisição para que uma nova tentativa retome do checkpoint (ver src/checkpointing.py).
+        """
+        initial_state = self.create_initial_state(message, session_id, include_pending, options, namespace, request_id)
+        arrival = self.traffic_recorder.now() if self.traffic_recorder else 0.0
+        start = time.perf_counter()
+        try:
+            logger.info("Iniciando processamento de mensagem")
+            graph_input, config, completed = self.workflow_input(initial_state)
+            if completed is not None:
+                return self.build_result(completed, session_id, record=False, namespace=namespace)
+            with self.profile_request(initial_state["request_id"], profile):
+                final_state = self.workflow.invoke(graph_input, config)
+            result = self.build_result(final_state, session_id, namespace=namespace)
+        except Exception as e:
+            result = self.error_result(e, initial_state["request_id"])
+        finally:
+            # Candidatas especulativas não consumidas (ex.: falha antes de generate_response)
+            self.speculations.discard(initial_state["request_id"])
+        self.record_traffic(arrival, time.perf_counter() - start, message, result, session_id, namespace)
+        return result
+
+    def record_traffic(self, arrival: float, seconds: float, message: str, result: Dict, session_id: str,
+                       namespace: Optional[str]) -> None:
+        if self.traffic_recorder is None:
+            return
+        try:
+            # O hash da sessão usa a mesma chave da memória, para não juntar sessões de namespaces diferentes
+            self.traffic_recorder.record(arrival, seconds, message, result, session_key(session_id, namespace), namespace)
+        except Exception as e:
+            logger.error(f"Erro ao gravar tráfego: {e}")
+
+    def stream_message(
+        self,
+        message: str,
+        session_id: str = DEFAULT_SESSION,
+        include_pending: bool = False,
+        options: Optional[GenerationOptions] = None,
+        namespace: Optional[str] = None,
+        profile: bool = False,
+        request_id: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """Processa uma mensagem emitindo os tokens da resposta à medida que são gerados"""
+        initial_state = self.create_initial_state(message, session_id, include_pending, options, namespace, request_id)
+        arrival = self.traffic_recorder.now() if self.traffic_recorder else 0.0
+        start = time.perf_counter()
+        try:
+            logger.info("Iniciando processamento de mensagem com streaming")
+            graph_input, config, completed = self.workflow_input(initial_state)
+            if completed is not None:
+                yield {"type": "result", **self.build_result(completed, session_id, record=False, namespace=namespace)}
+                return
+            final_state = initial_state
+            # O gerador pode ser retomado em outra thread; apenas os nós são perfilados
+            with self.profile_request(initial_state["request_id"], profile, request_scope=False):
+                for mode, data in self.workflow.stream(graph_input, config, stream_mode=["messages", "values"]):
+                    if mode == "values":
+                        final_state = data
+                        continue
+                    chunk, metadata = data
+                    # Apenas os tokens da resposta final; os nós classificadores não são transmitidos
+                    if metadata.get("langgraph_node") == "generate_response" and chunk.content:
+                        yield {"type": "token", "content": chunk.content}
+            result = self.build_result(final_state, session_id, namespace=namespace)
+        except Exception as e:
+            result = self.error_result(e, initial_state["request_id"])
+        finally:
+            self.speculations.discard(initial_state["request_id"])
+        # Gravado antes do último evento, mesmo que o cliente pare de ler depois dele
+        self.record_traffic(arrival, time.perf_counter() - start, message, result, session_id, namespace)
+        yield {"type": "result", **result}
@@ -0,0 +1,97 @@
+"""Checkpoints do grafo por requisição, para que uma nova tentativa retome do nó que falhou
+
+Cada requisição é uma thread do LangGraph identificada pelo request_id, dentro da sessão e do
+namespace da requisição (um request_id de outra sessão não enxerga o resultado). Com checkpoints
+ativos, um nó que termina com erro interrompe a execução sem gravar seu resultado; ao
+repetir a mesma requisição, o grafo continua desse nó reaproveitando as saídas anteriores
+(intenção, validação, contexto). Requisições concluídas devolvem o resultado gravado.
+"""
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class NodeFailedError(Exception):
+    """Um nó do grafo terminou com erro; a requisição pode ser retomada a partir dele"""
+
+    def __init__(self, node: str, error: str):
+        super().__init__(error)
+        self.node = node
+
+
+def create_checkpointer(backend: str, sqlite_path: str = "") -> Optional[Any]:
+    """Checkpointer do LangGraph (None quando desativado)"""
+    if backend == "none":
+        return None
+    if backend == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+    if backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise ImportError("O checkpoint 'sqlite' requer o pacote langgraph-checkpoint-sqlite") from e
+        import os
+        import sqlite3
+        directory = os.path.dirname(sqlite_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return SqliteSaver(sqlite3.connect(sqlite_path, check_same_thread=False))
+    raise ValueError(f"Backend de checkpoint desconhecido: {backend}")
+
+
+class CheckpointExpiry:
+    """Remove as threads de requisições antigas do checkpointer
+
+    Apenas as requisições vistas por este processo são acompanhadas; no SQLite, as de
+    execuções anteriores permanecem até serem removidas externamente.
+    """
+
+    def __init__(self, checkpointer: Any, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.checkpointer = checkpointer
+        self.ttl = ttl
+        self._clock = clock
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, request_id: str) -> None:
+        with self._lock:
+            self._seen[request_id] = self._clock()
+            self._seen.move_to_end(request_id)
+
+    def prune(self) -> int:
+        """Remove as requisições sem uso dentro do TTL; retorna quantas foram removidas"""
+        cutoff = self._clock() - self.ttl
+        expired = []
+        with self._lock:
+            while self._seen:
+                request_id, seen_at = next(iter(self._seen.items()))
+                if seen_at >= cutoff:
+                    break
+                self._seen.popitem(last=False)
+                expired.append(request_id)
+        for request_id in expired:
+            try:
+                self.checkpointer.delete_thread(request_id)
+            except Exception as e:
+                logger.error(f"Erro ao remover checkpoint da requisição {request_id}: {e}")
+        return len(expired)
+
+
+def resumable(fn: Callable) -> Callable:
+    """Com checkpoints ativos, converte o erro registrado pelo nó em exceção
+
+    Assim o LangGraph não grava o estado do nó que falhou e a nova tentativa o executa de novo.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, state, *args, **kwargs):
+        result = fn(self, state, *args, **kwargs)
+        if self.checkpointer is not None and result.get("error"):
+            raise NodeFailedError(fn.__name__, result["error"])
+        return result
+    return wrapper
@@ -1,10 +1,151 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    GROQ_API_KEY: str
+    GROQ_API_KEY: str = ""
+    LLM_BACKEND: str = "groq"  # groq | openai | fake
+    OPENAI_BASE_URL: str = "http://localhost:8080/v1"
+    OPENAI_API_KEY: str = "not-needed"
+    FAKE_LLM_LATENCY: str = "lognormal"  # fixed | uniform | normal | lognormal
+    FAKE_LLM_MEAN_MS: float = 300.0
+    FAKE_LLM_STDDEV_MS: float = 100.0
+    FAKE_LLM_TOKENS_PER_SECOND: float = 200.0
+    FAKE_LLM_ERROR_RATE: float = 0.0
+    FAKE_LLM_RESPONSE_TOKENS: int = 60
+    FAKE_LLM_SEED: int = 0
     MODEL_NAME: str = "mixtral-8x7b-32768"
     TEMPERATURE: float = 0.7
+    # Roteamento de modelos por nó (modelo vazio = MODEL_NAME; 0 = sem limite de tokens de saída)
+    PROCESS_INPUT_MODEL: str = ""
+    PROCESS_INPUT_MAX_TOKENS: int = 5
+    VALIDATE_FACT_MODEL: str = ""
+    VALIDATE_FACT_MAX_TOKENS: int = 3
+    VALIDATE_FACT_BATCH_MODEL: str = ""
+    VALIDATE_FACT_BATCH_MAX_TOKENS: int = 0
+    UPDATE_PREFERENCES_MODEL: str = ""
+    UPDATE_PREFERENCES_MAX_TOKENS: int = 64
+    GENERATE_RESPONSE_MODEL: str = ""
+    GENERATE_RESPONSE_MAX_TOKENS: int = 0
+    SUMMARIZE_HISTORY_MODEL: str = ""
+    SUMMARIZE_HISTORY_MAX_TOKENS: int = 256
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Processos dedicados ao modelo de embeddings (0 = no processo da aplicação); os vetores voltam
+    # por memória compartilhada. EMBEDDING_MAX_CONCURRENCY deve acompanhar o número de workers
+    EMBEDDING_WORKERS: int = 0
+    EMBEDDING_WORKER_BATCH_SIZE: int = 32
+    EMBEDDING_WORKER_THREADS: int = 1
+    CHROMA_PERSIST_DIRECTORY: str = "data/chromadb"
+    # Coleção e índice HNSW (padrões do Chroma); mudar distância, M ou ef_construction exige reconstrução
+    CHROMA_COLLECTION_NAME: str = "langchain"
+    CHROMA_DISTANCE: str = "l2"  # l2 | cosine | ip
+    CHROMA_HNSW_M: int = 16
+    CHROMA_HNSW_EF_CONSTRUCTION: int = 100
+    # 0 mantém o ef_search da coleção (100 na criação, ou o definido com `vector_index set-ef-search`);
+    # outro valor é aplicado a cada inicialização
+    CHROMA_HNSW_EF_SEARCH: int = 0
+    # chroma | exact (índice NumPy com busca exata, indicado até algumas centenas de milhares de fatos)
+    VECTOR_STORE_BACKEND: str = "chroma"
+    EXACT_INDEX_DIRECTORY: str = "data/exact_index"
+    EXACT_INDEX_COMPACT_RATIO: float = 0.25
+    # Coleções por namespace (tenant ou usuário) abertas simultaneamente; as menos usadas são fechadas
+    NAMESPACE_MAX_OPEN_SHARDS: int = 128
+    # Limite dos índices HNSW carregados pelo Chroma (LRU entre coleções); 0 mantém todos em memória
+    CHROMA_MEMORY_LIMIT_BYTES: int = 0
+    # Camadas quente/fria: fatos sem acesso dentro do TTL são arquivados e consultados só como recurso
+    FACT_TIERING_ENABLED: bool = False
+    FACT_HOT_TTL: float = 30 * 24 * 3600.0
+    # Similaridade de cosseno mínima na camada quente antes de consultar a fria (igual nos dois backends)
+    FACT_TIERING_MIN_RELEVANCE: float = 0.25
+    FACT_TIERING_SWEEP_INTERVAL: float = 3600.0
+    MEMORY_MAX_TURNS: int = 6
+    MEMORY_MAX_TOKENS: int = 1024
+    MEMORY_SUMMARY_MAX_TOKENS: int = 256
+    UI_MAX_MESSAGES: int = 200
+    UI_HISTORY_PAGE_SIZE: int = 20
+    MAX_SESSIONS: int = 1000
+    SESSION_IDLE_TTL: float = 1800.0
+    SESSION_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_OFFLOAD_DIRECTORY: str = "data/sessions"
+    SESSION_SWEEP_INTERVAL: float = 30.0
+    API_MAX_CONCURRENCY: int = 16
+    API_MAX_QUEUE: int = 64
+    API_QUEUE_TIMEOUT: float = 5.0
+    # Cabeçalho com o namespace do chamador autenticado, definido pelo proxy de autenticação (ex.: X-Tenant-Id);
+    # quando configurado, o "namespace" do corpo não é aceito
+    API_NAMESPACE_HEADER: str = ""
+    CHATBOT_API_URL: str = ""  # se definido, o app Streamlit usa a API como cliente
+    CONTEXT_K: int = 3
+    CONTEXT_TOKEN_BUDGET: int = 512
+    LLM_REQUEST_TIMEOUT: float = 30.0
+    LLM_REQUESTS_PER_MINUTE: int = 0  # 0 = sem limite
+    LLM_TOKENS_PER_MINUTE: int = 0  # 0 = sem limite
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_QUEUE_TIMEOUT: float = 10.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    # Escalonador do LLM e dos embeddings: a pista interativa passa à frente das de fundo, que
+    # dividem a capacidade por peso (WFQ); limites por pista (ausente = capacidade do recurso)
+    SCHEDULER_LANE_WEIGHTS: str = "interactive=8,ingestion=2,validation=1,summarization=1"
+    SCHEDULER_LANE_LIMITS: str = "ingestion=2,validation=2,summarization=1"
+    SCHEDULER_INTERACTIVE_RESERVED: int = 1
+    EMBEDDING_MAX_CONCURRENCY: int = 2
+    EMBEDDING_QUEUE_TIMEOUT: float = 30.0
+    # Prazo total de cada mensagem (0 = sem prazo); limita a fila e as retentativas do LLM
+    REQUEST_DEADLINE_SECONDS: float = 0.0
+    # Modo degradado: sem LLM (prazo esgotando ou provedor indisponível), responder a partir do contexto
+    DEGRADED_MODE_ENABLED: bool = True
+    DEGRADED_MIN_BUDGET_SECONDS: float = 2.0
+    # Extração de preferências: local (léxico, com o LLM para baixa confiança) ou llm (sempre o LLM)
+    PREFERENCE_EXTRACTOR: str = "local"  # local | llm
+    PREFERENCE_MIN_CONFIDENCE: float = 0.6
+    # Perfil por requisição (CPU amostrada e tracemalloc por nó); também pode ser pedido por mensagem
+    PROFILING_ENABLED: bool = False
+    PROFILING_DIRECTORY: str = "data/profiles"
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_TOP_ALLOCATIONS: int = 25
+    # Atende "profile" no corpo das requisições da API (o tracemalloc vale para o processo inteiro)
+    PROFILING_ALLOW_PER_REQUEST: bool = False
+    # Checkpoints do grafo por request_id: uma nova tentativa retoma do nó que falhou
+    CHECKPOINT_BACKEND: str = "none"  # none | memory | sqlite
+    CHECKPOINT_SQLITE_PATH: str = "data/checkpoints.sqlite"
+    CHECKPOINT_TTL: float = 3600.0
+    # Gravação anonimizada do tráfego ("{pid}" = um arquivo por processo; .gz comprime)
+    TRAFFIC_RECORD_ENABLED: bool = False
+    TRAFFIC_RECORD_PATH: str = "data/traffic/trace-{pid}.jsonl.gz"
+    TRAFFIC_RECORD_SALT: str = ""  # vazio = sal aleatório por processo
+    TRAFFIC_RECORD_SAMPLE_RATE: float = 1.0
+    LLM_PREFIX_CACHE: str = "none"  # none | slot
+    LLM_PREFIX_CACHE_SLOTS: int = 4
+
+    # Requisições duplicadas (hedging) para as chamadas curtas de classificação
+    HEDGE_ENABLED: bool = False
+    HEDGE_NODES: str = "process_input,validate_fact"
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_BUDGET_RATIO: float = 0.1
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_WINDOW: int = 200
+
+    # Gera as respostas candidatas de fatos (validado / não validado) em paralelo à validação
+    SPECULATIVE_FACT_RESPONSES: bool = False
+
+    # Armazena fatos como pendentes e os valida em lotes em segundo plano
+    DEFERRED_FACT_VALIDATION: bool = False
+    FACT_VALIDATION_BATCH_SIZE: int = 8
+    FACT_VALIDATION_WORKERS: int = 2
+    FACT_VALIDATION_BATCH_WAIT: float = 0.5
+    # Espera antes de repetir um lote que falhou (dobra a cada falha seguida, até o máximo)
+    FACT_VALIDATION_RETRY_BACKOFF: float = 1.0
+    FACT_VALIDATION_MAX_BACKOFF: float = 60.0
+    
+    @model_validator(mode="after")
+    def check_backend_credentials(self):
+        """Falha na inicialização se o backend Groq for usado sem chave de API"""
+        if self.LLM_BACKEND == "groq" and not self.GROQ_API_KEY.strip():
+            raise ValueError("GROQ_API_KEY é obrigatória quando LLM_BACKEND=groq")
+        return self
     
     class Config:
         env_file = ".env"
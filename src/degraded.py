@@ -0,0 +1,108 @@
+"""Modo degradado: respostas sem LLM quando o provedor está lento ou indisponível
+
+Perguntas são respondidas de forma extrativa a partir dos documentos recuperados por
+get_context; fatos e preferências recebem confirmações prontas. A intenção, quando o
+classificador não responde, é estimada por heurísticas simples.
+"""
+import re
+from typing import Dict, List, Optional
+
+from src.resilience import CircuitOpenError, DeadlineExceededError, LLMSaturatedError, is_retryable
+
+
+class DegradedModeError(Exception):
+    """A requisição já está em modo degradado; o LLM não é chamado novamente"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Requisição em modo degradado ({reason})")
+        self.reason = reason
+
+
+# Confirmações usadas quando não há resposta do LLM
+DEGRADED_ACKS = {
+    "fact": "Obrigado! Registrei essa informação.",
+    "invalid_fact": "Não consegui confirmar essa informação, então ela não foi registrada.",
+    "preference": "Anotei sua preferência. No momento estou respondendo de forma simplificada, "
+                  "mas vou considerá-la nas próximas respostas.",
+    "feedback": "Obrigado pelo retorno!",
+    "no_context": "No momento não consigo elaborar uma resposta completa e não encontrei "
+                  "informações sobre isso no que já sei. Por favor, tente novamente em instantes.",
+}
+
+EXTRACTIVE_HEADER = "No momento estou respondendo de forma simplificada. Encontrei o seguinte no que já sei:"
+
+QUESTION_WORDS = {
+    "que", "quê", "qual", "quais", "quem", "quando", "onde", "como", "quanto", "quanta",
+    "quantos", "quantas", "por", "porque", "será", "existe", "há", "pode", "você",
+}
+PREFERENCE_MARKERS = ("prefiro", "preferência", "gostaria que", "quero que", "seja mais", "responda", "fale")
+FEEDBACK_MARKERS = ("obrigad", "gostei", "valeu", "ótima resposta", "boa resposta", "não gostei", "errou")
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "é", "em", "no", "na", "nos", "nas",
+    "um", "uma", "que", "qual", "quais", "quem", "como", "onde", "quando", "por", "para", "com", "se",
+}
+
+
+def degraded_reason(error: Exception) -> Optional[str]:
+    """Motivo para responder em modo degradado, ou None se o erro não for de indisponibilidade do provedor"""
+    if isinstance(error, DegradedModeError):
+        return error.reason
+    if isinstance(error, DeadlineExceededError):
+        return "deadline"
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, LLMSaturatedError):
+        return "saturated"
+    if is_retryable(error):
+        return "provider_error"
+    return None
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def guess_intent(text: str) -> str:
+    """Intenção estimada sem o classificador"""
+    lowered = text.lower().strip()
+    if any(marker in lowered for marker in FEEDBACK_MARKERS):
+        return "feedback"
+    if any(marker in lowered for marker in PREFERENCE_MARKERS):
+        return "preference"
+    tokens = words(lowered)
+    if lowered.endswith("?") or (tokens and tokens[0] in QUESTION_WORDS):
+        return "question"
+    return "fact"
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+|\n+", text) if sentence.strip()]
+
+
+def extractive_answer(question: str, context: List[Dict], max_sentences: int = 2) -> str:
+    """Resposta composta pelas frases dos documentos recuperados com mais termos em comum com a pergunta
+
+    Os documentos já vêm ordenados por relevância; o primeiro é usado mesmo sem termos em comum.
+    """
+    if not context:
+        return DEGRADED_ACKS["no_context"]
+    terms = {word for word in words(question) if word not in STOPWORDS}
+    scored = []
+    for doc in context:
+        for sentence in split_sentences(doc["content"]):
+            overlap = len(terms & set(words(sentence)))
+            scored.append((overlap, sentence))
+    # Ordenação estável: em caso de empate, vale a ordem de relevância dos documentos
+    best = [item for item in sorted(scored, key=lambda item: -item[0]) if item[0] > 0][:max_sentences]
+    sentences = [sentence for _, sentence in best] or split_sentences(context[0]["content"])[:1]
+    return EXTRACTIVE_HEADER + "\n" + "\n".join(f"- {sentence}" for sentence in sentences)
+
+
+def degraded_response(intent: str, question: str, context: List[Dict], is_valid: bool = False) -> str:
+    """Resposta sem LLM para a intenção"""
+    if intent == "question":
+        return extractive_answer(question, context)
+    if intent == "fact":
+        return DEGRADED_ACKS["fact" if is_valid else "invalid_fact"]
+    return DEGRADED_ACKS.get(intent, DEGRADED_ACKS["feedback"])
@@ -0,0 +1,199 @@
+"""Embeddings calculados num pool de processos, com os vetores devolvidos por memória compartilhada
+
+No processo da aplicação, a tokenização e o código Python em volta do modelo seguram o GIL,
+então sessões simultâneas se revezam no embedding. Com EMBEDDING_WORKERS > 0, cada worker é um
+processo que carrega o modelo uma única vez. Os lotes de textos são divididos em pedaços
+distribuídos entre os workers. Cada worker escreve a matriz float32 num buffer de memória
+compartilhada do pool, em vez de devolver listas serializadas com pickle.
+
+O pool implementa a interface Embeddings (a mesma usada pelo Chroma e pelo índice exato) e
+é iniciado no primeiro uso em cada processo. Assim, um pool pré-carregado no mestre do
+gunicorn é recriado em cada worker após o fork.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FLOAT_BYTES = np.dtype(np.float32).itemsize
+
+# Estado de cada processo worker
+_model: Optional[Embeddings] = None
+_attached: Dict[str, SharedMemory] = {}
+
+
+def load_huggingface(model_name: str) -> Embeddings:
+    """Carrega o modelo sentence-transformers no worker (função de módulo, serializável)"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={'device': 'cpu'})
+
+
+def _init_worker(factory: Callable[[], Embeddings], threads: int) -> None:
+    global _model
+    if threads > 0:
+        try:
+            import torch
+            # Sem isso, cada worker usa todos os núcleos e eles disputam a CPU entre si
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    _model = factory()
+
+
+def _embed_into(texts: List[str], buffer_name: str) -> Tuple[int, int]:
+    """Calcula os embeddings no worker e os escreve no buffer compartilhado; retorna o formato"""
+    vectors = np.asarray(_model.embed_documents(texts), dtype=np.float32)
+    buffer = _attached.get(buffer_name)
+    if buffer is None:
+        buffer = _attached[buffer_name] = SharedMemory(name=buffer_name)
+    if vectors.nbytes > buffer.size:
+        raise ValueError(f"Embeddings de {vectors.shape} não cabem no buffer de {buffer.size} bytes")
+    np.ndarray(vectors.shape, dtype=np.float32, buffer=buffer.buf)[:] = vectors
+    return vectors.shape
+
+
+class EmbeddingPool(Embeddings):
+    """Modelo de embeddings executado em processos separados
+
+    factory cria o modelo em cada worker e precisa ser serializável (função de módulo ou
+    functools.partial). Cada buffer comporta batch_size vetores de até max_dimension floats.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Embeddings],
+        workers: int = 2,
+        batch_size: int = 32,
+        max_dimension: int = 4096,
+        threads_per_worker: int = 1,
+    ):
+        self.factory = factory
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_dimension = max_dimension
+        self.threads_per_worker = threads_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._buffers: List[SharedMemory] = []
+        self._free: "queue.Queue[SharedMemory]" = queue.Queue()
+        self._pid: Optional[int] = None
+        self._atexit_registered = False
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> Tuple[ProcessPoolExecutor, "queue.Queue[SharedMemory]"]:
+        """Executor e buffers livres do processo atual (os buffers voltam sempre à fila de origem)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._executor is not None:
+                return self._executor, self._free
+            # Após um fork, o executor e os buffers herdados pertencem ao processo pai
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.factory, self.threads_per_worker),
+            )
+            # Dois buffers por worker: um em cálculo e outro sendo lido pelo processo principal
+            size = self.batch_size * self.max_dimension * FLOAT_BYTES
+            self._buffers = [SharedMemory(create=True, size=size) for _ in range(2 * self.workers)]
+            self._free = queue.Queue()
+            for buffer in self._buffers:
+                self._free.put(buffer)
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+            self._pid = os.getpid()
+            logger.info(f"Pool de embeddings iniciado com {self.workers} processos")
+            return self._executor, self._free
+
+    @staticmethod
+    def _collect(
+        item: Tuple[int, "Future[Tuple[int, int]]", SharedMemory], out: List[Any], free: "queue.Queue[SharedMemory]"
+    ) -> None:
+        index, future, buffer = item
+        try:
+            rows, dimension = future.result()
+            out[index] = np.ndarray((rows, dimension), dtype=np.float32, buffer=buffer.buf).tolist()
+        finally:
+            free.put(buffer)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        executor, free = self._ensure_started()
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        out: List[Any] = [None] * len(chunks)
+        pending: Deque[Tuple[int, "Future[Tuple[int, int]]", SharedMemory]] = deque()
+        try:
+            for index, chunk in enumerate(chunks):
+                while True:
+                    try:
+                        # Quem já tem buffers não espera por outros: lê o resultado mais antigo
+                        buffer = free.get_nowait() if pending else free.get()
+                        break
+                    except queue.Empty:
+                        self._collect(pending.popleft(), out, free)
+                try:
+                    future = executor.submit(_embed_into, chunk, buffer.name)
+                except Exception:
+                    free.put(buffer)
+                    raise
+                pending.append((index, future, buffer))
+            while pending:
+                self._collect(pending.popleft(), out, free)
+        except BrokenProcessPool:
+            logger.error("Worker do pool de embeddings terminou inesperadamente; o pool será reiniciado")
+            self._restart(executor)
+            raise
+        finally:
+            # Em caso de erro, os buffers só voltam ao pool depois que os workers terminam de escrever
+            for _, future, buffer in pending:
+                try:
+                    future.exception()
+                finally:
+                    free.put(buffer)
+        metrics.observe("embedding_pool_seconds", time.perf_counter() - start)
+        metrics.inc("embedding_pool_texts_total", len(texts))
+        return [vector for chunk in out for vector in chunk]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        """Descarta o pool quebrado; o próximo uso inicia outro"""
+        with self._lock:
+            if self._executor is executor and self._pid == os.getpid():
+                self._shutdown(wait=False)
+
+    def _shutdown(self, wait: bool) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        for buffer in self._buffers:
+            try:
+                buffer.close()
+            except BufferError:
+                # Ainda lido por outra thread; o segmento é removido mesmo assim
+                pass
+            buffer.unlink()
+        self._buffers = []
+
+    def close(self) -> None:
+        """Encerra os workers e libera a memória compartilhada (apenas no processo que os criou)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                self._shutdown(wait=True)
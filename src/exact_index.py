@@ -0,0 +1,457 @@
+"""Índice vetorial exato em memória (NumPy) para coleções pequenas e médias
+
+Os vetores normalizados ficam numa matriz float32 contígua mapeada do disco e a busca é um
+produto escalar seguido de argpartition. Inclusões só são acrescentadas ao final; remoções
+marcam a linha como apagada até a próxima compactação, que reescreve os arquivos.
+
+    python -m src.exact_index info
+    python -m src.exact_index compact
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+
+
+def matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Avalia um filtro no formato do Chroma ($eq, $ne, $in, $nin, $and, $or)"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq":
+                ok = value == expected
+            elif op == "$ne":
+                ok = value != expected
+            elif op == "$in":
+                ok = value in expected
+            elif op == "$nin":
+                ok = value not in expected
+            else:
+                raise ValueError(f"Operador de filtro não suportado: {op}")
+            if not ok:
+                return False
+    return True
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class ExactVectorStore(VectorStore):
+    """Vector store com busca exata por produto escalar normalizado (similaridade de cosseno)
+
+    Arquivos no diretório: vetores-<geração>.f32 (matriz com folga para crescer),
+    log-<geração>.jsonl (inclusões, remoções e alterações de metadados) e meta.json,
+    cuja troca atômica confirma uma compactação.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Optional[Embeddings],
+        directory: str,
+        compact_ratio: float = 0.25,
+        min_compact_rows: int = 1000,
+        initial_capacity: int = 1024,
+    ):
+        self._embedding = embedding_function
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self.min_compact_rows = min_compact_rows
+        self.initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._count = 0
+        self._garbage = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._log = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    @property
+    def garbage(self) -> int:
+        """Linhas apagadas e registros de log obsoletos ainda não compactados"""
+        with self._lock:
+            return self._garbage
+
+    def _path(self, kind: str, generation: int) -> str:
+        suffix = "f32" if kind == "vetores" else "jsonl"
+        return os.path.join(self.directory, f"{kind}-{generation}.{suffix}")
+
+    def _load(self) -> None:
+        meta_path = os.path.join(self.directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self._generation = meta["generation"]
+        self._dim = meta.get("dim")
+        if self._dim:
+            self._open_matrix()
+        log_path = self._path("log", self._generation)
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última linha incompleta (interrupção durante a escrita)
+                        logger.warning("Registro incompleto ignorado no log do índice exato")
+                        break
+                    self._replay(record)
+        logger.info(f"Índice exato carregado: {len(self._rows)} vetores ({self._garbage} a compactar)")
+
+    def _replay(self, record: Dict[str, Any]) -> None:
+        op = record["op"]
+        if op == "add":
+            self._append_row(record["id"], record["text"], record["metadata"])
+        elif op == "delete":
+            self._delete_row(record["id"])
+        elif op == "update" and record["id"] in self._rows:
+            self._metadatas[self._rows[record["id"]]] = record["metadata"]
+            self._garbage += 1
+
+    def _open_matrix(self) -> None:
+        path = self._path("vetores", self._generation)
+        if not os.path.exists(path):
+            self._resize_file(path, self.initial_capacity)
+        capacity = os.path.getsize(path) // (self._dim * 4)
+        self._matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive[:capacity]
+        self._alive = alive
+
+    def _resize_file(self, path: str, capacity: int) -> None:
+        with open(path, "ab") as f:
+            f.truncate(capacity * self._dim * 4)
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = len(self._matrix)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._matrix.flush()
+        self._resize_file(self._path("vetores", self._generation), capacity)
+        # Buscas em andamento continuam com o mapeamento anterior, que segue válido
+        self._open_matrix()
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.directory, META_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": self._generation, "dim": self._dim}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _write_log(self, records: Iterable[Dict[str, Any]]) -> None:
+        if self._log is None:
+            self._log = open(self._path("log", self._generation), "a", encoding="utf-8")
+        for record in records:
+            self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._log.flush()
+
+    def _append_row(self, doc_id: str, text: str, metadata: Dict[str, Any]) -> None:
+        if doc_id in self._rows:
+            self._delete_row(doc_id)
+        row = self._count
+        self._rows[doc_id] = row
+        self._ids.append(doc_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        self._alive[row] = True
+        self._count += 1
+
+    def _delete_row(self, doc_id: str) -> bool:
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self._garbage += 1
+        return True
+
+    def add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: Any,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """Acrescenta vetores já calculados (um id existente é substituído)"""
+        vectors = normalize(embeddings).reshape(len(texts), -1)
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._open_matrix()
+                self._write_meta()
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Dimensão {vectors.shape[1]} difere da do índice ({self._dim})")
+            self._ensure_capacity(self._count + len(vectors))
+            # Os vetores são gravados antes do log, que é a fonte da verdade na recarga
+            self._matrix[self._count:self._count + len(vectors)] = vectors
+            self._matrix.flush()
+            self._write_log(
+                {"op": "add", "id": doc_id, "text": text, "metadata": metadata or {}}
+                for doc_id, text, metadata in zip(ids, texts, metadatas)
+            )
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                self._append_row(doc_id, text, metadata or {})
+            self.maybe_compact()
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            deleted = [doc_id for doc_id in ids or [] if self._delete_row(doc_id)]
+            self._write_log({"op": "delete", "id": doc_id} for doc_id in deleted)
+            self.maybe_compact()
+        return True
+
+    def update_metadatas(self, ids: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+        """Substitui os metadados sem tocar nos vetores"""
+        with self._lock:
+            records = []
+            for doc_id, metadata in zip(ids, metadatas):
+                if doc_id in self._rows:
+                    self._metadatas[self._rows[doc_id]] = metadata
+                    self._garbage += 1
+                    records.append({"op": "update", "id": doc_id, "metadata": metadata})
+            self._write_log(records)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [
+                Document(id=doc_id, page_content=self._texts[row], metadata=self._metadatas[row])
+                for doc_id in ids
+                if (row := self._rows.get(doc_id)) is not None
+            ]
+
+    def batches(self, batch_size: int = 1000, ids: Optional[Sequence[str]] = None) -> Iterable[Dict[str, Any]]:
+        """Documentos vivos (ou os ids pedidos) com vetores, no formato do get do Chroma"""
+        with self._lock:
+            if ids is None:
+                rows = [int(row) for row in np.flatnonzero(self._alive[:self._count])]
+            else:
+                rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            matrix = self._matrix
+            columns = [(self._ids[row], self._texts[row], self._metadatas[row]) for row in rows]
+        for offset in range(0, len(rows), batch_size):
+            batch = columns[offset:offset + batch_size]
+            yield {
+                "ids": [doc_id for doc_id, _, _ in batch],
+                "embeddings": np.asarray(matrix[rows[offset:offset + batch_size]]),
+                "documents": [text for _, text, _ in batch],
+                "metadatas": [metadata for _, _, metadata in batch],
+            }
+
+    def search(self, vector: Any, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """Linhas e similaridades dos k vizinhos exatos que satisfazem o filtro
+
+        As linhas valem para o retrato do índice no momento da busca; uma compactação posterior as renumera.
+        """
+        return self._search(vector, k, filter)[0]
+
+    def _search(
+        self, vector: Any, k: int, filter: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Tuple[int, float]], List[str], List[str], List[Dict[str, Any]]]:
+        """Linhas encontradas e as colunas do mesmo retrato (a compactação troca as listas, não as altera)"""
+        with self._lock:
+            # Retrato consistente; a multiplicação ocorre fora do lock
+            matrix, alive, count = self._matrix, self._alive, self._count
+            ids, texts, metadatas = self._ids, self._texts, self._metadatas
+        if count == 0 or k <= 0:
+            return [], ids, texts, metadatas
+        query = normalize(vector).reshape(-1)
+        scores = np.asarray(matrix[:count] @ query)
+        scores[~alive[:count]] = -np.inf
+        candidates = min(count, k)
+        while True:
+            if candidates < count:
+                top = np.argpartition(-scores, candidates - 1)[:candidates]
+            else:
+                top = np.arange(count)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            hits = [
+                (int(row), float(scores[row])) for row in top
+                if scores[row] != -np.inf and matches(metadatas[row], filter)
+            ][:k]
+            # Com filtro seletivo, ampliar os candidatos até achar k resultados ou esgotar o índice
+            if len(hits) >= k or candidates >= count:
+                return hits, ids, texts, metadatas
+            candidates = min(count, candidates * 4)
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: Any, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        # Documentos montados do mesmo retrato da busca: uma compactação no meio não troca as linhas
+        hits, ids, texts, metadatas = self._search(embedding, k, filter)
+        return [
+            (Document(id=ids[row], page_content=texts[row], metadata=metadatas[row]), score)
+            for row, score in hits
+        ]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # A similaridade de cosseno já é uma relevância (maior é melhor)
+        return lambda score: score
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Documentos mais similares com a similaridade de cosseno (maior é melhor)"""
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def maybe_compact(self) -> bool:
+        """Compacta quando as linhas apagadas e registros obsoletos passam da fração configurada"""
+        with self._lock:
+            if self._garbage < max(self.min_compact_rows, self.compact_ratio * self._count):
+                return False
+            self.compact()
+            return True
+
+    def compact(self) -> None:
+        """Reescreve vetores e log apenas com os documentos vivos, numa nova geração"""
+        with self._lock:
+            if self._dim is None:
+                return
+            rows = np.flatnonzero(self._alive[:self._count])
+            generation = self._generation + 1
+            capacity = self.initial_capacity
+            while capacity < len(rows):
+                capacity *= 2
+            vectors_path = self._path("vetores", generation)
+            if os.path.exists(vectors_path):
+                os.remove(vectors_path)
+            self._resize_file(vectors_path, capacity)
+            matrix = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+            matrix[:len(rows)] = self._matrix[rows]
+            matrix.flush()
+            del matrix
+            with open(self._path("log", generation), "w", encoding="utf-8") as f:
+                for row in rows:
+                    record = {"op": "add", "id": self._ids[row], "text": self._texts[row], "metadata": self._metadatas[row]}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            old_generation = self._generation
+            before = self._count
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            # A troca do meta.json confirma a nova geração; até lá a anterior continua válida
+            self._generation = generation
+            self._write_meta()
+            self._ids = [self._ids[row] for row in rows]
+            self._texts = [self._texts[row] for row in rows]
+            self._metadatas = [self._metadatas[row] for row in rows]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._count = len(rows)
+            self._garbage = 0
+            self._alive = np.zeros(0, dtype=bool)
+            self._open_matrix()
+            self._alive[:self._count] = True
+            for kind in ("vetores", "log"):
+                path = self._path(kind, old_generation)
+                if os.path.exists(path):
+                    os.remove(path)
+            logger.info(f"Índice exato compactado: {before} -> {self._count} linhas")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        directory: str = "",
+        **kwargs: Any,
+    ) -> "ExactVectorStore":
+        store = cls(embedding, directory or settings.EXACT_INDEX_DIRECTORY, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", default=settings.EXACT_INDEX_DIRECTORY)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info", help="Mostra o tamanho do índice e as linhas a compactar")
+    commands.add_parser("compact", help="Remove as linhas apagadas e reescreve o log")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = ExactVectorStore(None, args.directory)
+    if args.command == "info":
+        print(f"{args.directory}: {len(store)} vetores, dimensão {store._dim}, {store.garbage} a compactar")
+    elif args.command == "compact":
+        store.compact()
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
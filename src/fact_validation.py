@@ -0,0 +1,152 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# (id do documento, texto do fato)
+PendingFact = Tuple[str, str]
+
+
+class FactValidator:
+    """Valida em segundo plano, em lotes, os fatos armazenados como pendentes
+
+    Cada lote é enviado a validate_batch; os fatos aprovados são promovidos com
+    promote(ids) e os reprovados removidos com reject(ids). Se a validação do lote
+    falhar (LLM indisponível, disjuntor aberto), o lote volta à fila após uma espera
+    exponencial entre retry_backoff e max_backoff segundos, e os fatos continuam
+    pendentes (e invisíveis ao contexto) até serem validados.
+    """
+
+    def __init__(
+        self,
+        validate_batch: Callable[[List[str]], List[bool]],
+        promote: Callable[[List[str]], None],
+        reject: Callable[[List[str]], None],
+        batch_size: int = 8,
+        workers: int = 2,
+        batch_wait: float = 0.5,
+        retry_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.validate_batch = validate_batch
+        self.promote = promote
+        self.reject = reject
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.batch_wait = batch_wait
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._stopped = threading.Event()
+        self._queue: "queue.Queue[Optional[PendingFact]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(self, doc_id: str, text: str) -> None:
+        """Enfileira um fato pendente; os workers são iniciados no primeiro uso"""
+        self._ensure_started()
+        metrics.add("facts_pending", 1)
+        self._queue.put((doc_id, text))
+
+    def join(self) -> None:
+        """Aguarda a validação de todos os fatos enfileirados"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Encerra os workers; lotes aguardando nova tentativa continuam pendentes no armazenamento"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopped.set()
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stopped.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"fact-validation-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _next_batch(self) -> Optional[List[PendingFact]]:
+        """Bloqueia até o primeiro fato e espera até batch_wait para completar o lote"""
+        first = self._queue.get()
+        if first is None:
+            self._queue.task_done()
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Repassar o sinal de parada para o próprio worker após o lote atual
+                self._queue.task_done()
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._process(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _process(self, batch: List[PendingFact]) -> None:
+        ids = [doc_id for doc_id, _ in batch]
+        start = time.monotonic()
+        try:
+            verdicts = self.validate_batch([text for _, text in batch])
+            validated = [doc_id for doc_id, valid in zip(ids, verdicts) if valid]
+            rejected = [doc_id for doc_id, valid in zip(ids, verdicts) if not valid]
+            if validated:
+                self.promote(validated)
+            if rejected:
+                self.reject(rejected)
+        except Exception as e:
+            metrics.inc("fact_validation_batches_total", outcome="error")
+            self._retry(batch, e)
+            return
+        with self._lock:
+            self._failures = 0
+        metrics.add("facts_pending", -len(batch))
+        metrics.observe("fact_validation_seconds", time.monotonic() - start)
+        metrics.inc("fact_validation_batches_total", outcome="success")
+        metrics.inc("facts_validated_total", len(validated), outcome="validated")
+        metrics.inc("facts_validated_total", len(rejected), outcome="rejected")
+        logger.info(f"Lote de fatos validado: {len(validated)} promovidos, {len(rejected)} removidos")
+
+    def _retry(self, batch: List[PendingFact], error: Exception) -> None:
+        """Devolve o lote à fila após a espera; as falhas consecutivas dobram a espera"""
+        with self._lock:
+            self._failures += 1
+            delay = min(self.max_backoff, self.retry_backoff * 2 ** (self._failures - 1))
+        logger.error(f"Erro ao validar lote de {len(batch)} fatos pendentes: {error}; nova tentativa em {delay:.1f}s")
+        if self._stopped.wait(delay):
+            # Encerrado durante a espera: os fatos são reenviados na próxima inicialização
+            metrics.add("facts_pending", -len(batch))
+            return
+        metrics.inc("fact_validation_retries_total", len(batch))
+        # Reenfileirado antes do task_done do lote, para que join() continue aguardando
+        for item in batch:
+            self._queue.put(item)
@@ -0,0 +1,412 @@
+"""LLM falso e determinístico para testes de carga sem rede
+
+Pode ser usado em processo (``LLM_BACKEND=fake``) ou como servidor HTTP compatível
+com a API de chat da OpenAI (``python -m src.fake_llm --port 8080``), apontando o
+backend ``openai`` para ele.
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+class FakeLLMError(Exception):
+    """Erro injetado pelo LLM falso, com o status HTTP que um provedor real retornaria"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class LatencyModel:
+    """Modelo de latência: tempo até o primeiro token + geração a uma taxa fixa de tokens"""
+    distribution: str = "lognormal"
+    mean_ms: float = 300.0
+    stddev_ms: float = 100.0
+    tokens_per_second: float = 200.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribuição de latência inválida: {self.distribution}")
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def sample_first_token_seconds(self) -> float:
+        with self._lock:
+            if self.distribution == "fixed":
+                value = self.mean_ms
+            elif self.distribution == "uniform":
+                value = self._rng.uniform(self.mean_ms - self.stddev_ms, self.mean_ms + self.stddev_ms)
+            elif self.distribution == "normal":
+                value = self._rng.gauss(self.mean_ms, self.stddev_ms)
+            else:
+                # Parâmetros da lognormal a partir da média e do desvio desejados
+                variance = math.log(1 + (self.stddev_ms / self.mean_ms) ** 2)
+                mu = math.log(self.mean_ms) - variance / 2
+                value = self._rng.lognormvariate(mu, math.sqrt(variance))
+        return max(0.0, value) / 1000
+
+    def token_seconds(self, tokens: int) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return tokens / self.tokens_per_second
+
+    def maybe_fail(self) -> None:
+        with self._lock:
+            roll = self._rng.random()
+            status = self._rng.choice((429, 503))
+        if roll < self.error_rate:
+            raise FakeLLMError(status, f"Erro simulado do provedor ({status})")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+# Prompt mínimo reconhecido como validação de um único fato
+_SINGLE_FACT_SYSTEM = "validar fatos"
+
+
+def fake_reply(system: str, user: str, response_tokens: int = 60) -> str:
+    """Resposta determinística que imita cada nó do pipeline a partir do prompt de sistema"""
+    system = _normalize(system)
+    text = _normalize(user)
+    if "classificador de intencoes" in system:
+        if text.rstrip().endswith("?") or re.match(r"(qual|quem|como|onde|quando|por que|o que)\b", text):
+            return "question"
+        if re.search(r"\b(prefiro|prefer|quero respostas|gosto de (respostas|explicacoes))", text):
+            return "preference"
+        if re.search(r"\b(obrigad|gostei|otima resposta|boa resposta)", text):
+            return "feedback"
+        return "fact"
+    if "valida varios fatos" in system:
+        lines = re.findall(r"^(\d+)\.\s*(.*)$", text, re.MULTILINE)
+        return "\n".join(f"{index}: {fake_reply(_SINGLE_FACT_SYSTEM, fact)}" for index, fact in lines)
+    if "validar fatos" in system:
+        return "false" if re.search(r"\b(eu acho|adoro|odeio|mais bonit|prefiro)", text) else "true"
+    if "analisador de preferencias" in system:
+        prefs = {}
+        if re.search(r"\bforma(l|is)\b", text):
+            prefs["tom"] = "formal"
+        if re.search(r"\bcasua(l|is)\b", text):
+            prefs["tom"] = "casual"
+        for value in ("concisa", "detalhada"):
+            if value[:-1] in text:
+                prefs["verbosidade"] = value
+        return json.dumps(prefs, ensure_ascii=False)
+    if "resume conversas" in system:
+        return "Resumo: " + " ".join(user.split()[:30])
+    words = ("Resposta simulada para: " + user).split()
+    return " ".join((words * (response_tokens // max(1, len(words)) + 1))[:response_tokens])
+
+
+# Trecho do prompt de sistema (normalizado) que identifica cada nó; os demais geram respostas
+PROMPT_NODES = (
+    ("classificador de intencoes", "process_input"),
+    ("valida varios fatos", "validate_fact_batch"),
+    ("validar fatos", "validate_fact"),
+    ("analisador de preferencias", "update_preferences"),
+    ("resume conversas", "summarize_history"),
+)
+
+
+def prompt_node(system: str) -> str:
+    """Nó do pipeline que enviou o prompt"""
+    system = _normalize(system)
+    return next((node for marker, node in PROMPT_NODES if marker in system), "generate_response")
+
+
+def _split_messages(messages: List[BaseMessage]) -> tuple:
+    system = "\n".join(m.content for m in messages if m.type == "system")
+    user = next((m.content for m in reversed(messages) if m.type == "human"), "")
+    return system, user
+
+
+class FakeChatModel(BaseChatModel):
+    """Modelo de chat em processo com latência, taxa de tokens e erros configuráveis"""
+    model_name: str = "fake"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    response_tokens: int = 60
+    latency: LatencyModel = Field(default_factory=LatencyModel)
+
+    _sleep: Any = PrivateAttr(default=time.sleep)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _reply(self, messages: List[BaseMessage], **kwargs: Any) -> List[str]:
+        self.latency.maybe_fail()
+        system, user = _split_messages(messages)
+        tokens = fake_reply(system, user, self.response_tokens).split(" ")
+        max_tokens = kwargs.get("max_tokens", self.max_tokens)
+        return tokens[:max_tokens] if max_tokens else tokens
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._sleep(self.latency.sample_first_token_seconds())
+        tokens = self._reply(messages, **kwargs)
+        self._sleep(self.latency.token_seconds(len(tokens)))
+        message = AIMessage(content=" ".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._sleep(self.latency.sample_first_token_seconds())
+        tokens = self._reply(messages, **kwargs)
+        for i, token in enumerate(tokens):
+            if i:
+                self._sleep(self.latency.token_seconds(1))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+# Requisição gravada que a thread atual está reproduzindo (ver benchmarks/replay.py)
+_replayed: ContextVar[Optional[Dict[str, Any]]] = ContextVar("replayed_request", default=None)
+
+
+@contextmanager
+def replaying(entry: Dict[str, Any]) -> Iterator[None]:
+    """Chamadas ao ReplayChatModel dentro do bloco reproduzem a entrada do trace"""
+    token = _replayed.set(entry)
+    try:
+        yield
+    finally:
+        _replayed.reset(token)
+
+
+class ReplayChatModel(FakeChatModel):
+    """LLM falso que reproduz a latência gravada de cada nó e as decisões da requisição original
+
+    A intenção, a validação e as preferências vêm do trace, pois a entrada anonimizada não
+    permite reclassificá-la. Nós sem latência gravada (ex.: preferências extraídas localmente
+    na gravação) respondem sem espera.
+    """
+
+    def _replay(self, messages: List[BaseMessage], **kwargs: Any) -> Tuple[float, List[str]]:
+        system, user = _split_messages(messages)
+        node = prompt_node(system)
+        entry = _replayed.get() or {}
+        if node == "process_input" and entry.get("intent"):
+            reply = entry["intent"]
+        elif node == "validate_fact" and "valid" in entry:
+            reply = "true" if entry["valid"] else "false"
+        elif node == "update_preferences" and "preferences" in entry:
+            reply = json.dumps(entry["preferences"], ensure_ascii=False)
+        else:
+            reply = fake_reply(system, user, self.response_tokens)
+        tokens = reply.split(" ")
+        max_tokens = kwargs.get("max_tokens", self.max_tokens)
+        return entry.get("llm", {}).get(node, 0.0), tokens[:max_tokens] if max_tokens else tokens
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        seconds, tokens = self._replay(messages, **kwargs)
+        self._sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        seconds, tokens = self._replay(messages, **kwargs)
+        # A latência gravada é a da chamada inteira; os tokens são distribuídos nela
+        per_token = seconds / len(tokens)
+        for i, token in enumerate(tokens):
+            self._sleep(per_token)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    """Implementa o subconjunto de /v1/chat/completions usado pelo ChatOpenAI"""
+    server: "FakeLLMServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        latency = self.server.latency
+        messages = request.get("messages", [])
+        system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+
+        time.sleep(latency.sample_first_token_seconds())
+        try:
+            latency.maybe_fail()
+        except FakeLLMError as e:
+            self._send_json(e.status_code, {"error": {"message": str(e), "type": "fake_error"}})
+            return
+
+        tokens = fake_reply(system, user, self.server.response_tokens).split(" ")
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+        model = request.get("model", "fake")
+        created = int(time.time())
+        usage = {"prompt_tokens": len((system + user).split()), "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not request.get("stream"):
+            time.sleep(latency.token_seconds(len(tokens)))
+            self._send_json(200, {
+                "id": f"fake-{created}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(latency.token_seconds(1))
+            chunk = {
+                "id": f"fake-{created}",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token if i == 0 else " " + token}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        done = {
+            "id": f"fake-{created}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Servidor HTTP local que simula um provedor compatível com a API da OpenAI"""
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080,
+                 latency: Optional[LatencyModel] = None, response_tokens: int = 60):
+        super().__init__((host, port), _FakeLLMHandler)
+        self.latency = latency or LatencyModel()
+        self.response_tokens = response_tokens
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="fake-llm-server", daemon=True)
+        thread.start()
+        return thread
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor LLM falso compatível com a API da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--mean-ms", type=float, default=300.0)
+    parser.add_argument("--stddev-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    latency = LatencyModel(
+        distribution=args.latency,
+        mean_ms=args.mean_ms,
+        stddev_ms=args.stddev_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server = FakeLLMServer(args.host, args.port, latency, args.response_tokens)
+    logger.info(f"LLM falso ouvindo em {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+from src.config import settings
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Janela deslizante das latências recentes de cada nó"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, node: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(node, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, node: str) -> int:
+        with self._lock:
+            return len(self._samples.get(node, ()))
+
+    def percentile(self, node: str, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(node, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(p * len(samples)))
+        return samples[index]
+
+
+class HedgeBudget:
+    """Limita as requisições extras a uma fração das chamadas (cada chamada acumula crédito)"""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._credit = min(self.burst, self._credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._credit >= 1.0:
+                self._credit -= 1.0
+                return True
+            return False
+
+
+class Hedger:
+    """Dispara uma requisição duplicada quando a original passa do percentil de latência recente"""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: Optional[HedgeBudget] = None,
+        tracker: Optional[LatencyTracker] = None,
+        min_samples: int = 20,
+        max_workers: int = 16,
+    ):
+        self.percentile = percentile
+        self.budget = budget or HedgeBudget()
+        self.tracker = tracker or LatencyTracker()
+        self.min_samples = min_samples
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+
+    def hedge_delay(self, node: str) -> Optional[float]:
+        """Tempo de espera antes de disparar a duplicata (None enquanto não há amostras suficientes)"""
+        if self.tracker.count(node) < self.min_samples:
+            return None
+        return self.tracker.percentile(node, self.percentile)
+
+    def _run(self, fn: Callable[[], Any], node: str, started: Optional[threading.Event] = None) -> Any:
+        # Medido a partir do início da execução, sem a espera na fila do executor
+        if started is not None:
+            started.set()
+        start = time.monotonic()
+        result = fn()
+        self.tracker.record(node, time.monotonic() - start)
+        return result
+
+    def _submit(self, fn: Callable[[], Any], node: str) -> Future:
+        return self._executor.submit(self._run, fn, node)
+
+    def call(self, fn: Callable[[], Any], node: str) -> Any:
+        start = time.monotonic()
+        metrics.inc("llm_hedge_requests_total", node=node)
+        self.budget.deposit()
+        delay = self.hedge_delay(node)
+        if delay is None:
+            # Sem amostras suficientes não há duplicata: a chamada roda na própria thread
+            return self._run(fn, node)
+        # O prazo da duplicata conta a partir do início da execução da original: a espera na fila do
+        # executor saturado não é latência do provedor e não deve consumir o orçamento de duplicatas
+        started = threading.Event()
+        primary = self._executor.submit(self._run, fn, node, started)
+        started.wait()
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self.budget.try_spend():
+            metrics.inc("llm_hedge_budget_exhausted_total", node=node)
+            return primary.result()
+
+        logger.info(f"Disparando requisição duplicada em {node} após {delay:.3f}s")
+        metrics.inc("llm_hedges_total", node=node)
+        hedge = self._submit(fn, node)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                elapsed = time.monotonic() - start
+                if future is hedge:
+                    metrics.inc("llm_hedge_wins_total", node=node)
+                    # Quando a original terminar, registrar quanto a duplicata economizou
+                    primary.add_done_callback(
+                        lambda f: metrics.observe("llm_hedge_saved_seconds", time.monotonic() - start - elapsed, node=node)
+                    )
+                return future.result()
+        raise error
+
+
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger:
+    """Hedger compartilhado pelo processo, para que as latências observadas sejam comuns"""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger(
+                percentile=settings.HEDGE_PERCENTILE,
+                budget=HedgeBudget(settings.HEDGE_BUDGET_RATIO),
+                tracker=LatencyTracker(settings.HEDGE_WINDOW),
+                min_samples=settings.HEDGE_MIN_SAMPLES,
+            )
+        return _hedger
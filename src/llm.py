@@ -0,0 +1,137 @@
+import logging
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from langchain.schema.messages import BaseMessage
+
+from src.config import settings
+from src.prompts import StaticPrefix
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GenerationOptions:
+    """Parâmetros de geração de uma requisição, aplicados por chamada sem alterar o cliente compartilhado"""
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    model: Optional[str] = None
+
+    def __post_init__(self):
+        if self.temperature is not None and not 0.0 <= self.temperature <= 2.0:
+            raise ValueError(f"Temperatura inválida: {self.temperature}")
+        if self.max_tokens is not None and self.max_tokens <= 0:
+            raise ValueError(f"max_tokens inválido: {self.max_tokens}")
+
+    def to_kwargs(self) -> Dict[str, Any]:
+        """Argumentos repassados à invocação do modelo (equivalente a llm.bind(**kwargs))"""
+        return {key: value for key, value in asdict(self).items() if value not in (None, "")}
+
+
+class PrefixCacheAdapter(ABC):
+    """Interface para backends que reaproveitam o processamento (KV cache) de um prefixo compartilhado
+
+    O Chatbot entrega o prefixo estático separado da parte dinâmica da mensagem,
+    permitindo que o backend evite reprocessar o prefixo a cada chamada.
+    """
+
+    def __init__(self, llm: Any):
+        self.llm = llm
+
+    @abstractmethod
+    def invoke_with_prefix(self, prefix: StaticPrefix, messages: Sequence[BaseMessage], **kwargs) -> BaseMessage:
+        """Invoca o LLM com um prefixo estático seguido das mensagens dinâmicas"""
+
+    def stream_with_prefix(self, prefix: StaticPrefix, messages: Sequence[BaseMessage], **kwargs) -> Iterator[BaseMessage]:
+        """Versão em streaming de invoke_with_prefix (por padrão, sem aproveitamento de cache)"""
+        return self.llm.stream([*prefix.messages, *messages], **kwargs)
+
+    def invoke(self, messages: Sequence[BaseMessage], **kwargs) -> BaseMessage:
+        return self.llm.invoke(list(messages), **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # Delegar os demais atributos ao cliente original (temperature, bind, stream...)
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+
+class SlotPinningPrefixCacheAdapter(PrefixCacheAdapter):
+    """Adaptador para servidores locais compatíveis com OpenAI que mantêm KV cache por slot
+
+    Cada prefixo é fixado de forma determinística em um slot do servidor (ex.: llama.cpp
+    com ``cache_prompt``), de modo que requisições com o mesmo prefixo reutilizem o cache.
+    """
+
+    def __init__(self, llm: Any, n_slots: int = 1):
+        super().__init__(llm)
+        self.n_slots = max(1, n_slots)
+
+    def slot_for(self, prefix: StaticPrefix) -> int:
+        return zlib.crc32(prefix.key.encode("utf-8")) % self.n_slots
+
+    def extra_body(self, prefix: StaticPrefix, kwargs: dict) -> dict:
+        return {
+            **kwargs.pop("extra_body", {}),
+            "cache_prompt": True,
+            "id_slot": self.slot_for(prefix),
+        }
+
+    def invoke_with_prefix(self, prefix: StaticPrefix, messages: Sequence[BaseMessage], **kwargs) -> BaseMessage:
+        extra_body = self.extra_body(prefix, kwargs)
+        return self.llm.invoke([*prefix.messages, *messages], extra_body=extra_body, **kwargs)
+
+    def stream_with_prefix(self, prefix: StaticPrefix, messages: Sequence[BaseMessage], **kwargs) -> Iterator[BaseMessage]:
+        extra_body = self.extra_body(prefix, kwargs)
+        return self.llm.stream([*prefix.messages, *messages], extra_body=extra_body, **kwargs)
+
+
+def invoke_with_prefix(llm: Any, prefix: StaticPrefix, messages: Sequence[BaseMessage], **kwargs) -> BaseMessage:
+    """Invoca o LLM usando o cache de prefixo quando o backend oferece suporte"""
+    if isinstance(llm, PrefixCacheAdapter):
+        return llm.invoke_with_prefix(prefix, messages, **kwargs)
+    return llm.invoke([*prefix.messages, *messages], **kwargs)
+
+
+def stream_with_prefix(llm: Any, prefix: StaticPrefix, messages: Sequence[BaseMessage], **kwargs) -> Iterator[BaseMessage]:
+    """Transmite a resposta do LLM usando o cache de prefixo quando o backend oferece suporte"""
+    if isinstance(llm, PrefixCacheAdapter):
+        return llm.stream_with_prefix(prefix, messages, **kwargs)
+    return llm.stream([*prefix.messages, *messages], **kwargs)
+
+
+def create_chat_model(backend: str, model_name: str, temperature: float, max_tokens: Optional[int] = None) -> Any:
+    """Cria o cliente de chat dos backends alternativos ao Groq (openai, fake)"""
+    if backend == "openai":
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError as e:
+            raise ImportError("O backend 'openai' requer o pacote langchain-openai") from e
+        return ChatOpenAI(
+            base_url=settings.OPENAI_BASE_URL,
+            api_key=settings.OPENAI_API_KEY,
+            model=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            max_retries=0,  # retentativas feitas pelo LLMGuard
+            timeout=settings.LLM_REQUEST_TIMEOUT
+        )
+    if backend == "fake":
+        from src.fake_llm import FakeChatModel, LatencyModel
+        return FakeChatModel(
+            model_name=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+            latency=LatencyModel(
+                distribution=settings.FAKE_LLM_LATENCY,
+                mean_ms=settings.FAKE_LLM_MEAN_MS,
+                stddev_ms=settings.FAKE_LLM_STDDEV_MS,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+                error_rate=settings.FAKE_LLM_ERROR_RATE,
+                seed=settings.FAKE_LLM_SEED
+            )
+        )
+    raise ValueError(f"Backend de LLM desconhecido: {backend}")
@@ -0,0 +1,163 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from langchain.schema.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from src.prompts import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Um turno é armazenado de forma compacta como (entrada do usuário, resposta do assistente)
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, List[Turn]], str]
+
+# Executor compartilhado entre todas as sessões para os resumos em segundo plano
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber no orçamento de tokens, preservando o final"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    text = text[-max_tokens * 4:]
+    while text and count_tokens(text) > max_tokens:
+        text = text[max(1, len(text) // 10):]
+    return text
+
+
+class ConversationMemory:
+    """Memória de conversa limitada: últimos N turnos literais + resumo incremental dos antigos"""
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        max_turns: int = 6,
+        max_tokens: int = 1024,
+        summary_max_tokens: int = 256,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = min(summary_max_tokens, max_tokens)
+        self._executor = executor or _summary_executor
+        self._lock = threading.Lock()
+        self._recent: Deque[Turn] = deque()
+        self._pending: List[Turn] = []
+        self._folding: List[Turn] = []
+        self._summary = ""
+        self._future: Optional[Future] = None
+
+    @property
+    def summary(self) -> str:
+        with self._lock:
+            return self._summary
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._recent)
+
+    def add_turn(self, user: str, assistant: str) -> None:
+        """Registra um turno e agenda o resumo dos turnos que saíram da janela"""
+        with self._lock:
+            self._recent.append((user, assistant))
+            while len(self._recent) > self.max_turns:
+                self._pending.append(self._recent.popleft())
+            # Se o resumo estiver atrasado, descartar os turnos mais antigos para manter a memória limitada
+            overflow = len(self._pending) - self.max_turns
+            if overflow > 0:
+                logger.warning(f"Resumo atrasado, descartando {overflow} turnos antigos")
+                del self._pending[:overflow]
+            self._schedule_summary()
+
+    def _schedule_summary(self) -> None:
+        # Deve ser chamado com o lock adquirido; garante no máximo um resumo em andamento
+        if not self._pending or (self._future is not None and not self._future.done()):
+            return
+        batch, self._pending = self._pending, []
+        self._folding = batch
+        self._future = self._executor.submit(self._fold, self._summary, batch)
+
+    def _fold(self, summary: str, batch: List[Turn]) -> None:
+        """Incorpora um lote de turnos antigos ao resumo (fora do caminho crítico)"""
+        try:
+            new_summary = self.summarizer(summary, batch)
+            new_summary = truncate_to_tokens(new_summary.strip(), self.summary_max_tokens)
+        except Exception as e:
+            logger.error(f"Erro ao resumir histórico: {e}")
+            new_summary = summary
+        with self._lock:
+            self._summary = new_summary
+            self._folding = []
+            self._future = None
+            self._schedule_summary()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Aguarda a conclusão dos resumos pendentes"""
+        while True:
+            with self._lock:
+                future = self._future
+            if future is None:
+                return
+            future.result(timeout=timeout)
+
+    def get_messages(self) -> List[BaseMessage]:
+        """Retorna o histórico como mensagens, respeitando o orçamento de tokens"""
+        with self._lock:
+            summary = self._summary
+            recent = list(self._recent)
+
+        messages: List[BaseMessage] = []
+        budget = self.max_tokens
+        if summary:
+            content = f"Resumo da conversa anterior: {summary}"
+            budget -= count_tokens(content)
+            messages.append(SystemMessage(content=content))
+
+        # Incluir os turnos mais recentes primeiro até esgotar o orçamento
+        turns: List[BaseMessage] = []
+        for user, assistant in reversed(recent):
+            cost = count_tokens(user) + count_tokens(assistant)
+            if cost > budget:
+                break
+            budget -= cost
+            turns[:0] = [HumanMessage(content=user), AIMessage(content=assistant)]
+        return messages + turns
+
+    def size_bytes(self) -> int:
+        """Tamanho aproximado do conteúdo mantido em memória (textos em UTF-8)"""
+        with self._lock:
+            turns = [*self._recent, *self._folding, *self._pending]
+            summary = self._summary
+        return len(summary.encode("utf-8")) + sum(
+            len(user.encode("utf-8")) + len(assistant.encode("utf-8")) for user, assistant in turns
+        )
+
+    def to_dict(self) -> Dict:
+        """Estado serializável da memória (turnos ainda não resumidos incluídos)"""
+        with self._lock:
+            return {
+                "summary": self._summary,
+                "recent": [list(turn) for turn in self._recent],
+                "pending": [list(turn) for turn in [*self._folding, *self._pending]],
+            }
+
+    def load_dict(self, data: Dict) -> None:
+        """Restaura o estado salvo por to_dict, retomando os resumos pendentes"""
+        with self._lock:
+            self._summary = data.get("summary", "")
+            self._recent = deque(tuple(turn) for turn in data.get("recent", []))
+            self._pending = [tuple(turn) for turn in data.get("pending", [])]
+            self._schedule_summary()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._pending = []
+            self._folding = []
+            self._summary = ""
@@ -0,0 +1,103 @@
+import threading
+from typing import Dict, Iterable, Tuple
+
+# Limites (em segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Registro simples e thread-safe de contadores, medidores e histogramas"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, list]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def add(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # [contagens por bucket..., contagem total, soma]
+            data = series.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += 1
+            data[-1] += value
+
+    def get(self, name: str, **labels) -> float:
+        """Valor atual de um contador ou medidor (0 se não existir)"""
+        key = _label_key(labels)
+        with self._lock:
+            for store in (self._counters, self._gauges):
+                if name in store and key in store[name]:
+                    return store[name][key]
+        return 0.0
+
+    def get_histogram(self, name: str, **labels) -> Dict[str, float]:
+        key = _label_key(labels)
+        with self._lock:
+            data = self._histograms.get(name, {}).get(key)
+            if data is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": data[-2], "sum": data[-1]}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Exporta as métricas no formato texto do Prometheus"""
+        lines = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(store):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in store[name].items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted(self._histograms):
+                lines.append(f"# TYPE {name} histogram")
+                for key, data in self._histograms[name].items():
+                    for bound, count in zip(self.buckets, data):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', str(bound))])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {data[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {data[-2]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {data[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+# Registro global do processo
+metrics = MetricsRegistry()
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.exact_index import ExactVectorStore, normalize
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Camadas de cada namespace: a quente é a consultada normalmente; a fria guarda os fatos arquivados
+HOT = "hot"
+COLD = "cold"
+
+Scored = Tuple[Document, float, Any]
+
+
+def shard_name(base: str, namespace: str) -> str:
+    """Nome estável e válido para o Chroma (3-512 caracteres [a-zA-Z0-9._-]) da coleção do namespace"""
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", namespace).strip("-")[:32] or "ns"
+    digest = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:12]
+    return f"{base}-{slug}-{digest}"
+
+
+def scored_search(store: Any, embedding: List[float], k: int, filter: Optional[Dict]) -> List[Tuple[Document, float]]:
+    """Busca por vetor com a similaridade de cosseno (maior é melhor), comparável entre shards e backends"""
+    if isinstance(store, ExactVectorStore):
+        return store.similarity_search_by_vector_with_score(embedding, k, filter)
+    # A distância do Chroma depende da métrica da coleção (no "l2", a distância euclidiana ao quadrado,
+    # que a relevância do LangChain mapeia para outra escala); o cosseno é calculado dos vetores retornados
+    result = store._collection.query(
+        query_embeddings=[embedding], n_results=k, where=filter,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    if not result["ids"] or not result["ids"][0]:
+        return []
+    vectors = normalize(np.asarray(result["embeddings"][0], dtype=np.float32))
+    similarities = vectors @ normalize(np.asarray(embedding, dtype=np.float32)).reshape(-1)
+    pairs = [
+        (Document(id=doc_id, page_content=text, metadata=metadata or {}), float(similarity))
+        for doc_id, text, metadata, similarity in zip(
+            result["ids"][0], result["documents"][0], result["metadatas"][0], similarities
+        )
+    ]
+    # Em "l2" com vetores não normalizados, a ordem das distâncias pode diferir da do cosseno
+    return sorted(pairs, key=lambda pair: pair[1], reverse=True)
+
+
+class ShardRouter:
+    """Encaminha buscas e gravações para a coleção do namespace e para a coleção global
+
+    As coleções dos namespaces (e as camadas frias) são abertas sob demanda e mantidas num
+    LRU limitado, para que milhares de namespaces não esgotem descritores de arquivo ou memória.
+    """
+
+    def __init__(
+        self,
+        global_store: Any,
+        open_shard: Callable[[Optional[str], str], Any],
+        embed_query: Callable[[str], List[float]],
+        max_open: int = 128,
+        close_shard: Optional[Callable[[Any], None]] = None,
+    ):
+        self.global_store = global_store
+        self.open_shard = open_shard
+        self.embed_query = embed_query
+        self.max_open = max_open
+        self.close_shard = close_shard
+        self._lock = threading.Lock()
+        self._shards: "OrderedDict[Tuple[Optional[str], str], Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._shards)
+
+    def shard(self, namespace: Optional[str], tier: str = HOT) -> Any:
+        """Coleção do namespace na camada pedida (a global quando não há namespace)"""
+        namespace = namespace or None
+        if namespace is None and tier == HOT:
+            return self.global_store
+        key = (namespace, tier)
+        with self._lock:
+            store = self._shards.get(key)
+            if store is not None:
+                self._shards.move_to_end(key)
+                return store
+            store = self.open_shard(namespace, tier)
+            self._shards[key] = store
+            while len(self._shards) > self.max_open:
+                _, evicted = self._shards.popitem(last=False)
+                if self.close_shard:
+                    self.close_shard(evicted)
+                metrics.inc("namespace_shards_evicted_total")
+            metrics.set("namespace_shards_open", len(self._shards))
+            return store
+
+    def open_hot_shards(self) -> List[Tuple[Optional[str], Any]]:
+        """Namespace e coleção de cada camada quente aberta, incluindo a global"""
+        with self._lock:
+            shards = [(namespace, store) for (namespace, tier), store in self._shards.items() if tier == HOT]
+        return [(None, self.global_store), *shards]
+
+    def search(self, query: str, namespace: Optional[str], k: int, filter: Optional[Dict] = None) -> List[Document]:
+        """Os k documentos mais relevantes entre a coleção do namespace e a global"""
+        if not namespace:
+            return self.global_store.similarity_search(query, k=k, filter=filter)
+        return [doc for doc, _, _ in self.search_scored(self.embed_query(query), namespace, k, filter)]
+
+    def search_scored(
+        self, embedding: List[float], namespace: Optional[str], k: int, filter: Optional[Dict] = None, tier: str = HOT
+    ) -> List[Scored]:
+        """Documento, relevância e coleção de origem dos k mais relevantes da camada
+
+        A consulta já vem convertida em vetor, uma única vez para todos os shards.
+        """
+        stores = [self.shard(namespace, tier)]
+        if namespace:
+            stores.append(self.shard(None, tier))
+        results = [
+            (doc, score, store)
+            for store in stores
+            for doc, score in scored_search(store, embedding, k, filter)
+        ]
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def close(self) -> None:
+        with self._lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        if self.close_shard:
+            for store in shards:
+                self.close_shard(store)
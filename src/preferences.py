@@ -0,0 +1,123 @@
+"""Extração local das preferências de estilo (tom, verbosidade e formalidade)
+
+As três preferências têm vocabulário fechado, então um léxico de padrões em português
+resolve a maioria das mensagens sem chamar o LLM. Cada extração tem uma confiança:
+mensagens sem nenhum padrão reconhecido ou com valores conflitantes ficam abaixo do
+limite e são enviadas ao LLM.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+VALID_VALUES = {
+    "tom": ["formal", "casual"],
+    "verbosidade": ["concisa", "balanceada", "detalhada"],
+    "formalidade": ["formal", "informal"],
+}
+
+# Padrões de cada valor, avaliados sobre o texto em minúsculas
+LEXICON: Dict[str, Dict[str, List[str]]] = {
+    "tom": {
+        "formal": [r"\bforma(?:l|is|lmente)\b", r"\bs[ée]ri[oa]s?\b", r"\bprofissional(?:is)?\b", r"\bsobri[oa]s?\b"],
+        "casual": [r"\bcasua(?:l|is)\b", r"\bdescontra[íi]d[oa]s?\b", r"\bdescontra[íi]\w*", r"\btom (?:mais )?leve\b",
+                   r"\bdespojad[oa]s?\b", r"\bbem[- ]humorad[oa]s?\b", r"\bamig[áa]ve(?:l|is)\b"],
+    },
+    "verbosidade": {
+        "balanceada": [r"\bbalancead[oa]s?\b", r"\bequilibrad[oa]s?\b", r"\bmeio[- ]termo\b",
+                       r"\bnem (?:muito|t[ãa]o) (?:curt|long|breve)\w* nem (?:muito|t[ãa]o) \w+"],
+        "concisa": [r"\bconcis[oa]s?\b", r"\bcurt[oa]s?\b", r"\bbreves?\b", r"\bresumid[oa]s?\b", r"\bsucint[oa]s?\b",
+                    r"\bobjetiv[oa]s?\b", r"\bdiret[oa]s?(?: ao ponto)?\b", r"\bpoucas palavras\b", r"\bresum[oa]s?\b"],
+        "detalhada": [r"\bdetalhad[oa]s?\b", r"\bmais detalhes\b", r"\bdetalh\w*", r"\bcomplet[oa]s?\b",
+                      r"\baprofundad[oa]s?\b", r"(?<!ao )\blong[oa]s?\b", r"\bextens[oa]s?\b", r"\bminucios[oa]s?\b"],
+    },
+    "formalidade": {
+        "informal": [r"\binforma(?:l|is)(?:mente)?\b", r"\bsem formalidades?\b", r"\bg[íi]rias?\b", r"\bcoloquia(?:l|is)\b",
+                     r"\bme chame de voc[êe]\b", r"\bsem cerim[ôo]nia\b"],
+        "formal": [r"\blinguagem formal\b", r"\bnorma culta\b", r"\bsenhora?\b", r"\btratamento formal\b",
+                   r"\bformalidade\b"],
+    },
+}
+
+# Valor oposto quando o padrão aparece negado ("não seja tão formal", "menos detalhada")
+OPPOSITES = {
+    "tom": {"formal": "casual", "casual": "formal"},
+    "verbosidade": {"concisa": "detalhada", "detalhada": "concisa"},
+    "formalidade": {"formal": "informal", "informal": "formal"},
+}
+NEGATION = re.compile(r"\b(?:não|nao|nem|sem|menos|evite|evitar|nada de|pare de)\b(?:\s+\S+){0,2}\s*$")
+
+# Confiança de cada tipo de correspondência
+CONFIDENT, NEGATED, CONFLICT = 1.0, 0.7, 0.3
+
+COMPILED = {
+    key: {value: [re.compile(pattern) for pattern in patterns] for value, patterns in values.items()}
+    for key, values in LEXICON.items()
+}
+
+
+@dataclass
+class Extraction:
+    preferences: Dict[str, str] = field(default_factory=dict)
+    confidence: float = 0.0
+
+
+def find_values(text: str, key: str) -> List[Tuple[str, bool]]:
+    """Valores reconhecidos para a preferência e se cada um aparece negado"""
+    found = []
+    covered: List[Tuple[int, int]] = []
+    for value, patterns in COMPILED[key].items():
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                # Um trecho já reconhecido por um valor anterior (ex.: "nem curta nem longa") não conta de novo
+                if any(start <= match.start() < end for start, end in covered):
+                    continue
+                covered.append(match.span())
+                found.append((value, bool(NEGATION.search(text[:match.start()]))))
+    return found
+
+
+def extract_preferences(text: str) -> Extraction:
+    """Preferências mencionadas na mensagem e a confiança da extração (0 quando nada é reconhecido)"""
+    text = text.lower()
+    preferences: Dict[str, str] = {}
+    confidences = []
+    for key in LEXICON:
+        found = find_values(text, key)
+        if not found:
+            continue
+        values = set()
+        negated = False
+        for value, is_negated in found:
+            if is_negated:
+                negated = True
+                value = OPPOSITES[key].get(value)
+            if value:
+                values.add(value)
+        if len(values) == 1:
+            preferences[key] = values.pop()
+            confidences.append(NEGATED if negated else CONFIDENT)
+        else:
+            confidences.append(CONFLICT)
+    return Extraction(preferences, min(confidences) if confidences else 0.0)
+
+
+def filter_preferences(preferences: Dict) -> Dict[str, str]:
+    """Mantém apenas as chaves e os valores válidos"""
+    filtered = {}
+    for key, value in preferences.items():
+        if key in VALID_VALUES and isinstance(value, str) and value.lower() in VALID_VALUES[key]:
+            filtered[key] = value.lower()
+    return filtered
+
+
+def parse_llm_preferences(content: str) -> Optional[Dict[str, str]]:
+    """Lê o objeto JSON da resposta do LLM (com ou sem bloco de código); None se não houver JSON válido"""
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        parsed = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    return filter_preferences(parsed) if isinstance(parsed, dict) else None
@@ -0,0 +1,230 @@
+"""Perfil por requisição: amostragem de CPU e alocações (tracemalloc) por nó do grafo
+
+Ativado para todas as mensagens (PROFILING_ENABLED) ou por requisição (profile=True).
+Cada requisição perfilada grava em PROFILING_DIRECTORY/<hash do request_id>/ (profile_directory):
+
+- cpu.folded: pilhas amostradas no formato "folded" (flamegraph.pl, speedscope, inferno),
+  com o nó como raiz de cada pilha
+- allocations.txt: linhas com maior crescimento de memória alocada em cada nó
+- summary.json: tempo, amostras e memória (líquida e pico) por nó
+
+A amostragem é do tempo de parede: esperas (rede, locks) aparecem na pilha em que ocorrem.
+Sem perfil ativo, o custo por nó é uma consulta a um dicionário vazio. Com perfil ativo, o
+tracemalloc deixa o código com muitas alocações várias vezes mais lento; ele é global ao
+processo, e com requisições simultâneas as alocações de uma podem aparecer na outra.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Perfis ativos por request_id; os nós consultam pelo request_id do estado
+_active: Dict[str, "RequestProfiler"] = {}
+_active_lock = threading.Lock()
+_tracing_users = 0
+
+
+def frame_label(frame: Any) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    # Apenas o pacote e o arquivo, sem ";" (separador do formato folded)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(";", ":")
+
+
+def folded_stack(frame: Any) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def start_tracing() -> None:
+    global _tracing_users
+    with _active_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            # Um quadro basta para o relatório por linha; cada quadro extra encarece toda alocação
+            tracemalloc.start(1)
+        _tracing_users += 1
+
+
+def stop_tracing() -> None:
+    global _tracing_users
+    with _active_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# Alocações do próprio perfilador e do tracemalloc não entram no relatório
+IGNORED_FILES = {tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>", "<unknown>"}
+
+
+def allocation_diff(after: tracemalloc.Snapshot, before: tracemalloc.Snapshot, top: int) -> List[tracemalloc.StatisticDiff]:
+    """Linhas com maior crescimento de memória entre os snapshots
+
+    O filtro é aplicado às estatísticas agrupadas, não aos traces: Snapshot.filter_traces
+    custa segundos com centenas de milhares de alocações.
+    """
+    stats = after.compare_to(before, "lineno")
+    return [stat for stat in stats if stat.traceback[0].filename not in IGNORED_FILES][:top]
+
+
+def profile_directory(directory: str, request_id: str) -> str:
+    """Diretório do perfil da requisição; o request_id vem do cliente e não entra no caminho"""
+    name = hashlib.sha256(request_id.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(directory, name)
+
+
+class RequestProfiler:
+    """Amostrador de pilhas e medições de memória de uma requisição"""
+
+    def __init__(self, request_id: str, directory: str, interval: float = 0.005, top: int = 25):
+        self.request_id = request_id
+        self.directory = profile_directory(directory, request_id)
+        self.interval = interval
+        self.top = top
+        self.samples: Counter = Counter()
+        self.scope_samples: Counter = Counter()
+        self.scopes: Dict[str, Dict[str, Any]] = {}
+        self.allocations: Dict[str, List[tracemalloc.StatisticDiff]] = {}
+        # Pilha de escopos (requisição, nós) ativos em cada thread
+        self._threads: Dict[int, List[str]] = {}
+        self._peaks: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        start_tracing()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.request_id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        stop_tracing()
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = [(tid, list(scopes)) for tid, scopes in self._threads.items() if scopes]
+            for tid, scopes in threads:
+                frame = frames.get(tid)
+                if frame is not None:
+                    self.samples[";".join([*scopes, folded_stack(frame)])] += 1
+                    self.scope_samples[scopes[-1]] += 1
+
+    @contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """Mede o trecho executado na thread atual (um nó ou a requisição inteira)"""
+        tid = threading.get_ident()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            self._threads.setdefault(tid, []).append(name)
+            peaks = self._peaks.setdefault(tid, [])
+            peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                self._threads[tid].pop()
+                # O pico dos escopos internos conta para o externo (cada escopo reinicia o pico global)
+                peak = max(peak, peaks.pop())
+                if peaks:
+                    peaks[-1] = max(peaks[-1], peak)
+            self.allocations[name] = allocation_diff(tracemalloc.take_snapshot(), before, self.top)
+            self.scopes[name] = {
+                "seconds": seconds,
+                "allocated_bytes": current - start_memory,
+                "peak_bytes": peak - start_memory,
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        """Tempo, memória e amostras próprias (sem as dos escopos internos) de cada escopo"""
+        return {
+            "request_id": self.request_id,
+            "interval_seconds": self.interval,
+            "scopes": {
+                name: {**data, "samples": self.scope_samples.get(name, 0)} for name, data in self.scopes.items()
+            },
+        }
+
+    def write(self) -> str:
+        """Grava os relatórios e retorna o diretório"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "cpu.folded"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.directory, "allocations.txt"), "w", encoding="utf-8") as f:
+            for name, stats in self.allocations.items():
+                scope = self.scopes[name]
+                f.write(f"== {name}: {scope['allocated_bytes'] / 1024:+.1f} KiB líquidos, "
+                        f"pico {scope['peak_bytes'] / 1024:.1f} KiB, {scope['seconds'] * 1000:.1f} ms\n")
+                for stat in stats:
+                    f.write(f"{stat}\n")
+                f.write("\n")
+        with open(os.path.join(self.directory, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return self.directory
+
+
+@contextmanager
+def profile_request(
+    request_id: str, enabled: bool, directory: str, request_scope: bool = True, **kwargs
+) -> Iterator[Optional[RequestProfiler]]:
+    """Perfila a requisição enquanto o bloco executa (não faz nada quando desativado)
+
+    request_scope mede também a thread atual fora dos nós (o runtime do LangGraph); deve ser
+    falso quando o bloco pode continuar em outra thread, como num gerador de streaming.
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = RequestProfiler(request_id, directory, **kwargs)
+    profiler.start()
+    with _active_lock:
+        _active[request_id] = profiler
+    try:
+        if request_scope:
+            with profiler.scope("request"):
+                yield profiler
+        else:
+            yield profiler
+    finally:
+        with _active_lock:
+            _active.pop(request_id, None)
+        profiler.stop()
+        try:
+            logger.info(f"Perfil da requisição gravado em {profiler.write()}")
+        except Exception as e:
+            logger.error(f"Erro ao gravar perfil da requisição: {e}")
+
+
+def profiled(fn: Callable) -> Callable:
+    """Decora um nó do grafo (método que recebe o estado) para ser medido quando a requisição é perfilada"""
+    @functools.wraps(fn)
+    def wrapper(self, state, *args, **kwargs):
+        profiler = _active.get(state.get("request_id")) if _active else None
+        if profiler is None:
+            return fn(self, state, *args, **kwargs)
+        with profiler.scope(fn.__name__):
+            return fn(self, state, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from langchain.schema.messages import BaseMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+# Custo aproximado de formatação por mensagem no formato de chat (papel, separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken ausente ou sem o arquivo de codificação em cache
+    _encoding = None
+    logger.info("tiktoken indisponível, usando contagem aproximada de tokens")
+
+
+def count_tokens(text: str) -> int:
+    """Conta os tokens de um texto com o tokenizador local"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Aproximação: palavras longas costumam ser divididas em vários sub-tokens
+    return sum(1 + len(token) // 6 for token in _TOKEN_PATTERN.findall(text))
+
+
+def count_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Conta os tokens de uma lista de mensagens de chat"""
+    return sum(count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def compact(text: str) -> str:
+    """Remove indentação e linhas em branco redundantes de um prompt"""
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.strip().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def pack_context(docs: List[Dict], budget: int) -> List[Dict]:
+    """Seleciona documentos em ordem de relevância até atingir o orçamento de tokens"""
+    packed = []
+    used = 0
+    for doc in docs:
+        cost = count_tokens(doc["content"]) + 2  # marcador "- " e quebra de linha
+        if used + cost > budget:
+            logger.debug(f"Documento ignorado por exceder o orçamento de contexto ({cost} tokens)")
+            continue
+        packed.append(doc)
+        used += cost
+    return packed
+
+
+def format_context(docs: List[Dict]) -> str:
+    return "\n".join(f"- {compact(doc['content'])}" for doc in docs)
+
+
+def format_numbered(texts: Sequence[str]) -> str:
+    return "\n".join(f"{i}. {compact(text)}" for i, text in enumerate(texts, 1))
+
+
+def parse_numbered_verdicts(content: str, n: int) -> List[bool]:
+    """Lê as linhas "N: true/false"; itens sem resposta são considerados não validados"""
+    verdicts = [False] * n
+    for index, verdict in re.findall(r"(\d+)\s*[:.)-]\s*(true|false)", content.lower()):
+        if 1 <= int(index) <= n:
+            verdicts[int(index) - 1] = verdict == "true"
+    return verdicts
+
+
+PROCESS_INPUT_PROMPT = compact("""
+    Você é um classificador de intenções.
+    IMPORTANTE: Responda APENAS com UMA das seguintes palavras, sem pontuação ou texto adicional:
+    - fact (quando o usuário compartilha uma informação factual)
+    - question (quando o usuário faz uma pergunta)
+    - preference (quando o usuário expressa uma preferência ou gosto)
+    - feedback (quando o usuário fornece feedback)
+    Exemplos:
+    "A Terra é redonda" -> fact
+    "Qual é a capital do Brasil?" -> question
+    "Eu prefiro explicações detalhadas" -> preference
+    "Gostei muito da sua resposta" -> feedback
+""")
+
+VALIDATE_FACT_PROMPT = compact("""
+    Você é um assistente especializado em validar fatos em português.
+    Analise cuidadosamente a entrada do usuário e determine se é uma afirmação factual que pode ser validada.
+    Responda apenas com:
+    - true: se for um fato claro e verificável
+    - false: se for opinião, preferência ou não puder ser verificado
+    Exemplos de fatos válidos:
+    - "A água ferve a 100°C ao nível do mar"
+    - "O Brasil é o maior país da América do Sul"
+    Exemplos de não-fatos:
+    - "Eu adoro chocolate"
+    - "O azul é a cor mais bonita"
+    Considere apenas a verificabilidade, não a veracidade.
+""")
+
+VALIDATE_FACT_BATCH_PROMPT = compact("""
+    Você é um assistente que valida vários fatos de uma vez, em português.
+    Para cada afirmação numerada, determine se é uma afirmação factual que pode ser validada.
+    Responda apenas com uma linha por afirmação, no formato "N: true" ou "N: false":
+    - true: se for um fato claro e verificável
+    - false: se for opinião, preferência ou não puder ser verificado
+    Considere apenas a verificabilidade, não a veracidade.
+""")
+
+UPDATE_PREFERENCES_PROMPT = compact("""
+    Você é um analisador de preferências.
+    IMPORTANTE: Sua resposta deve ser EXATAMENTE um objeto JSON válido, sem texto adicional.
+    Analise a mensagem e identifique preferências relacionadas a:
+    - tom: formal ou casual
+    - verbosidade: concisa, balanceada ou detalhada
+    - formalidade: formal ou informal
+    Se nenhuma preferência for identificada, retorne {}.
+    Se identificar uma preferência, inclua APENAS as preferências mencionadas.
+    Exemplos:
+    "Prefiro um tom mais formal" -> {"tom": "formal"}
+    "Gosto de explicações detalhadas" -> {"verbosidade": "detalhada"}
+    "Quero respostas formais e concisas" -> {"tom": "formal", "verbosidade": "concisa"}
+    "Gosto de matemática" -> {}
+""")
+
+GENERATE_RESPONSE_PROMPT = compact("""
+    Você é um assistente amigável em português que aprende com conversas.
+    Analise a entrada do usuário e o contexto fornecido. Se houver informações relevantes no contexto, use-as para enriquecer sua resposta.
+    Adapte seu tom e estilo de acordo com as preferências do usuário informadas junto com a mensagem.
+    Diretrizes para resposta:
+    - Se for um fato: confirme se foi validado e armazenado
+    - Se for uma pergunta: use o contexto para fornecer uma resposta precisa
+    - Se for uma preferência: confirme as mudanças
+    - Se for um feedback: agradeça e explique como isso ajuda a melhorar
+    Mantenha suas respostas em português, de forma concisa e relevante.
+    Use uma linguagem natural e amigável.
+""")
+
+SUMMARIZE_HISTORY_PROMPT = compact("""
+    Você resume conversas em português.
+    Atualize o resumo existente incorporando os novos turnos. Preserve fatos, preferências e pedidos do usuário que possam ser úteis depois.
+    Responda apenas com o resumo, em poucas frases.
+""")
+
+
+@dataclass(frozen=True)
+class StaticPrefix:
+    """Prefixo estático de um prompt, construído uma única vez e reutilizado em todas as chamadas"""
+    name: str
+    messages: Tuple[BaseMessage, ...]
+    key: str
+    tokens: int
+
+    @classmethod
+    def from_system_prompt(cls, name: str, content: str) -> "StaticPrefix":
+        messages = (SystemMessage(content=content),)
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        return cls(name=name, messages=messages, key=key, tokens=count_message_tokens(messages))
+
+
+def build_prefixes() -> Mapping[str, StaticPrefix]:
+    """Constrói os prefixos estáticos de todos os nós que chamam o LLM"""
+    prompts = {
+        "process_input": PROCESS_INPUT_PROMPT,
+        "validate_fact": VALIDATE_FACT_PROMPT,
+        "validate_fact_batch": VALIDATE_FACT_BATCH_PROMPT,
+        "update_preferences": UPDATE_PREFERENCES_PROMPT,
+        "generate_response": GENERATE_RESPONSE_PROMPT,
+        "summarize_history": SUMMARIZE_HISTORY_PROMPT,
+    }
+    return MappingProxyType({
+        name: StaticPrefix.from_system_prompt(name, content)
+        for name, content in prompts.items()
+    })
+
+
+def format_preferences(preferences: Dict[str, str]) -> str:
+    lines = "\n".join(f"- {key}: {value}" for key, value in preferences.items())
+    return "Preferências do usuário:\n" + lines if lines else "Preferências do usuário: padrão"
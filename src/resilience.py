@@ -0,0 +1,295 @@
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from src.config import settings
+from src.metrics import metrics
+from src.scheduler import WorkScheduler, create_scheduler, current_lane
+
+logger = logging.getLogger(__name__)
+
+# Status HTTP que indicam sobrecarga ou falha temporária do provedor
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Disjuntor aberto: o provedor está falhando e a chamada foi rejeitada sem tentativa"""
+
+
+class LLMSaturatedError(Exception):
+    """Não havia capacidade (taxa ou concorrência) para a chamada dentro do tempo de espera"""
+
+
+class DeadlineExceededError(Exception):
+    """O prazo da requisição terminou (ou terminaria durante a espera) antes de uma resposta do LLM"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Indica se o erro é transitório do provedor (sobrecarga, timeout, conexão)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+    name = type(error).__name__
+    return any(marker in name for marker in ("Timeout", "Connection", "RateLimit", "InternalServer"))
+
+
+class TokenBucket:
+    """Balde de tokens reabastecido continuamente a uma taxa por minuto"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """Consome os tokens se houver saldo; caso contrário retorna o tempo de espera necessário"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> float:
+        """Bloqueia até haver tokens suficientes; retorna o tempo esperado"""
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(amount)
+            if wait == 0.0:
+                return time.monotonic() - start
+            waited = time.monotonic() - start
+            if timeout is not None and waited + wait > timeout:
+                raise LLMSaturatedError(f"Limite de taxa excedido (espera estimada de {wait:.1f}s)")
+            time.sleep(wait)
+
+    def refund(self, amount: float = 1.0) -> None:
+        """Devolve tokens consumidos por uma chamada que não chegou a ser feita"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class RateLimiter:
+    """Limite de requisições por minuto e de tokens por minuto (0 desativa cada limite)"""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> float:
+        waited = 0.0
+        if self.requests is not None:
+            waited += self.requests.acquire(1, timeout)
+        if self.tokens is not None and tokens > 0:
+            remaining = None if timeout is None else max(0.0, timeout - waited)
+            try:
+                waited += self.tokens.acquire(tokens, remaining)
+            except LLMSaturatedError:
+                if self.requests is not None:
+                    self.requests.refund(1)
+                raise
+        return waited
+
+    def refund(self, tokens: int = 0) -> None:
+        """Devolve a requisição e os tokens obtidos por acquire quando a chamada não é feita"""
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None and tokens > 0:
+            self.tokens.refund(tokens)
+
+
+class CircuitBreaker:
+    """Disjuntor: abre após falhas consecutivas e libera uma chamada de teste após o intervalo"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Provedor de LLM indisponível (disjuntor aberto)")
+                self._state = self.HALF_OPEN
+            # Meio aberto: apenas uma chamada de teste por vez
+            if self._probe_in_flight:
+                raise CircuitOpenError("Provedor de LLM em recuperação (disjuntor meio aberto)")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Disjuntor do LLM aberto após {self._failures} falhas")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Libera a chamada de teste sem registrar sucesso nem falha (erro não relacionado ao provedor)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class LLMGuard:
+    """Aplica limite de taxa, escalonamento por pista, disjuntor e retentativas às chamadas de LLM"""
+
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_concurrency: int = 8,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        queue_timeout: float = 10.0,
+        sleep: Callable[[float], None] = time.sleep,
+        scheduler: Optional[WorkScheduler] = None,
+    ):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self._sleep = sleep
+        # Vagas de chamadas simultâneas divididas entre as pistas (interativa antes das de fundo)
+        self.scheduler = scheduler or WorkScheduler("llm", max_concurrency)
+
+    def backoff(self, attempt: int) -> float:
+        """Espera exponencial com jitter completo"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        node: str = "llm",
+        model: str = "",
+        deadline: Optional[float] = None,
+        lane: Optional[str] = None,
+        can_retry: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """Executa a chamada; deadline (time.monotonic) limita a espera na fila e as retentativas
+
+        lane é a pista do escalonador (padrão: a do contexto). can_retry, se informado, é consultado
+        após uma falha transitória: chamadas que já produziram efeitos visíveis (tokens transmitidos)
+        não são repetidas.
+        """
+        lane = lane or current_lane()
+        for attempt in range(self.max_retries + 1):
+            queue_timeout = self.queue_timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.inc("llm_requests_total", node=node, outcome="deadline")
+                    raise DeadlineExceededError(f"Prazo da requisição esgotado antes da chamada em {node}")
+                queue_timeout = min(queue_timeout, remaining)
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                metrics.inc("llm_circuit_rejections_total", node=node)
+                raise
+            try:
+                waited = self.rate_limiter.acquire(tokens, timeout=queue_timeout)
+                if waited:
+                    metrics.observe("llm_rate_limit_wait_seconds", waited, node=node)
+                if not self.scheduler.acquire(lane, timeout=queue_timeout):
+                    # A chamada não será feita: os tokens de taxa voltam ao balde
+                    self.rate_limiter.refund(tokens)
+                    raise LLMSaturatedError("Limite de chamadas simultâneas ao LLM atingido")
+            except LLMSaturatedError:
+                self.breaker.release()
+                metrics.inc("llm_requests_total", node=node, outcome="saturated")
+                raise
+
+            metrics.add("llm_in_flight", 1)
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                metrics.observe("llm_latency_seconds", time.monotonic() - start, node=node, model=model)
+                if not is_retryable(e):
+                    self.breaker.release()
+                    metrics.inc("llm_requests_total", node=node, outcome="error")
+                    raise
+                self.breaker.record_failure()
+                metrics.set("llm_circuit_open", 1 if self.breaker.state != CircuitBreaker.CLOSED else 0)
+                if attempt >= self.max_retries or (can_retry is not None and not can_retry()):
+                    metrics.inc("llm_requests_total", node=node, outcome="failed")
+                    raise
+                delay = self.backoff(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    # Não há tempo para outra tentativa dentro do prazo
+                    metrics.inc("llm_requests_total", node=node, outcome="deadline")
+                    raise
+                logger.warning(f"Falha transitória do LLM em {node} ({e}), nova tentativa em {delay:.2f}s")
+                metrics.inc("llm_retries_total", node=node)
+            else:
+                self.breaker.record_success()
+                metrics.set("llm_circuit_open", 0)
+                metrics.observe("llm_latency_seconds", time.monotonic() - start, node=node, model=model)
+                metrics.inc("llm_requests_total", node=node, outcome="success")
+                return result
+            finally:
+                metrics.add("llm_in_flight", -1)
+                self.scheduler.release(lane)
+            self._sleep(delay)
+
+
+_guard: Optional[LLMGuard] = None
+_guard_lock = threading.Lock()
+
+
+def get_llm_guard() -> LLMGuard:
+    """Guarda compartilhado por todas as instâncias do Chatbot no processo"""
+    global _guard
+    with _guard_lock:
+        if _guard is None:
+            _guard = LLMGuard(
+                rate_limiter=RateLimiter(settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_TOKENS_PER_MINUTE),
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                scheduler=create_scheduler("llm", settings.LLM_MAX_CONCURRENCY),
+                breaker=CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS),
+                max_retries=settings.LLM_MAX_RETRIES,
+                base_delay=settings.LLM_RETRY_BASE_DELAY,
+                max_delay=settings.LLM_RETRY_MAX_DELAY,
+                queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+            )
+        return _guard
@@ -0,0 +1,219 @@
+"""Escalonador das chamadas de LLM e de embeddings entre trabalho interativo e de fundo
+
+Cada recurso (LLM, modelo de embeddings) tem uma capacidade de chamadas simultâneas
+dividida entre pistas:
+
+- interactive: mensagens do chat; passa à frente de todo trabalho de fundo na fila e tem
+  vagas reservadas que as demais pistas não ocupam
+- ingestion, validation, summarization: ingestão de fatos em lote, validação adiada e resumo
+  do histórico; dividem as vagas restantes por enfileiramento justo ponderado (WFQ)
+
+Cada pista pode ter um limite próprio de chamadas simultâneas. Chamadas em andamento não são
+interrompidas: a preempção acontece na fila, a cada vaga liberada. A pista vem do contexto
+(contextvars), definida com `with lane(...)`; o padrão é interactive.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from src.config import settings
+from src.metrics import metrics
+
+INTERACTIVE = "interactive"
+INGESTION = "ingestion"
+VALIDATION = "validation"
+SUMMARIZATION = "summarization"
+LANES = (INTERACTIVE, INGESTION, VALIDATION, SUMMARIZATION)
+
+_current_lane: ContextVar[str] = ContextVar("scheduler_lane", default=INTERACTIVE)
+
+
+def current_lane() -> str:
+    return _current_lane.get()
+
+
+@contextmanager
+def lane(name: str) -> Iterator[None]:
+    """Executa o bloco (e as chamadas de LLM e embeddings feitas nele) na pista indicada"""
+    if name not in LANES:
+        raise ValueError(f"Pista desconhecida: {name}")
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def parse_lane_values(value: str) -> Dict[str, float]:
+    """Lê o formato "pista=valor,pista=valor" das configurações"""
+    values = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, number = item.partition("=")
+        name = name.strip()
+        if name not in LANES:
+            raise ValueError(f"Pista desconhecida: {name}")
+        values[name] = float(number)
+    return values
+
+
+@dataclass
+class Lane:
+    name: str
+    weight: float = 1.0
+    limit: int = 0  # 0 = apenas a capacidade do recurso
+    priority: int = 1  # menor = atendida antes
+    in_flight: int = 0
+    finish: float = 0.0  # marca de término virtual da última chamada enfileirada
+
+
+@dataclass
+class Ticket:
+    lane: str
+    priority: int
+    start: float
+    finish: float
+    seq: int
+
+
+class WorkScheduler:
+    """Fila de um recurso com pistas de prioridade, WFQ entre pistas e limites por pista"""
+
+    def __init__(
+        self,
+        resource: str,
+        capacity: int,
+        weights: Optional[Dict[str, float]] = None,
+        limits: Optional[Dict[str, float]] = None,
+        reserved: int = 0,
+    ):
+        self.resource = resource
+        self.capacity = max(1, capacity)
+        # Ao menos uma vaga fica disponível para o trabalho de fundo
+        self.reserved = min(max(0, reserved), self.capacity - 1)
+        weights = weights or {}
+        limits = limits or {}
+        self.lanes = {
+            name: Lane(
+                name,
+                weight=max(weights.get(name, 1.0), 1e-6),
+                limit=int(limits.get(name, 0)),
+                priority=0 if name == INTERACTIVE else 1,
+            )
+            for name in LANES
+        }
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._waiting: List[Ticket] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _eligible(self, ticket: Ticket) -> bool:
+        state = self.lanes[ticket.lane]
+        if state.limit and state.in_flight >= state.limit:
+            return False
+        free = self.capacity - self._in_flight
+        return free > (0 if state.priority == 0 else self.reserved)
+
+    def _next(self) -> Optional[Ticket]:
+        """Próxima chamada a ser atendida: maior prioridade, depois a menor marca de término virtual"""
+        eligible = [ticket for ticket in self._waiting if self._eligible(ticket)]
+        return min(eligible, key=lambda t: (t.priority, t.finish, t.seq), default=None)
+
+    def acquire(self, lane: Optional[str] = None, cost: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Aguarda uma vaga na pista (a do contexto, se omitida); False se o tempo de espera acabar"""
+        name = lane or current_lane()
+        state = self.lanes[name]
+        labels = {"resource": self.resource, "lane": name}
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            # WFQ: cada pista avança custo/peso no tempo virtual a cada chamada enfileirada
+            tag = max(self._virtual_time, state.finish)
+            ticket = Ticket(name, state.priority, tag, tag + cost / state.weight, next(self._seq))
+            state.finish = ticket.finish
+            self._waiting.append(ticket)
+            metrics.add("scheduler_queued", 1, **labels)
+            try:
+                while self._next() is not ticket:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        if state.finish == ticket.finish:
+                            state.finish = ticket.start
+                        metrics.inc("scheduler_timeouts_total", **labels)
+                        return False
+                    self._cond.wait(remaining)
+                self._virtual_time = max(self._virtual_time, ticket.start)
+                self._in_flight += 1
+                state.in_flight += 1
+            finally:
+                self._waiting.remove(ticket)
+                metrics.add("scheduler_queued", -1, **labels)
+                # Outra chamada pode ter se tornado a próxima (vagas livres ou desistência)
+                self._cond.notify_all()
+        metrics.add("scheduler_in_flight", 1, **labels)
+        metrics.observe("scheduler_queue_seconds", time.monotonic() - start, **labels)
+        return True
+
+    def release(self, lane: str) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self.lanes[lane].in_flight -= 1
+            self._cond.notify_all()
+        metrics.add("scheduler_in_flight", -1, resource=self.resource, lane=lane)
+
+    def run(self, fn: Callable[[], Any], cost: float = 1.0, timeout: Optional[float] = None) -> Any:
+        """Executa a chamada na pista do contexto; TimeoutError se não houver vaga a tempo"""
+        name = current_lane()
+        if not self.acquire(name, cost, timeout):
+            raise TimeoutError(f"Sem vaga para {self.resource} na pista {name} em {timeout}s")
+        try:
+            return fn()
+        finally:
+            self.release(name)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Modelo de embeddings com as chamadas escalonadas (custo proporcional ao número de textos)"""
+
+    def __init__(self, embeddings: Embeddings, scheduler: WorkScheduler, timeout: Optional[float] = None):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+        self.timeout = timeout
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.run(lambda: self.embeddings.embed_documents(texts), max(1, len(texts)), self.timeout)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.scheduler.run(lambda: self.embeddings.embed_query(text), 1, self.timeout)
+
+
+def create_scheduler(resource: str, capacity: int) -> WorkScheduler:
+    """Escalonador com os pesos, limites e reserva das configurações"""
+    return WorkScheduler(
+        resource,
+        capacity,
+        weights=parse_lane_values(settings.SCHEDULER_LANE_WEIGHTS),
+        limits=parse_lane_values(settings.SCHEDULER_LANE_LIMITS),
+        reserved=settings.SCHEDULER_INTERACTIVE_RESERVED,
+    )
+
+
+_embedding_scheduler: Optional[WorkScheduler] = None
+_embedding_scheduler_lock = threading.Lock()
+
+
+def get_embedding_scheduler() -> WorkScheduler:
+    """Escalonador compartilhado do modelo de embeddings (limitado pela CPU do processo)"""
+    global _embedding_scheduler
+    with _embedding_scheduler_lock:
+        if _embedding_scheduler is None:
+            _embedding_scheduler = create_scheduler("embedding", settings.EMBEDDING_MAX_CONCURRENCY)
+        return _embedding_scheduler
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.memory import ConversationMemory
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """Ciclo de vida das memórias de conversa por sessão
+
+    Sessões ociosas além do TTL, ou as menos recentes quando o limite global de memória
+    ou de sessões é excedido, são descarregadas em disco (ou descartadas, sem diretório)
+    e restauradas de forma transparente no próximo acesso. As sessões removidas são
+    escolhidas sob o lock, mas gravadas depois de liberá-lo; uma sessão acessada antes
+    do fim da gravação é retomada da memória.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], ConversationMemory],
+        idle_ttl: float = 1800.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_sessions: int = 1000,
+        offload_directory: str = "",
+        sweep_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.offload_directory = offload_directory
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._lock = threading.RLock()
+        # Ordem de acesso: a sessão menos recente fica no início
+        self._sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        # Sessões removidas aguardando gravação: id -> (sequência, memória), e os dados a gravar
+        self._offloading: Dict[str, Tuple[int, ConversationMemory]] = {}
+        self._to_write: List[Tuple[str, int, Dict[str, Any]]] = []
+        self._offload_sequence = 0
+        self._last_sweep = clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    @property
+    def bytes_held(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, session_id: str) -> ConversationMemory:
+        """Retorna a memória da sessão, restaurando-a do disco ou criando-a se necessário"""
+        with self._lock:
+            memory = self._load(session_id)
+            self._update_gauges()
+        self._write_offloaded()
+        return memory
+
+    def update(self, session_id: str, fn: Callable[[ConversationMemory], Any]) -> Any:
+        """Aplica fn à memória da sessão sob o lock e atualiza seu tamanho
+
+        A sessão não pode ser removida entre a leitura e a alteração, o que perderia a alteração
+        feita em uma memória já descarregada.
+        """
+        with self._lock:
+            memory = self._load(session_id)
+            result = fn(memory)
+            self._sizes[session_id] = memory.size_bytes()
+            self._enforce_limits(keep=session_id)
+            self._update_gauges()
+        self._write_offloaded()
+        return result
+
+    def touch(self, session_id: str) -> None:
+        """Atualiza o tamanho da sessão após uma alteração e aplica o limite de memória"""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                return
+            self._sizes[session_id] = memory.size_bytes()
+            self._last_used[session_id] = self._clock()
+            self._enforce_limits(keep=session_id)
+            self._update_gauges()
+        self._write_offloaded()
+
+    def sweep(self) -> int:
+        """Remove da memória as sessões ociosas além do TTL; retorna quantas foram removidas"""
+        with self._lock:
+            removed = self._sweep()
+        self._write_offloaded()
+        return removed
+
+    def close(self) -> None:
+        """Descarrega todas as sessões (ex.: no encerramento do processo)"""
+        with self._lock:
+            for session_id in list(self._sessions):
+                self._evict(session_id, "shutdown")
+            self._update_gauges()
+        self._write_offloaded()
+
+    def _load(self, session_id: str) -> ConversationMemory:
+        self._maybe_sweep()
+        memory = self._sessions.get(session_id)
+        if memory is None:
+            offloading = self._offloading.pop(session_id, None)
+            if offloading is not None:
+                # Removida há pouco e ainda sendo gravada: a gravação é descartada
+                memory = offloading[1]
+            else:
+                memory = self.factory()
+                if self._restore(session_id, memory):
+                    metrics.inc("sessions_restored_total")
+            self._sessions[session_id] = memory
+            self._sizes[session_id] = memory.size_bytes()
+            self._enforce_limits(keep=session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        self._last_used[session_id] = self._clock()
+        return memory
+
+    def _sweep(self) -> int:
+        self._last_sweep = self._clock()
+        if self.idle_ttl <= 0:
+            return 0
+        deadline = self._clock() - self.idle_ttl
+        idle = [sid for sid in self._sessions if self._last_used.get(sid, 0.0) < deadline]
+        for session_id in idle:
+            self._evict(session_id, "idle")
+        self._update_gauges()
+        return len(idle)
+
+    def _maybe_sweep(self) -> None:
+        if self._clock() - self._last_sweep >= self.sweep_interval:
+            self._sweep()
+
+    def _enforce_limits(self, keep: str) -> None:
+        # Descarregar as sessões menos recentes até respeitar os limites, preservando a sessão em uso
+        for session_id in list(self._sessions):
+            over_count = len(self._sessions) > self.max_sessions
+            over_bytes = self.max_bytes > 0 and sum(self._sizes.values()) > self.max_bytes
+            if not (over_count or over_bytes):
+                return
+            if session_id != keep:
+                self._evict(session_id, "count" if over_count else "memory")
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        memory = self._sessions.pop(session_id)
+        self._last_used.pop(session_id, None)
+        self._sizes.pop(session_id, None)
+        if self.offload_directory:
+            data = memory.to_dict()
+            if data["summary"] or data["recent"] or data["pending"]:
+                self._offload_sequence += 1
+                self._offloading[session_id] = (self._offload_sequence, memory)
+                self._to_write.append((session_id, self._offload_sequence, data))
+        metrics.inc("sessions_evicted_total", reason=reason)
+        logger.info(f"Sessão removida da memória ({reason})")
+
+    def _path(self, session_id: str) -> str:
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.offload_directory, f"{name}.json")
+
+    def _write_offloaded(self) -> None:
+        """Grava em disco, fora do lock, as sessões removidas pelas chamadas anteriores"""
+        with self._lock:
+            pending, self._to_write = self._to_write, []
+        for session_id, sequence, data in pending:
+            self._offload(session_id, sequence, data)
+
+    def _offload(self, session_id: str, sequence: int, data: Dict[str, Any]) -> None:
+        path = self._path(session_id)
+        tmp_path = f"{path}.{sequence}.tmp"
+        try:
+            os.makedirs(self.offload_directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"session_id": session_id, **data}, f, ensure_ascii=False)
+            with self._lock:
+                # Só vale a gravação mais recente de uma sessão que continua fora da memória
+                current = self._offloading.get(session_id)
+                if current is None or current[0] != sequence:
+                    os.remove(tmp_path)
+                    return
+                os.replace(tmp_path, path)
+                del self._offloading[session_id]
+            metrics.inc("sessions_offloaded_total")
+        except Exception as e:
+            logger.error(f"Erro ao descarregar sessão em disco: {e}")
+            with self._lock:
+                current = self._offloading.get(session_id)
+                if current is not None and current[0] == sequence:
+                    del self._offloading[session_id]
+
+    def _restore(self, session_id: str, memory: ConversationMemory) -> bool:
+        if not self.offload_directory:
+            return False
+        path = self._path(session_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao restaurar sessão do disco: {e}")
+            return False
+        if data.get("session_id") != session_id:
+            return False
+        memory.load_dict(data)
+        os.remove(path)
+        return True
+
+    def _update_gauges(self) -> None:
+        metrics.set("sessions_active", len(self._sessions))
+        metrics.set("session_memory_bytes", sum(self._sizes.values()))
@@ -0,0 +1,344 @@
+"""Snapshots da coleção de fatos (textos, metadados e embeddings) para inicializar réplicas
+
+O formato é colunar: um .npz sem pickle com a matriz float32 de embeddings e cada coluna de
+texto como um bloco UTF-8 contínuo mais offsets. A importação grava em lote e não recalcula
+embeddings. Um snapshot incremental contém apenas os documentos novos ou alterados e os ids
+removidos desde o snapshot base; todo snapshot guarda o estado completo (id e hash) para
+servir de base ao próximo.
+
+    python -m src.snapshot export snapshots/base.npz
+    python -m src.snapshot export snapshots/delta-1.npz --base snapshots/base.npz
+    python -m src.snapshot import snapshots/base.npz
+    python -m src.snapshot import snapshots/delta-1.npz
+
+Com --all, o caminho é um diretório com um arquivo por coleção de fatos: a global, as dos
+namespaces e as da camada fria. Sem --all, apenas a coleção de --collection é exportada.
+
+    python -m src.snapshot export --all snapshots/base
+    python -m src.snapshot export --all snapshots/delta-1 --base snapshots/base
+    python -m src.snapshot import --all snapshots/base
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.vector_index import collection_metadata, index_params
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+STATE_FILE = "snapshots.json"
+
+
+def encode_strings(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Coluna de textos como bloco UTF-8 contínuo e offsets de início de cada valor"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    blob = data.tobytes()
+    return [blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def content_hash(document: Optional[str], metadata: Optional[Dict[str, Any]]) -> bytes:
+    payload = json.dumps([document or "", metadata or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+class Snapshot:
+    """Conteúdo de um arquivo de snapshot (colunas carregadas sob demanda)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = np.load(path, allow_pickle=False)
+        self.manifest = json.loads(self._data["manifest"].tobytes().decode("utf-8"))
+
+    def strings(self, column: str) -> List[str]:
+        return decode_strings(self._data[f"{column}_data"], self._data[f"{column}_offsets"])
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._data["embeddings"]
+
+    def state(self) -> Dict[str, bytes]:
+        """Hash de cada documento da coleção no momento do snapshot"""
+        hashes = self._data["state_hashes"]
+        return {doc_id: hashes[i].tobytes() for i, doc_id in enumerate(self.strings("state_ids"))}
+
+    def close(self) -> None:
+        self._data.close()
+
+
+def read_collection(collection: Any, include: List[str], batch_size: int):
+    """Percorre a coleção em lotes"""
+    offset = 0
+    while True:
+        batch = collection.get(include=include, limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            return
+        yield batch
+        offset += len(batch["ids"])
+
+
+def export_snapshot(collection: Any, path: str, base: Optional[str] = None, batch_size: int = 5000) -> Dict[str, Any]:
+    """Exporta a coleção (ou só as mudanças desde o snapshot base) e retorna as estatísticas"""
+    start = time.perf_counter()
+    base_snapshot = Snapshot(base) if base else None
+    base_state = base_snapshot.state() if base_snapshot else {}
+    state: Dict[str, bytes] = {}
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    embeddings: List[np.ndarray] = []
+
+    # No modo incremental, os embeddings só são lidos para os documentos alterados
+    include = ["documents", "metadatas"] if base_snapshot else ["documents", "metadatas", "embeddings"]
+    for batch in read_collection(collection, include, batch_size):
+        changed = []
+        for i, doc_id in enumerate(batch["ids"]):
+            digest = content_hash(batch["documents"][i], batch["metadatas"][i])
+            state[doc_id] = digest
+            if base_state.get(doc_id) != digest:
+                changed.append(i)
+        if base_snapshot and changed:
+            batch = collection.get(
+                ids=[batch["ids"][i] for i in changed], include=["documents", "metadatas", "embeddings"]
+            )
+            changed = range(len(batch["ids"]))
+        for i in changed:
+            ids.append(batch["ids"][i])
+            documents.append(batch["documents"][i] or "")
+            metadatas.append(batch["metadatas"][i] or {})
+        if len(changed):
+            embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32)[list(changed)])
+    deleted = [doc_id for doc_id in base_state if doc_id not in state]
+
+    matrix = np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "snapshot_id": uuid.uuid4().hex,
+        "base_id": base_snapshot.manifest["snapshot_id"] if base_snapshot else None,
+        "collection": collection.name,
+        "index": index_params(collection),
+        "count": len(ids),
+        "deleted": len(deleted),
+        "total": len(state),
+        "dim": int(matrix.shape[1]) if len(matrix) else None,
+        "created_at": time.time(),
+    }
+    if base_snapshot:
+        base_snapshot.close()
+    columns = {"manifest": np.frombuffer(json.dumps(manifest).encode("utf-8"), dtype=np.uint8), "embeddings": matrix}
+    for name, values in (
+        ("ids", ids),
+        ("documents", documents),
+        ("metadatas", [json.dumps(metadata, ensure_ascii=False) for metadata in metadatas]),
+        ("deleted", deleted),
+        ("state_ids", list(state)),
+    ):
+        columns[f"{name}_data"], columns[f"{name}_offsets"] = encode_strings(values)
+    columns["state_hashes"] = np.frombuffer(b"".join(state.values()), dtype=np.uint8).reshape(-1, 16)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        np.savez(f, **columns)
+    os.replace(f"{path}.tmp", path)
+    return throughput(manifest, path, time.perf_counter() - start)
+
+
+def throughput(manifest: Dict[str, Any], path: str, seconds: float) -> Dict[str, Any]:
+    size = os.path.getsize(path)
+    return {
+        "snapshot_id": manifest["snapshot_id"],
+        "documents": manifest["count"],
+        "deleted": manifest["deleted"],
+        "bytes": size,
+        "seconds": seconds,
+        "documents_per_second": manifest["count"] / seconds if seconds else 0.0,
+        "megabytes_per_second": size / 1e6 / seconds if seconds else 0.0,
+    }
+
+
+def fact_collections(client: Any, base: str) -> List[str]:
+    """Coleções de fatos: a global, as dos namespaces (<base>-<ns>-<hash>) e as frias (-cold)
+
+    As coleções temporárias de reconstrução do índice (-rebuild) ficam de fora.
+    """
+    names = [getattr(collection, "name", collection) for collection in client.list_collections()]
+    return sorted(
+        name for name in names
+        if name == base or (name.startswith(f"{base}-") and not name.endswith("-rebuild"))
+    )
+
+
+def export_all(
+    client: Any, directory: str, base: str, base_directory: Optional[str] = None, batch_size: int = 5000
+) -> Dict[str, Dict[str, Any]]:
+    """Exporta cada coleção de fatos para <directory>/<coleção>.npz
+
+    Com base_directory, cada coleção é exportada como incremental sobre o arquivo de mesmo nome
+    (ou completa, se a coleção não existia no snapshot base).
+    """
+    stats = {}
+    for name in fact_collections(client, base):
+        base_path = os.path.join(base_directory, f"{name}.npz") if base_directory else None
+        if base_path and not os.path.exists(base_path):
+            base_path = None
+        stats[name] = export_snapshot(
+            client.get_collection(name), os.path.join(directory, f"{name}.npz"), base_path, batch_size
+        )
+    return stats
+
+
+def import_all(
+    client: Any, directory: str, state_path: Optional[str] = None, batch_size: int = 5000, force: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    """Aplica cada snapshot do diretório à coleção de origem registrada nele"""
+    stats = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".npz"):
+            stats[filename[:-len(".npz")]] = import_snapshot(
+                client, os.path.join(directory, filename), state_path=state_path, batch_size=batch_size, force=force
+            )
+    return stats
+
+
+def load_state(state_path: str) -> Dict[str, str]:
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def import_snapshot(
+    client: Any,
+    path: str,
+    name: Optional[str] = None,
+    state_path: Optional[str] = None,
+    batch_size: int = 5000,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Aplica um snapshot à coleção sem recalcular embeddings e retorna as estatísticas
+
+    Um snapshot incremental só é aplicado sobre o snapshot base (registrado em state_path),
+    a menos que force seja verdadeiro.
+    """
+    start = time.perf_counter()
+    snapshot = Snapshot(path)
+    manifest = snapshot.manifest
+    if manifest["format"] != FORMAT_VERSION:
+        raise ValueError(f"Formato de snapshot não suportado: {manifest['format']}")
+    name = name or manifest["collection"]
+    applied = load_state(state_path) if state_path else {}
+    if manifest["base_id"] and not force and applied.get(name) != manifest["base_id"]:
+        raise ValueError(
+            f"Snapshot incremental exige o snapshot base {manifest['base_id']} "
+            f"(a coleção {name} está em {applied.get(name)})"
+        )
+
+    index = manifest["index"]
+    collection = client.get_or_create_collection(
+        name,
+        metadata=collection_metadata(index["space"] or "l2", index["m"] or 16,
+                                     index["ef_construction"] or 100, index["ef_search"] or 100),
+        embedding_function=None,
+    )
+    ids = snapshot.strings("ids")
+    documents = snapshot.strings("documents")
+    metadatas = [json.loads(metadata) for metadata in snapshot.strings("metadatas")]
+    embeddings = snapshot.embeddings
+    batch_size = min(batch_size, client.get_max_batch_size())
+    # Numa coleção vazia (réplica nova), add evita a verificação de existência do upsert
+    write = collection.add if collection.count() == 0 else collection.upsert
+    for offset in range(0, len(ids), batch_size):
+        end = offset + batch_size
+        write(
+            ids=ids[offset:end],
+            embeddings=embeddings[offset:end],
+            documents=documents[offset:end],
+            # O Chroma rejeita metadados vazios
+            metadatas=[metadata or None for metadata in metadatas[offset:end]],
+        )
+    deleted = snapshot.strings("deleted")
+    if not manifest["base_id"] and collection.count() > len(ids):
+        # Snapshot completo: a coleção passa a ser uma réplica exata
+        expected = set(snapshot.strings("state_ids"))
+        deleted += [doc_id for doc_id in collection.get(include=[])["ids"] if doc_id not in expected]
+    for offset in range(0, len(deleted), batch_size):
+        collection.delete(ids=deleted[offset:offset + batch_size])
+    snapshot.close()
+
+    if state_path:
+        applied[name] = manifest["snapshot_id"]
+        with open(f"{state_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(applied, f)
+        os.replace(f"{state_path}.tmp", state_path)
+    return throughput(manifest, path, time.perf_counter() - start)
+
+
+def report(action: str, stats: Dict[str, Any]) -> str:
+    return (
+        f"{action}: {stats['documents']} documentos, {stats['deleted']} remoções, "
+        f"{stats['bytes'] / 1e6:.1f} MB em {stats['seconds']:.2f}s "
+        f"({stats['documents_per_second']:.0f} docs/s, {stats['megabytes_per_second']:.1f} MB/s)"
+    )
+
+
+def main():
+    import chromadb
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default=settings.CHROMA_COLLECTION_NAME)
+    parser.add_argument("--persist-directory", default=settings.CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Exporta a coleção para um arquivo de snapshot")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--base", help="Snapshot anterior; exporta apenas as mudanças desde ele")
+    import_parser = commands.add_parser("import", help="Aplica um snapshot à coleção")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--force", action="store_true", help="Aplica um incremental mesmo sem o base")
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument(
+            "--all", action="store_true",
+            help="Todas as coleções de fatos (namespaces e camada fria); path é um diretório"
+        )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    client = chromadb.PersistentClient(path=args.persist_directory)
+    state_path = os.path.join(args.persist_directory, STATE_FILE)
+    if args.command == "export" and args.all:
+        for name, stats in export_all(client, args.path, args.collection, args.base, args.batch_size).items():
+            print(report(f"Exportação de {name}", stats))
+    elif args.command == "export":
+        collection = client.get_collection(args.collection)
+        print(report("Exportação", export_snapshot(collection, args.path, args.base, args.batch_size)))
+    elif args.command == "import" and args.all:
+        for name, stats in import_all(client, args.path, state_path, args.batch_size, args.force).items():
+            print(report(f"Importação de {name}", stats))
+    elif args.command == "import":
+        stats = import_snapshot(
+            client, args.path, args.collection,
+            state_path=state_path,
+            batch_size=args.batch_size, force=args.force
+        )
+        print(report("Importação", stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+logger = logging.getLogger(__name__)
+
+# Executor compartilhado para as respostas candidatas geradas em paralelo à validação
+_speculation_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-response")
+
+_DONE = object()
+
+
+class SpeculativeGeneration:
+    """Resposta candidata gerada em segundo plano, com os tokens disponíveis à medida que chegam"""
+
+    def __init__(self):
+        self._chunks: "queue.Queue[Any]" = queue.Queue()
+        self._cancelled = threading.Event()
+        self._emitted = 0
+        # Latência do provedor na tentativa concluída (registrada no estado como a do generate_response)
+        self.seconds: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def start(self, run: Callable[[], Any], executor: Optional[ThreadPoolExecutor] = None) -> "SpeculativeGeneration":
+        """Executa run em segundo plano; run deve consumir o stream do LLM com consume()"""
+        self.future = (executor or _speculation_executor).submit(run)
+        self.future.add_done_callback(lambda _: self._chunks.put(_DONE))
+        return self
+
+    def consume(self, stream: Iterable[BaseMessage]) -> AIMessage:
+        """Encaminha os tokens do stream à fila e retorna a mensagem completa"""
+        parts = []
+        start = time.perf_counter()
+        for chunk in stream:
+            # Candidata descartada: interromper a geração para liberar o provedor
+            if self._cancelled.is_set():
+                break
+            self._chunks.put(chunk)
+            self._emitted += 1
+            parts.append(chunk.content)
+        self.seconds = time.perf_counter() - start
+        return AIMessage(content="".join(parts))
+
+    def can_retry(self) -> bool:
+        """Uma nova tentativa só é possível antes do primeiro token (os já enviados não voltam)"""
+        return self._emitted == 0
+
+    def chunks(self) -> Iterator[BaseMessage]:
+        """Tokens da candidata, bloqueando até que ela termine"""
+        while True:
+            item = self._chunks.get()
+            if item is _DONE:
+                return
+            yield item
+
+    def result(self) -> AIMessage:
+        return self.future.result()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class CandidateReplayModel(BaseChatModel):
+    """Modelo de chat que reproduz os tokens de uma candidata especulativa
+
+    Invocado dentro do nó generate_response, faz com que apenas a candidata escolhida
+    seja transmitida pelo stream do grafo, como se fosse a chamada normal ao LLM.
+    """
+
+    candidate: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "speculative-replay"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        for _ in self.candidate.chunks():
+            pass
+        return ChatResult(generations=[ChatGeneration(message=self.candidate.result())])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for message in self.candidate.chunks():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=message.content))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        # Propagar a falha da geração em segundo plano
+        self.candidate.result()
+
+
+class SpeculationRegistry:
+    """Candidatas em andamento por requisição, até o nó generate_response escolher uma delas"""
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[bool, SpeculativeGeneration]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, request_id: str, candidates: Dict[bool, SpeculativeGeneration]) -> None:
+        with self._lock:
+            self._pending[request_id] = candidates
+
+    def take(self, request_id: str, verdict: bool) -> Optional[SpeculativeGeneration]:
+        """Retorna a candidata correspondente ao veredito e cancela as demais"""
+        with self._lock:
+            candidates = self._pending.pop(request_id, None)
+        if not candidates:
+            return None
+        for key, candidate in candidates.items():
+            if key != verdict:
+                candidate.cancel()
+        return candidates.get(verdict)
+
+    def discard(self, request_id: str) -> None:
+        with self._lock:
+            candidates = self._pending.pop(request_id, None)
+        for candidate in (candidates or {}).values():
+            candidate.cancel()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
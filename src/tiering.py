@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src.exact_index import ExactVectorStore, matches
+from src.metrics import metrics
+from src.namespaces import COLD, Scored, ShardRouter
+
+logger = logging.getLogger(__name__)
+
+
+def update_metadatas(store: Any, ids: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+    """Substitui os metadados dos documentos sem recalcular os embeddings"""
+    if isinstance(store, ExactVectorStore):
+        store.update_metadatas(ids, metadatas)
+    else:
+        store._collection.update(ids=list(ids), metadatas=list(metadatas))
+
+
+def embedded_batches(
+    store: Any,
+    batch_size: int = 1000,
+    ids: Optional[Sequence[str]] = None,
+    include: Sequence[str] = ("embeddings", "documents", "metadatas"),
+) -> Iterable[Dict[str, Any]]:
+    """Documentos com embeddings, metadados e textos, em lotes (todos ou os ids pedidos)"""
+    if isinstance(store, ExactVectorStore):
+        yield from store.batches(batch_size, ids)
+        return
+    include = list(include)
+    if ids is not None:
+        for offset in range(0, len(ids), batch_size):
+            yield store._collection.get(ids=list(ids[offset:offset + batch_size]), include=include)
+        return
+    offset = 0
+    while True:
+        batch = store._collection.get(include=include, limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            return
+        yield batch
+        offset += len(batch["ids"])
+
+
+def find_documents(store: Any, where: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Id e texto dos documentos cujos metadados satisfazem o filtro"""
+    if isinstance(store, ExactVectorStore):
+        return [
+            (doc_id, text)
+            for batch in store.batches()
+            for doc_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"])
+            if matches(metadata, where)
+        ]
+    result = store._collection.get(where=where, include=["documents"])
+    return list(zip(result["ids"], result["documents"]))
+
+
+def move_documents(source: Any, target: Any, ids: Sequence[str]) -> int:
+    """Move documentos entre coleções reaproveitando os embeddings"""
+    moved = 0
+    for batch in embedded_batches(source, ids=ids):
+        if not batch["ids"]:
+            continue
+        if isinstance(target, ExactVectorStore):
+            target.add_embeddings(batch["documents"], batch["embeddings"], batch["metadatas"], batch["ids"])
+        else:
+            target._collection.upsert(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"],
+            )
+        # Removido da origem só depois de gravado no destino
+        source.delete(ids=batch["ids"])
+        moved += len(batch["ids"])
+    return moved
+
+
+class FactTiering:
+    """Camadas quente e fria dos fatos armazenados
+
+    Cada documento retornado por get_context tem o último acesso (last_hit) e o número de
+    acessos (hit_count) registrados em memória e gravados em lote nos metadados. Documentos
+    sem acesso dentro do TTL vão para a camada fria, consultada apenas quando a quente não
+    retorna nada relevante; um documento encontrado na camada fria volta para a quente.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        ttl: float = 30 * 24 * 3600.0,
+        min_relevance: float = 0.25,
+        sweep_interval: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.router = router
+        self.ttl = ttl
+        self.min_relevance = min_relevance
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Acessos ainda não gravados: id(coleção) -> (coleção, {doc_id: (acessos, último acesso)})
+        self._hits: Dict[int, Tuple[Any, Dict[str, Tuple[int, float]]]] = {}
+        self._last_sweep = clock()
+        self._sweeping = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fact-tiering")
+
+    def search(self, query: str, namespace: Optional[str], k: int, filter: Optional[Dict] = None) -> List[Document]:
+        """Busca na camada quente, recorrendo à fria quando nada relevante é encontrado"""
+        embedding = self.router.embed_query(query)
+        results = self.router.search_scored(embedding, namespace, k, filter)
+        if not any(score >= self.min_relevance for _, score, _ in results):
+            metrics.inc("cold_tier_fallbacks_total")
+            cold = [item for item in self.router.search_scored(embedding, namespace, k, filter, tier=COLD)
+                    if item[1] >= self.min_relevance]
+            if cold:
+                results = sorted([*results, *cold], key=lambda item: item[1], reverse=True)[:k]
+                results = self.rewarm(namespace, results)
+        self.record_hits(results)
+        self.maybe_sweep()
+        return [doc for doc, _, _ in results]
+
+    def rewarm(self, namespace: Optional[str], results: List[Scored]) -> List[Scored]:
+        """Devolve à camada quente os documentos encontrados na camada fria"""
+        hot_for_cold = {id(self.router.shard(None, COLD)): self.router.shard(None)}
+        if namespace:
+            hot_for_cold[id(self.router.shard(namespace, COLD))] = self.router.shard(namespace)
+        rewarmed = []
+        for doc, score, store in results:
+            hot = hot_for_cold.get(id(store))
+            if hot is not None:
+                try:
+                    move_documents(store, hot, [doc.id])
+                    # Marcado como acessado já na volta, para não ser arquivado de novo antes do flush
+                    update_metadatas(hot, [doc.id], [{**doc.metadata, "last_hit": self._clock()}])
+                    metrics.inc("facts_rewarmed_total")
+                    store = hot
+                except Exception as e:
+                    logger.error(f"Erro ao devolver fato à camada quente: {e}")
+            rewarmed.append((doc, score, store))
+        return rewarmed
+
+    def record_hits(self, results: Iterable[Scored]) -> None:
+        now = self._clock()
+        with self._lock:
+            for doc, _, store in results:
+                if not doc.id:
+                    continue
+                _, hits = self._hits.setdefault(id(store), (store, {}))
+                count, _ = hits.get(doc.id, (0, now))
+                hits[doc.id] = (count + 1, now)
+
+    def flush(self) -> int:
+        """Grava nos metadados os acessos acumulados; retorna quantos documentos foram atualizados"""
+        with self._lock:
+            pending, self._hits = self._hits, {}
+        updated = 0
+        for store, hits in pending.values():
+            try:
+                docs = {doc.id: doc for doc in store.get_by_ids(list(hits))}
+                ids = [doc_id for doc_id in hits if doc_id in docs]
+                update_metadatas(store, ids, [
+                    {
+                        **docs[doc_id].metadata,
+                        "hit_count": int(docs[doc_id].metadata.get("hit_count", 0)) + hits[doc_id][0],
+                        "last_hit": hits[doc_id][1],
+                    }
+                    for doc_id in ids
+                ])
+                updated += len(ids)
+            except Exception as e:
+                logger.error(f"Erro ao gravar acessos dos fatos: {e}")
+        return updated
+
+    def archive(self, namespace: Optional[str], store: Any) -> int:
+        """Move para a camada fria os documentos sem acesso dentro do TTL"""
+        now = self._clock()
+        cutoff = now - self.ttl
+        idle, unseen = [], []
+        for batch in embedded_batches(store, include=["metadatas"]):
+            for doc_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                metadata = metadata or {}
+                if metadata.get("status") == "pending":
+                    continue
+                last_hit = metadata.get("last_hit")
+                if last_hit is None:
+                    # Documento anterior ao rastreamento: o TTL começa a contar agora
+                    unseen.append((doc_id, {**metadata, "last_hit": now}))
+                elif last_hit < cutoff:
+                    idle.append(doc_id)
+        if unseen:
+            update_metadatas(store, [doc_id for doc_id, _ in unseen], [metadata for _, metadata in unseen])
+        if not idle:
+            return 0
+        moved = move_documents(store, self.router.shard(namespace, COLD), idle)
+        metrics.inc("facts_archived_total", moved)
+        logger.info(f"{moved} fatos ociosos movidos para a camada fria")
+        return moved
+
+    def sweep(self) -> int:
+        """Grava os acessos pendentes e arquiva os fatos ociosos das camadas quentes abertas"""
+        self._last_sweep = self._clock()
+        self.flush()
+        archived = 0
+        for namespace, store in self.router.open_hot_shards():
+            try:
+                archived += self.archive(namespace, store)
+            except Exception as e:
+                logger.error(f"Erro ao arquivar fatos ociosos: {e}")
+        return archived
+
+    def maybe_sweep(self) -> None:
+        """Agenda a varredura em segundo plano quando o intervalo tiver passado"""
+        with self._lock:
+            if self._sweeping or self._clock() - self._last_sweep < self.sweep_interval:
+                return
+            self._sweeping = True
+            self._last_sweep = self._clock()
+        self._executor.submit(self._background_sweep)
+
+    def _background_sweep(self) -> None:
+        try:
+            self.sweep()
+        finally:
+            with self._lock:
+                self._sweeping = False
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.flush()
@@ -0,0 +1,144 @@
+"""Gravação anonimizada do tráfego de produção, para reproduzi-lo contra novas versões
+
+Cada mensagem processada vira uma linha JSON no arquivo de trace (comprimido com gzip quando
+o caminho termina em .gz). A linha guarda o instante de chegada, a sessão, a entrada
+anonimizada, a intenção, a validação, as preferências e a latência de cada chamada ao LLM.
+benchmarks/replay.py reproduz o trace com o mesmo padrão de chegada.
+
+A anonimização troca cada palavra por uma pseudo-palavra do mesmo tamanho, derivada de um
+HMAC com o sal. A pontuação e os espaços são mantidos. Palavras repetidas continuam iguais,
+então a forma das mensagens e as repetições entre elas são preservadas. O texto original não
+é recuperável sem o sal.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"\w+")
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def pseudonym(word: str, salt: bytes) -> str:
+    """Pseudo-palavra determinística do mesmo tamanho (dígitos continuam dígitos)"""
+    digest = hmac.new(salt, word.lower().encode("utf-8"), hashlib.sha256).digest()
+    while len(digest) < len(word):
+        digest += hashlib.sha256(digest).digest()
+    alphabet = "0123456789" if word.isdigit() else LETTERS
+    return "".join(alphabet[byte % len(alphabet)] for byte in digest[:len(word)])
+
+
+def anonymize(text: str, salt: bytes) -> str:
+    return WORD.sub(lambda match: pseudonym(match.group(0), salt), text)
+
+
+def hash_id(value: Optional[str], salt: bytes) -> Optional[str]:
+    if value is None:
+        return None
+    return hmac.new(salt, value.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def open_trace(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TrafficRecorder:
+    """Grava as mensagens processadas num arquivo de trace (uma linha JSON por mensagem)
+
+    "{pid}" no caminho é substituído pelo pid, para que cada worker do gunicorn tenha seu arquivo.
+    Sem sal configurado, um sal aleatório é usado, e as pseudo-palavras só são consistentes
+    dentro do mesmo arquivo.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        salt: str = "",
+        sample_rate: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path.format(pid=os.getpid())
+        self.salt = salt.encode("utf-8") if salt else os.urandom(16)
+        self.sample_rate = sample_rate
+        self._clock = clock
+        self._file = None
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return self._clock()
+
+    def record(
+        self,
+        arrival: float,
+        seconds: float,
+        message: str,
+        result: Dict[str, Any],
+        session_id: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> bool:
+        """Grava a mensagem (se amostrada); arrival é o instante de chegada pelo relógio do gravador"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        entry = {
+            "t": round(arrival, 4),
+            "session": hash_id(session_id, self.salt),
+            "namespace": hash_id(namespace, self.salt),
+            "input": anonymize(message, self.salt),
+            "intent": result.get("intent", ""),
+            "valid": result.get("is_valid", False),
+            "llm": {node: round(value, 4) for node, value in result.get("llm_seconds", {}).items()},
+            "seconds": round(seconds, 4),
+        }
+        if result.get("intent") == "preference":
+            entry["preferences"] = result.get("preferences", {})
+        if result.get("error"):
+            entry["error"] = True
+        if result.get("degraded"):
+            entry["degraded"] = result.get("degraded_reason")
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open_trace(self.path, "a")
+            self._file.write(line)
+            self._file.flush()
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Entradas de um ou mais arquivos de trace, em ordem de chegada"""
+    entries = []
+    for path in paths:
+        with open_trace(path, "r") as f:
+            try:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Última linha incompleta de um processo interrompido
+                        logger.warning(f"Linha {number} inválida em {path}, ignorada")
+            except EOFError:
+                # gzip sem o final do fluxo (processo ainda gravando ou encerrado sem close)
+                logger.warning(f"Arquivo {path} truncado; lidas as linhas completas")
+    return sorted(entries, key=lambda entry: entry["t"])
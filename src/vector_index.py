@@ -0,0 +1,198 @@
+"""Parâmetros do índice HNSW da coleção de fatos e comandos de manutenção
+
+    python -m src.vector_index info
+    python -m src.vector_index set-ef-search 64
+    python -m src.vector_index rebuild --distance cosine --m 32 --ef-construction 200
+    python -m src.vector_index vacuum
+
+rebuild e vacuum recusam-se a rodar enquanto a aplicação mantém o diretório aberto (--force ignora).
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from typing import IO, Any, Dict, Optional
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+DISTANCES = ("l2", "cosine", "ip")
+# ef_search padrão do Chroma, usado na criação quando CHROMA_HNSW_EF_SEARCH não é definido
+DEFAULT_EF_SEARCH = 100
+# Trava do diretório do Chroma: compartilhada pelos processos da aplicação, exclusiva na manutenção
+LOCK_FILE = "chatbot.lock"
+
+
+def collection_metadata(space: str, m: int, ef_construction: int, ef_search: int) -> Dict[str, Any]:
+    """Metadados de criação da coleção com os parâmetros do HNSW"""
+    if space not in DISTANCES:
+        raise ValueError(f"Métrica de distância inválida: {space} (use {', '.join(DISTANCES)})")
+    return {
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": ef_construction,
+        "hnsw:search_ef": ef_search,
+    }
+
+
+def collection_metadata_from_settings() -> Dict[str, Any]:
+    return collection_metadata(
+        settings.CHROMA_DISTANCE,
+        settings.CHROMA_HNSW_M,
+        settings.CHROMA_HNSW_EF_CONSTRUCTION,
+        settings.CHROMA_HNSW_EF_SEARCH or DEFAULT_EF_SEARCH,
+    )
+
+
+def index_params(collection: Any) -> Dict[str, Any]:
+    """Parâmetros efetivos do índice (configuração da coleção ou, em versões antigas, metadados)"""
+    config = (getattr(collection, "configuration_json", None) or {}).get("hnsw")
+    if config:
+        return {
+            "space": config.get("space"),
+            "m": config.get("max_neighbors"),
+            "ef_construction": config.get("ef_construction"),
+            "ef_search": config.get("ef_search"),
+        }
+    metadata = collection.metadata or {}
+    return {
+        "space": metadata.get("hnsw:space", "l2"),
+        "m": metadata.get("hnsw:M"),
+        "ef_construction": metadata.get("hnsw:construction_ef"),
+        "ef_search": metadata.get("hnsw:search_ef"),
+    }
+
+
+def set_ef_search(collection: Any, ef_search: int) -> None:
+    """Altera o ef_search de uma coleção existente (não exige reconstrução)
+
+    Um índice já carregado pelo processo mantém o valor anterior até o cliente ser reaberto.
+    """
+    if index_params(collection).get("ef_search") == ef_search:
+        return
+    collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    logger.info(f"ef_search da coleção {collection.name} alterado para {ef_search}")
+
+
+def lock_store(persist_directory: str, exclusive: bool = False) -> Optional[IO]:
+    """Obtém a trava do diretório do Chroma; ela vale até o arquivo retornado ser fechado
+
+    A aplicação a mantém compartilhada enquanto usa as coleções, e rebuild e vacuum a pedem exclusiva.
+    Levanta RuntimeError se a trava estiver com outro processo. Sem fcntl (Windows) retorna None.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        logger.warning("Sem fcntl: não é possível verificar se outro processo usa o diretório do Chroma")
+        return None
+    os.makedirs(persist_directory, exist_ok=True)
+    lock_file = open(os.path.join(persist_directory, LOCK_FILE), "a")
+    try:
+        fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        if exclusive:
+            raise RuntimeError(f"{persist_directory} está em uso pela aplicação; encerre-a antes da manutenção")
+        raise RuntimeError(f"Manutenção do índice em andamento em {persist_directory}")
+    return lock_file
+
+
+def copy_collection(source: Any, target: Any, batch_size: int = 1000) -> int:
+    """Copia documentos, metadados e embeddings sem recalcular os embeddings"""
+    copied = 0
+    while True:
+        batch = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=copied)
+        if not batch["ids"]:
+            return copied
+        target.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+        copied += len(batch["ids"])
+
+
+def rebuild_collection(client: Any, name: str, metadata: Optional[Dict[str, Any]] = None, batch_size: int = 1000) -> int:
+    """Reconstrói o índice da coleção com novos parâmetros; sem metadata, mantém os atuais"""
+    source = client.get_collection(name)
+    if metadata is None:
+        params = index_params(source)
+        metadata = collection_metadata(params["space"], params["m"], params["ef_construction"], params["ef_search"])
+    tmp_name = f"{name}-rebuild"
+    if tmp_name in [getattr(c, "name", c) for c in client.list_collections()]:
+        client.delete_collection(tmp_name)
+    target = client.create_collection(tmp_name, metadata=metadata, embedding_function=None)
+    start = time.monotonic()
+    copied = copy_collection(source, target, batch_size)
+    # A coleção antiga só é removida depois da cópia completa
+    client.delete_collection(name)
+    target.modify(name=name)
+    logger.info(f"Coleção {name} reconstruída com {copied} documentos em {time.monotonic() - start:.1f}s")
+    return copied
+
+
+def vacuum(client: Any, name: str, persist_directory: str) -> int:
+    """Remove as entradas apagadas do índice (reconstrução) e compacta o SQLite do Chroma"""
+    copied = rebuild_collection(client, name)
+    sqlite_path = os.path.join(persist_directory, "chroma.sqlite3")
+    if os.path.exists(sqlite_path):
+        before = os.path.getsize(sqlite_path)
+        with sqlite3.connect(sqlite_path) as connection:
+            connection.execute("VACUUM")
+        logger.info(f"SQLite compactado: {before} -> {os.path.getsize(sqlite_path)} bytes")
+    return copied
+
+
+def main():
+    import chromadb
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default=settings.CHROMA_COLLECTION_NAME)
+    parser.add_argument("--persist-directory", default=settings.CHROMA_PERSIST_DIRECTORY)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info", help="Mostra os parâmetros atuais do índice")
+    ef_parser = commands.add_parser("set-ef-search", help="Altera o ef_search sem reconstruir")
+    ef_parser.add_argument("ef_search", type=int)
+    rebuild_parser = commands.add_parser("rebuild", help="Reconstrói o índice com novos parâmetros")
+    rebuild_parser.add_argument("--distance", choices=DISTANCES, default=settings.CHROMA_DISTANCE)
+    rebuild_parser.add_argument("--m", type=int, default=settings.CHROMA_HNSW_M)
+    rebuild_parser.add_argument("--ef-construction", type=int, default=settings.CHROMA_HNSW_EF_CONSTRUCTION)
+    # Sem --ef-search, mantém o valor atual da coleção
+    rebuild_parser.add_argument("--ef-search", type=int, default=None)
+    rebuild_parser.add_argument("--batch-size", type=int, default=1000)
+    vacuum_parser = commands.add_parser("vacuum", help="Remove entradas apagadas e compacta o armazenamento")
+    for maintenance_parser in (rebuild_parser, vacuum_parser):
+        maintenance_parser.add_argument("--force", action="store_true", help="Roda mesmo com a aplicação em execução")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    lock = None
+    if args.command in ("rebuild", "vacuum"):
+        # Apagar e renomear a coleção sob uma aplicação em execução perde as escritas dela
+        try:
+            lock = lock_store(args.persist_directory, exclusive=True)
+        except RuntimeError as e:
+            if not args.force:
+                raise SystemExit(f"{e} (--force ignora esta verificação)")
+            logger.warning(f"{e}; continuando por causa de --force")
+    client = chromadb.PersistentClient(path=args.persist_directory)
+    if args.command == "info":
+        collection = client.get_collection(args.collection)
+        print(f"{args.collection}: {collection.count()} documentos, {index_params(collection)}")
+    elif args.command == "set-ef-search":
+        set_ef_search(client.get_collection(args.collection), args.ef_search)
+    elif args.command == "rebuild":
+        ef_search = args.ef_search or index_params(client.get_collection(args.collection))["ef_search"]
+        metadata = collection_metadata(args.distance, args.m, args.ef_construction, ef_search or DEFAULT_EF_SEARCH)
+        rebuild_collection(client, args.collection, metadata, args.batch_size)
+    elif args.command == "vacuum":
+        vacuum(client, args.collection, args.persist_directory)
+    if lock:
+        lock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ def mock_settings(monkeypatch):
     mock_settings.MODEL_NAME = "test-model"
     mock_settings.TEMPERATURE = 0.7
     mock_settings.EMBEDDING_MODEL = "test-embeddings"
+    mock_settings.UI_MAX_MESSAGES = 200
+    mock_settings.UI_HISTORY_PAGE_SIZE = 20
     
     # Aplicar o mock
     monkeypatch.setattr('src.config.settings', mock_settings)
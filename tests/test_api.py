@@ -0,0 +1,168 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from src.metrics import MetricsRegistry
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from src.api import AdmissionController, ReleasingStreamingResponse, create_app
+
+
+@pytest.fixture
+def mock_chatbot():
+    chatbot = MagicMock()
+    chatbot.process_message.return_value = {
+        "response": "Paris",
+        "is_valid": False,
+        "error": None,
+        "intent": "question",
+        "preferences": {}
+    }
+    chatbot.stream_message.return_value = iter([
+        {"type": "token", "content": "Par"},
+        {"type": "token", "content": "is"},
+        {"type": "result", "response": "Paris", "error": None},
+    ])
+    return chatbot
+
+
+@pytest.fixture
+def client(mock_chatbot):
+    with TestClient(create_app(lambda: mock_chatbot)) as client:
+        yield client
+
+
+def test_process_message_endpoint(client, mock_chatbot):
+    """Testa o endpoint de processamento de mensagens"""
+    response = client.post("/v1/messages", json={"message": "Qual é a capital da França?", "session_id": "s1"})
+    assert response.status_code == 200
+    assert response.json()["response"] == "Paris"
+    assert response.json()["session_id"] == "s1"
+    mock_chatbot.process_message.assert_called_once_with("Qual é a capital da França?", "s1", False, None, None, False, None)
+
+
+def test_requests_without_session_get_their_own(client, mock_chatbot):
+    """Testa que requisições sem session_id não compartilham uma sessão padrão"""
+    first = client.post("/v1/messages", json={"message": "Oi"}).json()["session_id"]
+    second = client.post("/v1/messages", json={"message": "Oi"}).json()["session_id"]
+    assert first != second
+    assert [call[0][1] for call in mock_chatbot.process_message.call_args_list] == [first, second]
+
+
+def test_profile_requires_server_permission(client, mock_chatbot):
+    """Testa que o perfil pedido pelo cliente só é atendido quando o servidor permite"""
+    client.post("/v1/messages", json={"message": "Oi", "profile": True})
+    assert mock_chatbot.process_message.call_args[0][5] is False
+    
+    with patch("src.api.settings.PROFILING_ALLOW_PER_REQUEST", True):
+        client.post("/v1/messages", json={"message": "Oi", "profile": True})
+    assert mock_chatbot.process_message.call_args[0][5] is True
+
+
+def test_namespace_from_authenticated_header(client, mock_chatbot):
+    """Testa que, com o cabeçalho configurado, o namespace vem do proxy de autenticação e não do corpo"""
+    with patch("src.api.settings.API_NAMESPACE_HEADER", "X-Tenant-Id"):
+        client.post("/v1/messages", json={"message": "Oi"}, headers={"X-Tenant-Id": "acme"})
+        assert mock_chatbot.process_message.call_args[0][4] == "acme"
+        
+        response = client.post("/v1/messages", json={"message": "Oi", "namespace": "outra"},
+                               headers={"X-Tenant-Id": "acme"})
+        assert response.status_code == 403
+        
+        client.post("/v1/messages", json={"message": "Oi"})
+        assert mock_chatbot.process_message.call_args[0][4] is None
+
+
+def test_request_id_is_validated(client, mock_chatbot):
+    """Testa que request_id com separadores de caminho ou longo demais é rejeitado"""
+    for request_id in ("../../x", "/tmp/x", "a" * 129, ""):
+        assert client.post("/v1/messages", json={"message": "Oi", "request_id": request_id}).status_code == 422
+    mock_chatbot.process_message.assert_not_called()
+    
+    assert client.post("/v1/messages", json={"message": "Oi", "request_id": "req_1-a"}).status_code == 200
+    assert mock_chatbot.process_message.call_args[0][6] == "req_1-a"
+
+
+def test_generation_options_endpoint(client, mock_chatbot):
+    """Testa o repasse das opções de geração e a rejeição de valores inválidos"""
+    response = client.post("/v1/messages", json={"message": "Oi", "temperature": 0.2, "max_tokens": 50})
+    assert response.status_code == 200
+    options = mock_chatbot.process_message.call_args[0][3]
+    assert options.temperature == 0.2 and options.max_tokens == 50
+    
+    response = client.post("/v1/messages", json={"message": "Oi", "temperature": 5})
+    assert response.status_code == 422
+
+
+def test_stream_endpoint(client):
+    """Testa o endpoint de streaming via server-sent events"""
+    response = client.post("/v1/messages/stream", json={"message": "Capital da França?"})
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert response.status_code == 200
+    assert [json.loads(e)["type"] for e in events[:-1]] == ["token", "token", "result"]
+    assert json.loads(events[-2])["session_id"]
+    assert events[-1] == "[DONE]"
+
+
+def test_stream_status_and_slot_release(client, mock_chatbot):
+    """Testa que o status do streaming vem do evento final e que a vaga é liberada"""
+    mock_chatbot.stream_message.return_value = iter([{"type": "result", "response": "Erro", "error": "falhou"}])
+    with patch("src.api.metrics", MetricsRegistry()) as registry:
+        client.post("/v1/messages/stream", json={"message": "Oi"})
+    assert registry.get("api_requests_total", endpoint="stream", status="error") == 1
+    assert registry.get("api_in_flight") == 0
+
+
+def test_streaming_response_closes_on_disconnect():
+    """Testa que a vaga é liberada mesmo quando o cliente desconecta antes de o corpo ser lido"""
+    closed = []
+
+    async def body():
+        yield "data: x\n\n"
+
+    async def send(message):
+        raise OSError("conexão encerrada")
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    response = ReleasingStreamingResponse(body(), lambda: closed.append(1), media_type="text/event-stream")
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(Exception):
+        asyncio.run(response(scope, receive, send))
+    assert closed == [1]
+
+
+def test_metrics_and_health_endpoints(client):
+    """Testa os endpoints de métricas e de saúde"""
+    client.post("/v1/messages", json={"message": "oi"})
+    metrics_text = client.get("/metrics").text
+    assert "api_requests_total" in metrics_text
+    assert client.get("/healthz").json()["status"] == "ok"
+
+
+def test_admission_rejects_when_saturated():
+    """Testa a rejeição com 429 quando a fila está cheia"""
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=1)
+        await admission.acquire()
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire()
+        admission.release()
+        await admission.acquire()
+        admission.release()
+        return exc_info.value.status_code
+
+    assert asyncio.run(scenario()) == 429
+
+
+def test_admission_queue_timeout():
+    """Testa a rejeição quando a espera na fila excede o limite"""
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=0.01)
+        await admission.acquire()
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire()
+        return exc_info.value.status_code
+
+    assert asyncio.run(scenario()) == 429
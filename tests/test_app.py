@@ -157,3 +157,67 @@ def test_preference_update(mock_chatbot):
             
             # Verify preferences updated
             assert st.session_state.current_preferences == new_preferences
+
+
+class TestAppScript:
+    """Executa o script real do Streamlit com AppTest, com o Chatbot compartilhado substituído por um mock"""
+
+    @pytest.fixture(autouse=True)
+    def mock_streamlit(self):
+        # O AppTest precisa das funções reais do Streamlit
+        yield
+
+    @pytest.fixture
+    def app_chatbot(self, mock_settings, mock_chatbot):
+        mock_settings.CHATBOT_API_URL = ""
+        mock_settings.UI_HISTORY_PAGE_SIZE = 2
+        st.cache_resource.clear()
+        # O AppTest troca o __main__ pelo script; processos "spawn" de outros testes o reexecutariam
+        main = sys.modules["__main__"]
+        with patch("src.chatbot.Chatbot", return_value=mock_chatbot) as factory:
+            yield factory
+        sys.modules["__main__"] = main
+        st.cache_resource.clear()
+
+    def run_app(self):
+        from streamlit.testing.v1 import AppTest
+        app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "app.py")
+        return AppTest.from_file(app_path, default_timeout=30).run()
+
+    def test_history_window_and_load_more(self, app_chatbot):
+        """Testa que apenas a última página do histórico é desenhada e que o botão carrega a anterior"""
+        at = self.run_app()
+        at.session_state.messages = [{"role": "user", "content": f"Mensagem {i}"} for i in range(5)]
+        at.run()
+        assert [m.markdown[0].value for m in at.chat_message] == ["Mensagem 3", "Mensagem 4"]
+        assert at.button[0].label == "Carregar mensagens anteriores (3 ocultas)"
+        
+        at.button[0].click().run()
+        assert [m.markdown[0].value for m in at.chat_message] == ["Mensagem 1", "Mensagem 2", "Mensagem 3", "Mensagem 4"]
+        assert at.button[0].label == "Carregar mensagens anteriores (1 ocultas)"
+
+    def test_chat_fragment_updates_stats(self, app_chatbot, mock_chatbot):
+        """Testa o envio de mensagens pelo fragmento e a atualização dos contadores da barra lateral"""
+        at = self.run_app()
+        assert at.sidebar.metric[0].value == "0"
+        
+        at.chat_input[0].set_value("A Terra orbita o Sol").run()
+        assert mock_chatbot.process_message.call_args[0][0] == "A Terra orbita o Sol"
+        assert [m.markdown[0].value for m in at.chat_message] == ["A Terra orbita o Sol", "Test response"]
+        assert at.sidebar.metric[0].value == "1"
+        assert at.sidebar.metric[1].value == "1"
+        
+        at.chat_input[0].set_value("A Lua orbita a Terra").run()
+        assert at.sidebar.metric[0].value == "2"
+        assert len(at.sidebar.metric) == 4
+
+    def test_sessions_share_chatbot_with_own_session_ids(self, app_chatbot, mock_chatbot):
+        """Testa que duas sessões usam o mesmo Chatbot, cada uma com sua própria memória de conversa"""
+        first, second = self.run_app(), self.run_app()
+        first.chat_input[0].set_value("Oi").run()
+        second.chat_input[0].set_value("Oi").run()
+        
+        assert app_chatbot.call_count == 1
+        session_ids = [call[0][1] for call in mock_chatbot.process_message.call_args_list]
+        assert session_ids == [first.session_state.session_id, second.session_state.session_id]
+        assert session_ids[0] != session_ids[1]
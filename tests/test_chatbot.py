@@ -1,8 +1,8 @@
 import pytest
-from src.chatbot import Chatbot, ChatState
+from src.chatbot import Chatbot, ChatState, session_key
 import os
 import shutil
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 import json
 
 # Fixture para criar e limpar o ambiente de teste
@@ -495,4 +495,601 @@ def test_process_message_with_workflow_error(test_chatbot):
     result = test_chatbot.process_message("test message")
     assert result["error"]
     assert not result["is_valid"]
-    assert "error" in result["response"].lower()
\ No newline at end of file
+    assert "error" in result["response"].lower()
+def test_prompt_tokens_reported_per_node(test_chatbot):
+    """Testa o registro de tokens de prompt por nó"""
+    test_chatbot.llm.invoke.return_value.content = "question"
+    
+    state = ChatState(
+        input="Qual é a capital da França?",
+        intent="",
+        is_valid=False,
+        response="",
+        error=None,
+        preferences={"tom": "casual"},
+        context=[]
+    )
+    
+    result = test_chatbot.process_input(state)
+    result = test_chatbot.generate_response(result)
+    assert result["prompt_tokens"]["process_input"] > 0
+    assert result["prompt_tokens"]["generate_response"] > result["prompt_tokens"]["process_input"]
+
+def test_context_packed_within_budget(test_chatbot):
+    """Testa que o contexto recuperado respeita o orçamento de tokens"""
+    test_chatbot.vector_store.similarity_search.return_value = [
+        MagicMock(page_content="Paris " * 1000, metadata={"type": "fact"}),
+        MagicMock(page_content="Paris é a capital da França", metadata={"type": "fact"})
+    ]
+    
+    state = ChatState(
+        input="Fale sobre Paris",
+        intent="question",
+        is_valid=False,
+        response="",
+        error=None,
+        preferences={},
+        context=[]
+    )
+    
+    result = test_chatbot.get_context(state)
+    assert [doc["content"] for doc in result["context"]] == ["Paris é a capital da França"]
+
+def test_dynamic_parts_after_static_prefix(test_chatbot):
+    """Testa que preferências e contexto vêm depois do prefixo estático"""
+    test_chatbot.llm.invoke.return_value.content = "Resposta"
+    
+    state = ChatState(
+        input="O que você sabe sobre Paris?",
+        intent="question",
+        is_valid=False,
+        response="",
+        error=None,
+        preferences={"tom": "formal"},
+        context=[{"content": "Paris é a capital da França", "metadata": {}}]
+    )
+    
+    test_chatbot.generate_response(state)
+    messages = test_chatbot.llm.invoke.call_args.args[0]
+    assert messages[0] is test_chatbot.prefixes["generate_response"].messages[0]
+    assert "tom: formal" in messages[-2].content
+    assert "Paris é a capital da França" in messages[-2].content
+    assert messages[-1].content == state["input"]
+
+def test_fake_backend_selection():
+    """Testa a seleção do backend falso através das configurações"""
+    from src.fake_llm import FakeChatModel
+    
+    with patch('src.chatbot.settings.LLM_BACKEND', 'fake'), \
+         patch('src.chatbot.ChatGroq') as mock_groq, \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    
+    assert isinstance(chatbot.llm, FakeChatModel)
+    mock_groq.assert_not_called()
+
+def test_llm_calls_go_through_guard(test_chatbot):
+    """Testa que as chamadas ao LLM passam pelo limitador e pelo disjuntor"""
+    from src.resilience import CircuitBreaker, LLMGuard
+    
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    test_chatbot.guard = LLMGuard(breaker=breaker)
+    test_chatbot.degraded_mode = False
+    
+    state = ChatState(
+        input="A Terra é redonda",
+        intent="",
+        is_valid=False,
+        response="",
+        error=None,
+        preferences={},
+        context=[]
+    )
+    
+    result = test_chatbot.process_input(state)
+    assert "disjuntor" in result["error"]
+    test_chatbot.llm.invoke.assert_not_called()
+
+def test_stream_message_emits_only_response_tokens(test_chatbot):
+    """Testa que o streaming emite apenas os tokens da resposta final"""
+    final_state = {
+        "input": "Fale sobre Paris",
+        "intent": "question",
+        "is_valid": False,
+        "response": "Paris é linda",
+        "error": None,
+        "preferences": {},
+        "context": []
+    }
+    test_chatbot.workflow.stream.return_value = iter([
+        ("messages", (MagicMock(content="question"), {"langgraph_node": "process_input"})),
+        ("messages", (MagicMock(content="Paris "), {"langgraph_node": "generate_response"})),
+        ("messages", (MagicMock(content="é linda"), {"langgraph_node": "generate_response"})),
+        ("values", final_state),
+    ])
+    
+    events = list(test_chatbot.stream_message("Fale sobre Paris", session_id="s1"))
+    assert [e["content"] for e in events if e["type"] == "token"] == ["Paris ", "é linda"]
+    assert events[-1]["type"] == "result"
+    assert events[-1]["response"] == "Paris é linda"
+    assert len(test_chatbot.get_memory("s1")) == 1
+
+def test_sessions_have_separate_memory(test_chatbot):
+    """Testa que cada sessão tem sua própria memória de conversa"""
+    test_chatbot.process_message("Olá", session_id="a")
+    assert len(test_chatbot.get_memory("a")) == 1
+    assert len(test_chatbot.get_memory("b")) == 0
+
+def test_sessions_are_scoped_to_namespace(test_chatbot):
+    """Testa que o mesmo session_id em namespaces diferentes não compartilha a memória nem o hash do tráfego"""
+    test_chatbot.traffic_recorder = MagicMock()
+    test_chatbot.process_message("Olá", session_id="s1", namespace="acme")
+    assert len(test_chatbot.get_memory("s1", "acme")) == 1
+    assert len(test_chatbot.get_memory("s1", "outra")) == 0
+    assert len(test_chatbot.get_memory("s1")) == 0
+    assert test_chatbot.traffic_recorder.record.call_args[0][4] == session_key("s1", "acme")
+    assert session_key("s1", "acme") != session_key("s1", "outra") != session_key("s1")
+
+def test_per_node_model_routing():
+    """Testa o roteamento de modelos e limites de tokens por nó"""
+    default_llm = MagicMock()
+    small_llm = MagicMock()
+    small_llm.invoke.return_value.content = "fact"
+    
+    def create_client(**kwargs):
+        return small_llm if kwargs["model_name"] == "small-model" else default_llm
+    
+    with patch('src.chatbot.settings.PROCESS_INPUT_MODEL', 'small-model'), \
+         patch('src.chatbot.ChatGroq', side_effect=create_client) as mock_groq, \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    
+    mock_groq.assert_any_call(
+        api_key=ANY, model_name="small-model", temperature=ANY, max_tokens=5,
+        max_retries=0, request_timeout=ANY
+    )
+    assert chatbot.llm_for("process_input") is small_llm
+    assert chatbot.llm_for("generate_response") is default_llm
+    
+    state = ChatState(
+        input="A Terra é redonda",
+        intent="",
+        is_valid=False,
+        response="",
+        error=None,
+        preferences={},
+        context=[]
+    )
+    result = chatbot.process_input(state)
+    assert result["intent"] == "fact"
+    default_llm.invoke.assert_not_called()
+
+
+def test_hedged_nodes_use_hedger():
+    """Testa que apenas os nós configurados passam pelo hedging"""
+    with patch('src.chatbot.settings.HEDGE_ENABLED', True), \
+         patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.llm = MagicMock()
+    chatbot.llm.invoke.return_value.content = "fact"
+    
+    state = chatbot.create_initial_state("A Terra é redonda")
+    with patch('src.chatbot.get_hedger') as mock_get_hedger:
+        mock_get_hedger.return_value.call.side_effect = lambda fn, node: fn()
+        chatbot.process_input(state)
+        mock_get_hedger.return_value.call.assert_called_once_with(ANY, "process_input")
+        
+        mock_get_hedger.reset_mock()
+        chatbot.update_preferences({**state, "intent": "preference"})
+        mock_get_hedger.return_value.call.assert_not_called()
+
+
+def test_speculative_fact_response():
+    """Testa que a resposta a um fato é gerada durante a validação conforme o veredito"""
+    with patch('src.chatbot.settings.SPECULATIVE_FACT_RESPONSES', True), \
+         patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.llm = MagicMock()
+    chatbot.llm.invoke.return_value.content = "false"
+    
+    def fake_stream(messages):
+        verdict = "validado e armazenado" in messages[-2].content
+        yield MagicMock(content="válido" if verdict else "inválido")
+    chatbot.llm.stream.side_effect = fake_stream
+    
+    state = chatbot.create_initial_state("A Lua é feita de queijo")
+    state["intent"] = "fact"
+    state = chatbot.validate_fact(state)
+    assert state["is_valid"] is False
+    
+    state = chatbot.generate_response(state)
+    assert state["response"] == "inválido"
+    assert len(chatbot.speculations) == 0
+    # A latência da candidata usada conta como a do generate_response (gravada no tráfego)
+    assert set(state["llm_seconds"]) == {"validate_fact", "generate_response"}
+
+
+def test_deferred_fact_validation():
+    """Testa que o fato é armazenado como pendente e confirmado sem chamar o LLM"""
+    with patch('src.chatbot.settings.DEFERRED_FACT_VALIDATION', True), \
+         patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.llm = MagicMock()
+    chatbot.vector_store = MagicMock()
+    chatbot.fact_validator = MagicMock()
+    
+    state = chatbot.create_initial_state("A Terra orbita o Sol")
+    state["intent"] = "fact"
+    state = chatbot.validate_fact(state)
+    state = chatbot.store_information(state)
+    state = chatbot.generate_response(state)
+    
+    chatbot.llm.invoke.assert_not_called()
+    assert state["pending"] and not state["is_valid"]
+    docs = chatbot.vector_store.add_documents.call_args[0][0]
+    assert docs[0].metadata["status"] == "pending"
+    doc_id = chatbot.vector_store.add_documents.call_args[1]["ids"][0]
+    chatbot.fact_validator.submit.assert_called_once_with(doc_id, "A Terra orbita o Sol")
+    assert state["response"]
+
+
+def test_pending_facts_requeued_on_open(test_chatbot):
+    """Testa que fatos pendentes de uma execução anterior voltam à validação ao abrir a coleção"""
+    test_chatbot.fact_validator = MagicMock()
+    test_chatbot.pending_namespaces = {"b": "acme"}
+    store = MagicMock()
+    store._collection.get.return_value = {"ids": ["a", "b"], "documents": ["A Terra orbita o Sol", "fato b"]}
+    with patch.object(test_chatbot, "create_vector_store", return_value=store):
+        assert test_chatbot.open_shard("acme") is store
+    
+    store._collection.get.assert_called_once_with(where={"status": "pending"}, include=["documents"])
+    # "b" já está na fila
+    test_chatbot.fact_validator.submit.assert_called_once_with("a", "A Terra orbita o Sol")
+    assert test_chatbot.pending_namespaces["a"] == "acme"
+    
+    test_chatbot.shards.shard = MagicMock(return_value=store)
+    test_chatbot.promote_facts(["a", "b"])
+    test_chatbot.shards.shard.assert_called_once_with("acme")
+    assert test_chatbot.pending_namespaces == {}
+
+
+def test_context_excludes_pending_facts():
+    """Testa que fatos pendentes só entram no contexto quando solicitado"""
+    with patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.vector_store = MagicMock()
+    chatbot.vector_store.similarity_search.return_value = []
+    
+    state = chatbot.create_initial_state("O que é a Terra?")
+    state["intent"] = "question"
+    chatbot.get_context(state)
+    assert chatbot.vector_store.similarity_search.call_args[1]["filter"] == {"status": {"$ne": "pending"}}
+    
+    state = chatbot.create_initial_state("O que é a Terra?", include_pending=True)
+    state["intent"] = "question"
+    chatbot.get_context(state)
+    assert chatbot.vector_store.similarity_search.call_args[1]["filter"] is None
+
+
+def test_validate_fact_batch():
+    """Testa a validação de vários fatos em uma chamada"""
+    with patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.llm = MagicMock()
+    chatbot.llm.invoke.return_value.content = "1: true\n2: false"
+    
+    assert chatbot.validate_fact_batch(["A Terra é redonda", "Azul é a melhor cor"]) == [True, False]
+    chatbot.llm.invoke.assert_called_once()
+
+
+def test_concurrent_generation_options_do_not_mutate_client(test_chatbot):
+    """Testa que requisições simultâneas usam suas próprias opções sem alterar o cliente compartilhado"""
+    import threading
+    import time
+    from src.llm import GenerationOptions
+    
+    test_chatbot.llm = MagicMock()
+    test_chatbot.llm.temperature = 0.7
+    seen = {}
+    lock = threading.Lock()
+    
+    def fake_invoke(messages, **kwargs):
+        time.sleep(0.01)
+        with lock:
+            seen[messages[-1].content] = kwargs.get("temperature")
+        return MagicMock(content="ok")
+    test_chatbot.llm.invoke.side_effect = fake_invoke
+    
+    def worker(i):
+        state = test_chatbot.create_initial_state(f"mensagem {i}", f"s{i}", options=GenerationOptions(temperature=i / 10))
+        state["intent"] = "question"
+        test_chatbot.generate_response(state)
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert seen == {f"mensagem {i}": i / 10 for i in range(10)}
+    assert test_chatbot.llm.temperature == 0.7
+
+
+def test_namespace_routes_storage_and_validation():
+    """Testa que fatos de um namespace vão para a coleção dele, inclusive na promoção"""
+    with patch('src.chatbot.settings.DEFERRED_FACT_VALIDATION', True), \
+         patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.vector_store = MagicMock()
+    chatbot.fact_validator = MagicMock()
+    shard = MagicMock()
+    chatbot.shards.open_shard = MagicMock(return_value=shard)
+    
+    state = chatbot.create_initial_state("A Terra orbita o Sol", namespace="acme")
+    state["intent"] = "fact"
+    state = chatbot.validate_fact(state)
+    state = chatbot.store_information(state)
+    
+    shard.add_documents.assert_called_once()
+    chatbot.vector_store.add_documents.assert_not_called()
+    doc_id = shard.add_documents.call_args[1]["ids"][0]
+    
+    chatbot.promote_facts([doc_id])
+    shard._collection.update.assert_called_once()
+    chatbot.vector_store._collection.update.assert_not_called()
+    chatbot.shards.open_shard.assert_called_once_with("acme", "hot")
+
+
+def test_degraded_mode_when_provider_is_down(test_chatbot):
+    """Testa as respostas sem LLM quando o disjuntor está aberto"""
+    from src.metrics import MetricsRegistry
+    from src.resilience import CircuitBreaker, LLMGuard
+    
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    test_chatbot.guard = LLMGuard(breaker=breaker)
+    test_chatbot.vector_store.similarity_search.return_value = [
+        MagicMock(page_content="Paris é a capital da França. A cidade tem 2 milhões de habitantes.", metadata={})
+    ]
+    
+    with patch("src.chatbot.metrics", MetricsRegistry()) as metrics:
+        state = test_chatbot.create_initial_state("Qual é a capital da França?")
+        for node in ("process_input", "get_context", "validate_fact", "update_preferences",
+                     "store_information", "generate_response"):
+            state = getattr(test_chatbot, node)(state)
+    
+    test_chatbot.llm.invoke.assert_not_called()
+    assert state["error"] is None and state["intent"] == "question"
+    assert "Paris é a capital da França." in state["response"]
+    assert "habitantes" not in state["response"]
+    result = test_chatbot.build_result(state)
+    assert result["degraded"] and result["degraded_reason"] == "circuit_open"
+    # Contado uma vez por requisição
+    assert metrics.get("degraded_responses_total", reason="circuit_open") == 1
+
+
+def test_degraded_mode_near_deadline(test_chatbot):
+    """Testa que o LLM não é chamado sem tempo restante e que o fato fica pendente de validação"""
+    test_chatbot.fact_validator = MagicMock()
+    test_chatbot.request_deadline = 1.0
+    
+    state = test_chatbot.create_initial_state("A Terra orbita o Sol")
+    state["intent"] = "fact"
+    state = test_chatbot.validate_fact(state)
+    state = test_chatbot.store_information(state)
+    state = test_chatbot.generate_response(state)
+    
+    test_chatbot.llm.invoke.assert_not_called()
+    assert state["degraded"] == "deadline" and state["pending"]
+    test_chatbot.fact_validator.submit.assert_called_once()
+    assert state["response"]
+
+
+def test_errors_unrelated_to_provider_are_not_degraded(test_chatbot):
+    """Testa que erros que não indicam indisponibilidade do LLM continuam sendo reportados"""
+    test_chatbot.llm.invoke.side_effect = ValueError("resposta inválida")
+    
+    state = test_chatbot.process_input(test_chatbot.create_initial_state("A Terra é redonda"))
+    assert state["error"] and not state["degraded"]
+
+
+def test_preferences_extracted_locally_with_llm_fallback(test_chatbot):
+    """Testa que o LLM só é chamado quando a extração local tem confiança baixa"""
+    state = test_chatbot.create_initial_state("Quero respostas formais e concisas")
+    state["intent"] = "preference"
+    state = test_chatbot.update_preferences(state)
+    test_chatbot.llm.invoke.assert_not_called()
+    assert state["preferences"] == {"tom": "formal", "verbosidade": "concisa", "formalidade": "informal"}
+    
+    test_chatbot.llm.invoke.return_value.content = '{"verbosidade": "detalhada"}'
+    state = test_chatbot.create_initial_state("Explique tudo com bastante profundidade")
+    state["intent"] = "preference"
+    state = test_chatbot.update_preferences(state)
+    test_chatbot.llm.invoke.assert_called_once()
+    assert state["preferences"]["verbosidade"] == "detalhada"
+
+
+def test_process_message_with_profile(test_chatbot, tmp_path):
+    """Testa a gravação do perfil da requisição quando solicitado"""
+    with patch('src.chatbot.settings.PROFILING_DIRECTORY', str(tmp_path)):
+        test_chatbot.process_message("Oi", profile=True)
+        test_chatbot.process_message("Oi")
+    
+    profiles = list(tmp_path.iterdir())
+    assert len(profiles) == 1
+    summary = json.loads((profiles[0] / "summary.json").read_text())
+    assert "request" in summary["scopes"]
+
+
+def test_retry_resumes_from_failed_node():
+    """Testa que a nova tentativa retoma do nó que falhou sem repetir LLM nem armazenamento"""
+    with patch('src.chatbot.settings.CHECKPOINT_BACKEND', "memory"), \
+         patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'):
+        chatbot = Chatbot()
+    chatbot.llm = MagicMock()
+    chatbot.node_llms = {}
+    chatbot.llm.invoke.side_effect = [
+        MagicMock(content="fact"),
+        MagicMock(content="true"),
+        ValueError("falha na geração"),
+        MagicMock(content="Anotado!"),
+    ]
+    chatbot.vector_store = MagicMock()
+    chatbot.vector_store.similarity_search.return_value = []
+    
+    result = chatbot.process_message("A Terra orbita o Sol", session_id="s1", request_id="req-1")
+    assert result["error"] == "falha na geração" and result["request_id"] == "req-1"
+    assert chatbot.llm.invoke.call_count == 3
+    
+    result = chatbot.process_message("A Terra orbita o Sol", session_id="s1", request_id="req-1")
+    assert result["error"] is None and result["response"] == "Anotado!"
+    assert result["intent"] == "fact" and result["is_valid"]
+    assert chatbot.llm.invoke.call_count == 4
+    chatbot.vector_store.add_documents.assert_called_once()
+    
+    # Requisição concluída: devolve o resultado gravado sem registrar o turno de novo
+    result = chatbot.process_message("A Terra orbita o Sol", session_id="s1", request_id="req-1")
+    assert result["response"] == "Anotado!"
+    assert chatbot.llm.invoke.call_count == 4
+    assert len(chatbot.get_memory("s1")) == 1
+
+
+def test_checkpoint_scoped_to_session_and_message():
+    """Testa que um request_id repetido em outra sessão ou com outra mensagem não devolve o resultado gravado"""
+    with patch('src.chatbot.settings.CHECKPOINT_BACKEND', "memory"), \
+         patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'):
+        chatbot = Chatbot()
+    chatbot.llm = MagicMock()
+    chatbot.node_llms = {}
+    chatbot.llm.invoke.side_effect = [
+        MagicMock(content="question"), MagicMock(content="Resposta da sessão 1"),
+        MagicMock(content="question"), MagicMock(content="Resposta da sessão 2"),
+        MagicMock(content="question"), MagicMock(content="Outra resposta"),
+    ]
+    chatbot.vector_store = MagicMock()
+    chatbot.vector_store.similarity_search.return_value = []
+    
+    result = chatbot.process_message("Qual é o segredo?", session_id="s1", request_id="req-1")
+    assert result["response"] == "Resposta da sessão 1"
+    result = chatbot.process_message("Qual é o segredo?", session_id="s2", request_id="req-1")
+    assert result["response"] == "Resposta da sessão 2"
+    result = chatbot.process_message("Outra pergunta", session_id="s1", request_id="req-1")
+    assert result["response"] == "Outra resposta"
+    assert chatbot.llm.invoke.call_count == 6
+
+
+def test_repeated_request_overwrites_stored_fact():
+    """Testa que o id do documento é determinado pela requisição"""
+    with patch('src.chatbot.ChatGroq'), \
+         patch('src.chatbot.HuggingFaceEmbeddings'), \
+         patch('src.chatbot.Chroma'), \
+         patch('src.chatbot.StateGraph'):
+        chatbot = Chatbot()
+    chatbot.vector_store = MagicMock()
+    
+    ids = []
+    for request_id in ("req-1", "req-1", "req-2"):
+        state = chatbot.create_initial_state("A Terra orbita o Sol", request_id=request_id)
+        state.update(intent="fact", is_valid=True)
+        chatbot.store_information(state)
+        ids.append(chatbot.vector_store.add_documents.call_args[1]["ids"][0])
+    assert ids[0] == ids[1] != ids[2]
+
+
+def test_background_work_uses_scheduler_lanes(test_chatbot):
+    """Testa que ingestão, validação e resumo usam as pistas de fundo do escalonador"""
+    from src.scheduler import INGESTION, SUMMARIZATION, VALIDATION, current_lane
+    
+    test_chatbot.guard = MagicMock()
+    test_chatbot.guard.call.return_value.content = "1: true"
+    test_chatbot.fact_validator = MagicMock()
+    lanes = []
+    test_chatbot.vector_store.add_documents.side_effect = lambda docs, ids: lanes.append(current_lane())
+    
+    ids = test_chatbot.ingest_facts(["A Terra orbita o Sol", "A Lua orbita a Terra", "Marte é vermelho"], batch_size=2)
+    assert len(ids) == 3
+    assert all(len(doc_id) == 32 and "-" not in doc_id for doc_id in ids)
+    assert lanes == [INGESTION, INGESTION]
+    docs = test_chatbot.vector_store.add_documents.call_args_list[0][0][0]
+    assert docs[0].metadata["status"] == "pending"
+    assert test_chatbot.fact_validator.submit.call_count == 3
+    
+    test_chatbot.validate_fact_batch(["A Terra orbita o Sol"])
+    assert test_chatbot.guard.call.call_args[1]["lane"] == VALIDATION
+    test_chatbot.summarize_history("", [("Oi", "Olá")])
+    assert test_chatbot.guard.call.call_args[1]["lane"] == SUMMARIZATION
+
+
+def test_process_message_records_traffic(test_chatbot, tmp_path):
+    """Testa a gravação anonimizada das mensagens processadas, com a latência do LLM por nó"""
+    from src.traffic import TrafficRecorder, read_trace
+    
+    test_chatbot.traffic_recorder = TrafficRecorder(str(tmp_path / "trace.jsonl"), salt="sal")
+    test_chatbot.workflow.invoke.return_value = {
+        **test_chatbot.workflow.invoke.return_value,
+        "input": "A Terra orbita o Sol",
+        "intent": "fact",
+        "llm_seconds": {"process_input": 0.2, "generate_response": 1.1}
+    }
+    test_chatbot.process_message("A Terra orbita o Sol", session_id="s1")
+    test_chatbot.traffic_recorder.close()
+    
+    entry, = read_trace([str(tmp_path / "trace.jsonl")])
+    assert entry["intent"] == "fact" and entry["valid"] is True
+    assert entry["llm"] == {"process_input": 0.2, "generate_response": 1.1}
+    assert "Terra" not in entry["input"] and len(entry["input"]) == len("A Terra orbita o Sol")
+    assert entry["seconds"] >= 0
+
+
+def test_llm_latency_recorded_per_node(test_chatbot):
+    """Testa que a latência de cada chamada ao LLM fica no estado"""
+    test_chatbot.llm.invoke.return_value.content = "question"
+    test_chatbot.node_llms = {}
+    state = test_chatbot.create_initial_state("Qual é a capital do Brasil?")
+    state = test_chatbot.process_input(state)
+    assert set(state["llm_seconds"]) == {"process_input"}
+
+
+def test_stream_message_records_traffic(test_chatbot, tmp_path):
+    """Testa que as mensagens transmitidas por streaming também são gravadas no tráfego"""
+    from src.traffic import TrafficRecorder, read_trace
+    
+    test_chatbot.traffic_recorder = TrafficRecorder(str(tmp_path / "trace.jsonl"), salt="sal")
+    test_chatbot.workflow.stream.return_value = iter([
+        ("messages", (MagicMock(content="Paris"), {"langgraph_node": "generate_response"})),
+        ("values", {"input": "Fale sobre Paris", "intent": "question", "is_valid": False, "response": "Paris",
+                    "error": None, "preferences": {}, "context": [], "llm_seconds": {"generate_response": 0.8}}),
+    ])
+    events = list(test_chatbot.stream_message("Fale sobre Paris", session_id="s1"))
+    test_chatbot.traffic_recorder.close()
+    
+    assert events[-1]["type"] == "result"
+    entry, = read_trace([str(tmp_path / "trace.jsonl")])
+    assert entry["intent"] == "question" and entry["llm"] == {"generate_response": 0.8}
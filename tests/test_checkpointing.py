@@ -0,0 +1,39 @@
+from unittest.mock import MagicMock
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.checkpointing import CheckpointExpiry, create_checkpointer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_create_checkpointer():
+    """Testa a seleção do backend de checkpoint"""
+    assert create_checkpointer("none") is None
+    assert isinstance(create_checkpointer("memory"), MemorySaver)
+    with pytest.raises(ValueError):
+        create_checkpointer("redis")
+
+
+def test_expired_requests_are_deleted():
+    """Testa a remoção das requisições sem uso dentro do TTL"""
+    checkpointer = MagicMock()
+    clock = FakeClock()
+    expiry = CheckpointExpiry(checkpointer, ttl=60, clock=clock)
+    expiry.touch("a")
+    clock.now = 30
+    expiry.touch("b")
+    clock.now = 70
+    expiry.touch("a")
+
+    assert expiry.prune() == 0
+    clock.now = 95
+    assert expiry.prune() == 1
+    checkpointer.delete_thread.assert_called_once_with("b")
@@ -0,0 +1,57 @@
+from src.degraded import (
+    DEGRADED_ACKS,
+    DegradedModeError,
+    degraded_reason,
+    degraded_response,
+    extractive_answer,
+    guess_intent,
+)
+from src.resilience import CircuitOpenError, DeadlineExceededError, LLMSaturatedError
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_degraded_reason():
+    """Testa quais erros levam ao modo degradado"""
+    assert degraded_reason(CircuitOpenError()) == "circuit_open"
+    assert degraded_reason(LLMSaturatedError()) == "saturated"
+    assert degraded_reason(DeadlineExceededError()) == "deadline"
+    assert degraded_reason(DegradedModeError("deadline")) == "deadline"
+    assert degraded_reason(ProviderError(503)) == "provider_error"
+    assert degraded_reason(ProviderError(400)) is None
+    assert degraded_reason(ValueError("erro")) is None
+
+
+def test_guess_intent():
+    """Testa a estimativa de intenção sem o classificador"""
+    assert guess_intent("Qual é a capital do Brasil?") == "question"
+    assert guess_intent("como funciona a fotossíntese") == "question"
+    assert guess_intent("Eu prefiro explicações detalhadas") == "preference"
+    assert guess_intent("Gostei muito da sua resposta") == "feedback"
+    assert guess_intent("A Terra é redonda") == "fact"
+
+
+def test_extractive_answer_uses_best_matching_sentences():
+    """Testa a resposta extrativa a partir do contexto recuperado"""
+    context = [
+        {"content": "O Sol é uma estrela. A Terra orbita o Sol em um ano."},
+        {"content": "A Lua orbita a Terra."},
+    ]
+    answer = extractive_answer("Quanto tempo a Terra leva para orbitar o Sol?", context, max_sentences=1)
+    assert answer.endswith("- A Terra orbita o Sol em um ano.")
+
+    # Sem termos em comum, a primeira frase do documento mais relevante
+    assert extractive_answer("Por quê?", context).endswith("- O Sol é uma estrela.")
+    assert extractive_answer("Qual é a capital?", []) == DEGRADED_ACKS["no_context"]
+
+
+def test_degraded_response_templates():
+    """Testa as confirmações prontas de fatos, preferências e feedback"""
+    assert degraded_response("fact", "A Terra é redonda", [], is_valid=True) == DEGRADED_ACKS["fact"]
+    assert degraded_response("fact", "A Lua é de queijo", []) == DEGRADED_ACKS["invalid_fact"]
+    assert degraded_response("preference", "Seja mais formal", []) == DEGRADED_ACKS["preference"]
+    assert degraded_response("feedback", "Valeu!", []) == DEGRADED_ACKS["feedback"]
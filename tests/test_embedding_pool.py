@@ -0,0 +1,67 @@
+import os
+import pytest
+from unittest.mock import patch
+from src.embedding_pool import EmbeddingPool
+from src.metrics import MetricsRegistry
+
+
+class CharEmbeddings:
+    """Embeddings determinísticos: contagem de letras a-e, tamanho do texto e pid do worker"""
+
+    def embed_documents(self, texts):
+        return [[text.count(c) for c in "abcde"] + [len(text), os.getpid()] for text in texts]
+
+
+def load_char_embeddings():
+    return CharEmbeddings()
+
+
+def load_failing_embeddings():
+    raise RuntimeError("modelo indisponível")
+
+
+@pytest.fixture
+def pool():
+    pool = EmbeddingPool(load_char_embeddings, workers=2, batch_size=3, max_dimension=8)
+    yield pool
+    pool.close()
+
+
+def test_embeddings_computed_in_worker_processes(pool):
+    """Testa que os vetores vêm dos workers, na ordem dos textos, por memória compartilhada"""
+    texts = [f"abc{'d' * i}" for i in range(10)]
+    with patch("src.embedding_pool.metrics", MetricsRegistry()) as registry:
+        vectors = pool.embed_documents(texts)
+    assert [vector[:6] for vector in vectors] == [[1, 1, 1, i, 0, 3 + i] for i in range(10)]
+    assert os.getpid() not in {vector[6] for vector in vectors}
+    assert pool.embed_query("aab")[:6] == [2, 1, 0, 0, 0, 3]
+    assert pool.embed_documents([]) == []
+    assert registry.get("embedding_pool_texts_total") == 10
+    # Todos os buffers voltaram ao pool
+    assert pool._free.qsize() == 4
+
+
+def test_vectors_larger_than_buffer_are_rejected():
+    """Testa o erro quando o vetor não cabe no buffer compartilhado"""
+    pool = EmbeddingPool(load_char_embeddings, workers=1, batch_size=1, max_dimension=4)
+    try:
+        with pytest.raises(ValueError):
+            pool.embed_query("abc")
+        assert pool._free.qsize() == 2
+    finally:
+        pool.close()
+
+
+def test_broken_pool_is_restarted():
+    """Testa que o pool é descartado quando um worker não inicia"""
+    from concurrent.futures.process import BrokenProcessPool
+    
+    pool = EmbeddingPool(load_failing_embeddings, workers=1, batch_size=2, max_dimension=8)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            pool.embed_query("abc")
+        assert pool._executor is None
+        pool.factory = load_char_embeddings
+        assert pool.embed_query("abc")[:3] == [1, 1, 1]
+    finally:
+        pool.close()
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from src.exact_index import ExactVectorStore, matches
+
+
+class KeywordEmbeddings:
+    """Embeddings determinísticos: uma dimensão por palavra-chave"""
+
+    KEYWORDS = ["terra", "sol", "água", "lua"]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float(word in text) + 0.01 for word in self.KEYWORDS]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ExactVectorStore(KeywordEmbeddings(), str(tmp_path), min_compact_rows=2, initial_capacity=2)
+
+
+def test_matches_chroma_filters():
+    """Testa os operadores de filtro compatíveis com o Chroma"""
+    metadata = {"type": "fact", "status": "validated"}
+    assert matches(metadata, {"status": {"$ne": "pending"}})
+    assert matches({"type": "fact"}, {"status": {"$ne": "pending"}})
+    assert not matches(metadata, {"$and": [{"type": "fact"}, {"status": {"$in": ["pending"]}}]})
+    assert matches(metadata, {"$or": [{"type": "preference"}, {"status": "validated"}]})
+    with pytest.raises(ValueError):
+        matches(metadata, {"status": {"$gt": 1}})
+
+
+def test_search_returns_exact_neighbors_with_filter(store):
+    """Testa a busca exata, o filtro e o crescimento da matriz além da capacidade inicial"""
+    store.add_texts(
+        ["A Terra orbita o Sol", "A água ferve a 100°C", "A Lua orbita a Terra"],
+        metadatas=[{"status": "validated"}, {"status": "validated"}, {"status": "pending"}],
+        ids=["terra", "agua", "lua"],
+    )
+
+    docs = store.similarity_search("Terra e Lua", k=2)
+    assert [doc.id for doc in docs] == ["lua", "terra"]
+
+    docs = store.similarity_search("Terra e Lua", k=2, filter={"status": {"$ne": "pending"}})
+    assert [doc.id for doc in docs] == ["terra", "agua"]
+
+
+def test_brute_force_agrees_with_numpy(tmp_path):
+    """Testa que o top-k coincide com a ordenação completa das similaridades"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    store = ExactVectorStore(None, str(tmp_path))
+    store.add_embeddings([str(i) for i in range(500)], vectors, ids=[str(i) for i in range(500)])
+
+    query = rng.normal(size=16)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+    assert [row for row, _ in store.search(query, k=10)] == expected.tolist()
+
+
+def test_delete_update_and_reload(store, tmp_path):
+    """Testa que remoções, metadados e substituições persistem na recarga"""
+    store.add_texts(["A Terra orbita o Sol", "A água ferve"], metadatas=[{"status": "pending"}, {}], ids=["a", "b"])
+    store.update_metadatas(["a"], [{"status": "validated"}])
+    store.delete(ids=["b"])
+    store.add_texts(["A Lua orbita a Terra"], ids=["c"])
+    store.close()
+
+    reloaded = ExactVectorStore(KeywordEmbeddings(), str(tmp_path))
+    assert len(reloaded) == 2
+    assert reloaded.get_by_ids(["a"])[0].metadata == {"status": "validated"}
+    assert reloaded.get_by_ids(["b"]) == []
+    assert reloaded.similarity_search("Lua", k=1)[0].id == "c"
+
+
+def test_compaction_drops_deleted_rows(store, tmp_path):
+    """Testa a compactação automática e a recarga da nova geração"""
+    store.add_texts(["Terra", "Sol", "Água", "Lua"], ids=["1", "2", "3", "4"])
+    store.delete(ids=["1", "2"])
+
+    assert store.garbage == 0
+    assert len(store) == 2
+    assert sorted(name for name in (tmp_path).iterdir() if name.suffix != ".json") == sorted(
+        [tmp_path / "vetores-1.f32", tmp_path / "log-1.jsonl"]
+    )
+    store.close()
+
+    reloaded = ExactVectorStore(KeywordEmbeddings(), str(tmp_path))
+    assert [doc.id for doc in reloaded.similarity_search("Lua", k=1)] == ["4"]
+    assert len(reloaded) == 2
+
+
+def test_search_consistent_with_concurrent_compaction(store):
+    """Testa que uma compactação durante a busca não troca os documentos retornados"""
+    from src import exact_index
+
+    store.add_texts(
+        ["A água ferve a 100°C", "A Lua é um satélite", "A Terra orbita o Sol"],
+        ids=["agua", "lua", "terra"],
+    )
+    original = exact_index.normalize
+
+    def compact_midway(vector):
+        # Outra thread remove um documento e compacta entre o retrato e a montagem dos resultados
+        store.delete(ids=["agua"])
+        store.compact()
+        return original(vector)
+
+    with pytest.MonkeyPatch.context() as patcher:
+        patcher.setattr(exact_index, "normalize", compact_midway)
+        docs = store.similarity_search("Terra e Sol", k=1)
+    assert [(doc.id, doc.page_content) for doc in docs] == [("terra", "A Terra orbita o Sol")]
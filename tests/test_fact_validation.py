@@ -0,0 +1,84 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from src.fact_validation import FactValidator
+from src.metrics import MetricsRegistry
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics():
+    registry = MetricsRegistry()
+    with patch("src.fact_validation.metrics", registry):
+        yield registry
+
+
+def make_validator(validate_batch, **kwargs):
+    promote, reject = MagicMock(), MagicMock()
+    kwargs.setdefault("batch_wait", 0.05)
+    validator = FactValidator(validate_batch, promote, reject, **kwargs)
+    return validator, promote, reject
+
+
+def test_promotes_and_rejects_in_batches(isolated_metrics):
+    """Testa que os fatos são validados em lote e promovidos ou removidos"""
+    batches = []
+
+    def validate_batch(facts):
+        batches.append(facts)
+        return ["opinião" not in fact for fact in facts]
+
+    validator, promote, reject = make_validator(validate_batch, batch_size=3, workers=1, batch_wait=0.5)
+    validator.submit("a", "A Terra é redonda")
+    validator.submit("b", "Minha opinião é que azul é bonito")
+    validator.submit("c", "A água ferve a 100°C")
+    validator.join()
+    validator.close()
+
+    assert batches == [["A Terra é redonda", "Minha opinião é que azul é bonito", "A água ferve a 100°C"]]
+    promote.assert_called_once_with(["a", "c"])
+    reject.assert_called_once_with(["b"])
+    assert isolated_metrics.get("facts_pending") == 0
+    assert isolated_metrics.get("facts_validated_total", outcome="validated") == 2
+
+
+def test_batch_size_limit():
+    """Testa que os lotes respeitam o tamanho máximo"""
+    sizes = []
+
+    def validate_batch(facts):
+        sizes.append(len(facts))
+        return [True] * len(facts)
+
+    validator, promote, _ = make_validator(validate_batch, batch_size=2, workers=1)
+    for i in range(5):
+        validator.submit(str(i), f"fato {i}")
+    validator.join()
+    validator.close()
+    assert max(sizes) <= 2
+    assert sum(sizes) == 5
+
+
+def test_failed_batch_is_retried(isolated_metrics):
+    """Testa que um lote que falhou volta à fila e os fatos continuam pendentes até a validação"""
+    validate_batch = MagicMock(side_effect=[Exception("LLM indisponível"), Exception("LLM indisponível"), [True]])
+    validator, promote, reject = make_validator(validate_batch, retry_backoff=0.01)
+    validator.submit("a", "A Terra é redonda")
+    validator.join()
+    validator.close()
+    assert validate_batch.call_count == 3
+    promote.assert_called_once_with(["a"])
+    reject.assert_not_called()
+    assert isolated_metrics.get("fact_validation_batches_total", outcome="error") == 2
+    assert isolated_metrics.get("fact_validation_retries_total") == 2
+    assert isolated_metrics.get("facts_pending") == 0
+
+
+def test_close_interrupts_backoff():
+    """Testa que o encerramento não espera a próxima tentativa (os fatos continuam pendentes)"""
+    validator, promote, _ = make_validator(MagicMock(side_effect=Exception("LLM indisponível")), retry_backoff=30)
+    validator.submit("a", "A Terra é redonda")
+    time.sleep(0.2)
+    start = time.monotonic()
+    validator.close()
+    assert time.monotonic() - start < 5
+    promote.assert_not_called()
@@ -0,0 +1,148 @@
+import json
+import pytest
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+from langchain.schema.messages import HumanMessage, SystemMessage
+from src.fake_llm import (
+    FakeChatModel,
+    FakeLLMError,
+    FakeLLMServer,
+    LatencyModel,
+    ReplayChatModel,
+    fake_reply,
+    prompt_node,
+    replaying,
+)
+from src.prompts import GENERATE_RESPONSE_PROMPT, PROCESS_INPUT_PROMPT, VALIDATE_FACT_PROMPT, UPDATE_PREFERENCES_PROMPT
+
+
+def instant_latency(**kwargs):
+    return LatencyModel(distribution="fixed", mean_ms=0, tokens_per_second=0, **kwargs)
+
+
+def test_fake_reply_mimics_pipeline_nodes():
+    """Testa que o LLM falso responde de forma plausível para cada nó"""
+    assert fake_reply(PROCESS_INPUT_PROMPT, "Qual é a capital do Brasil?") == "question"
+    assert fake_reply(PROCESS_INPUT_PROMPT, "A Terra é redonda") == "fact"
+    assert fake_reply(PROCESS_INPUT_PROMPT, "Prefiro respostas formais") == "preference"
+    assert fake_reply(PROCESS_INPUT_PROMPT, "Gostei muito da sua resposta") == "feedback"
+    assert fake_reply(VALIDATE_FACT_PROMPT, "A água ferve a 100°C") == "true"
+    assert fake_reply(VALIDATE_FACT_PROMPT, "Eu adoro chocolate") == "false"
+    assert json.loads(fake_reply(UPDATE_PREFERENCES_PROMPT, "Quero um tom formal e respostas concisas")) == {
+        "tom": "formal", "verbosidade": "concisa"
+    }
+    assert len(fake_reply("", "Olá", response_tokens=10).split()) == 10
+
+
+def test_latency_model_is_deterministic():
+    """Testa que a mesma semente gera a mesma sequência de latências"""
+    first = LatencyModel(seed=42)
+    second = LatencyModel(seed=42)
+    samples = [first.sample_first_token_seconds() for _ in range(5)]
+    assert samples == [second.sample_first_token_seconds() for _ in range(5)]
+    assert all(sample >= 0 for sample in samples)
+    assert LatencyModel(distribution="fixed", mean_ms=250).sample_first_token_seconds() == 0.25
+    assert LatencyModel(tokens_per_second=100).token_seconds(50) == 0.5
+    with pytest.raises(ValueError):
+        LatencyModel(distribution="pareto")
+
+
+def test_fake_chat_model_sleeps_for_latency_and_tokens():
+    """Testa que o modelo simula o tempo até o primeiro token e a taxa de geração"""
+    model = FakeChatModel(
+        response_tokens=10,
+        latency=LatencyModel(distribution="fixed", mean_ms=100, tokens_per_second=100),
+    )
+    with patch.object(model, "_sleep") as sleep:
+        result = model.invoke([HumanMessage(content="Olá")])
+    assert len(result.content.split()) == 10
+    assert [call.args[0] for call in sleep.call_args_list] == [0.1, 0.1]
+
+
+def test_fake_chat_model_error_injection():
+    """Testa a injeção de erros com status HTTP"""
+    model = FakeChatModel(latency=instant_latency(error_rate=1.0))
+    with pytest.raises(FakeLLMError) as exc_info:
+        model.invoke([HumanMessage(content="Olá")])
+    assert exc_info.value.status_code in (429, 503)
+
+
+def test_fake_chat_model_stream_and_max_tokens():
+    """Testa o streaming e o limite de tokens"""
+    model = FakeChatModel(response_tokens=5, latency=instant_latency())
+    chunks = list(model.stream([HumanMessage(content="Olá")]))
+    assert len(chunks) == 5
+    limited = model.bind(max_tokens=2).invoke([HumanMessage(content="Olá")])
+    assert len(limited.content.split()) == 2
+
+
+@pytest.fixture
+def server():
+    server = FakeLLMServer(port=0, latency=instant_latency(), response_tokens=5)
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.read().decode("utf-8")
+
+
+def test_server_chat_completions(server):
+    """Testa o endpoint compatível com a API da OpenAI"""
+    status, body = post(f"{server.base_url}/chat/completions", {
+        "model": "fake",
+        "messages": [
+            {"role": "system", "content": PROCESS_INPUT_PROMPT},
+            {"role": "user", "content": "Qual é a capital do Brasil?"},
+        ],
+    })
+    assert status == 200
+    assert json.loads(body)["choices"][0]["message"]["content"] == "question"
+
+
+def test_server_streaming(server):
+    """Testa o streaming via server-sent events"""
+    status, body = post(f"{server.base_url}/chat/completions", {
+        "messages": [{"role": "user", "content": "Olá"}],
+        "stream": True,
+    })
+    events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+    assert status == 200
+    assert events[-1] == "[DONE]"
+    assert len(events) == 5 + 2
+
+
+def test_server_error_injection(server):
+    """Testa que o servidor retorna erros HTTP injetados"""
+    server.latency = instant_latency(error_rate=1.0)
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        post(f"{server.base_url}/chat/completions", {"messages": [{"role": "user", "content": "Olá"}]})
+    assert exc_info.value.code in (429, 503)
+
+
+def test_replay_model_reproduces_recorded_requests():
+    """Testa que o LLM de replay repete a latência e as decisões gravadas de cada nó"""
+    model = ReplayChatModel()
+    sleeps = []
+    model._sleep = sleeps.append
+    entry = {"intent": "preference", "preferences": {"tom": "formal"}, "valid": False,
+             "llm": {"process_input": 0.12, "generate_response": 0.8}}
+    assert prompt_node(PROCESS_INPUT_PROMPT) == "process_input"
+    assert prompt_node(GENERATE_RESPONSE_PROMPT) == "generate_response"
+
+    with replaying(entry):
+        # A entrada anonimizada não seria classificada como preferência
+        assert model.invoke([SystemMessage(content=PROCESS_INPUT_PROMPT), HumanMessage(content="xqz wkt")]).content == "preference"
+        preferences = model.invoke([SystemMessage(content=UPDATE_PREFERENCES_PROMPT), HumanMessage(content="xqz wkt")])
+        chunks = list(model.stream([SystemMessage(content=GENERATE_RESPONSE_PROMPT), HumanMessage(content="xqz")]))
+    assert json.loads(preferences.content) == {"tom": "formal"}
+    assert len(chunks) == 60
+    assert sleeps[:2] == [0.12, 0.0]
+    assert sum(sleeps[2:]) == pytest.approx(0.8)
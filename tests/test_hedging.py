@@ -0,0 +1,131 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from src.hedging import HedgeBudget, Hedger, LatencyTracker
+from src.metrics import MetricsRegistry
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics():
+    registry = MetricsRegistry()
+    with patch("src.hedging.metrics", registry):
+        yield registry
+
+
+def warm_tracker(seconds=0.01, samples=20):
+    tracker = LatencyTracker()
+    for _ in range(samples):
+        tracker.record("process_input", seconds)
+    return tracker
+
+
+def test_latency_tracker_percentile():
+    """Testa o cálculo do percentil sobre a janela deslizante"""
+    tracker = LatencyTracker(window=10)
+    for value in range(1, 21):
+        tracker.record("node", float(value))
+    assert tracker.count("node") == 10
+    assert tracker.percentile("node", 0.5) == 16.0
+    assert tracker.percentile("node", 1.0) == 20.0
+    assert tracker.percentile("outro", 0.5) is None
+
+
+def test_hedge_budget_limits_extra_requests():
+    """Testa que o orçamento libera uma duplicata a cada 1/ratio chamadas"""
+    budget = HedgeBudget(ratio=0.5, burst=1.0)
+    budget.deposit()
+    assert not budget.try_spend()
+    budget.deposit()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+
+def test_no_hedge_without_samples(isolated_metrics):
+    """Testa que não há duplicata enquanto não há amostras suficientes"""
+    hedger = Hedger(budget=HedgeBudget(ratio=1.0))
+    assert hedger.call(lambda: threading.current_thread(), "process_input") is threading.current_thread()
+    assert isolated_metrics.get("llm_hedges_total", node="process_input") == 0
+    assert isolated_metrics.get("llm_hedge_requests_total", node="process_input") == 1
+    assert hedger.tracker.count("process_input") == 1
+
+
+def test_latency_excludes_executor_queue():
+    """Testa que a latência registrada não inclui a espera por uma thread do executor"""
+    hedger = Hedger(percentile=0.5, budget=HedgeBudget(ratio=0.0), tracker=warm_tracker(seconds=10), max_workers=1)
+    release = threading.Event()
+    blocker = hedger._executor.submit(release.wait)
+    threading.Timer(0.3, release.set).start()
+    assert hedger.call(lambda: "ok", "process_input") == "ok"
+    blocker.result()
+    assert hedger.tracker.percentile("process_input", 0.0) < 0.1
+
+
+def test_no_hedge_while_executor_is_saturated(isolated_metrics):
+    """Testa que a espera na fila do executor saturado não conta para o prazo da duplicata"""
+    hedger = Hedger(percentile=0.5, budget=HedgeBudget(ratio=1.0), tracker=warm_tracker(seconds=0.05), max_workers=1)
+    release = threading.Event()
+    blocker = hedger._executor.submit(release.wait)
+    threading.Timer(0.3, release.set).start()
+    assert hedger.call(lambda: "ok", "process_input") == "ok"
+    blocker.result()
+    assert isolated_metrics.get("llm_hedges_total", node="process_input") == 0
+    assert isolated_metrics.get("llm_hedge_budget_exhausted_total", node="process_input") == 0
+
+
+def test_hedge_wins_when_primary_is_slow(isolated_metrics):
+    """Testa que a duplicata é disparada e vence quando a original demora"""
+    hedger = Hedger(percentile=0.5, budget=HedgeBudget(ratio=1.0), tracker=warm_tracker())
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(2)
+            return "lenta"
+        return "rápida"
+
+    start = time.monotonic()
+    assert hedger.call(fn, "process_input") == "rápida"
+    assert time.monotonic() - start < 1
+    release.set()
+    assert isolated_metrics.get("llm_hedges_total", node="process_input") == 1
+    assert isolated_metrics.get("llm_hedge_wins_total", node="process_input") == 1
+    time.sleep(0.05)
+    assert isolated_metrics.get_histogram("llm_hedge_saved_seconds", node="process_input")["count"] == 1
+
+
+def test_hedge_respects_budget(isolated_metrics):
+    """Testa que sem orçamento a chamada original é aguardada sem duplicata"""
+    hedger = Hedger(percentile=0.5, budget=HedgeBudget(ratio=0.0), tracker=warm_tracker(0.001))
+    assert hedger.call(lambda: time.sleep(0.05) or "ok", "process_input") == "ok"
+    assert isolated_metrics.get("llm_hedges_total", node="process_input") == 0
+    assert isolated_metrics.get("llm_hedge_budget_exhausted_total", node="process_input") == 1
+
+
+def test_hedge_falls_back_when_one_attempt_fails():
+    """Testa que o erro de uma tentativa não descarta o resultado da outra"""
+    hedger = Hedger(percentile=0.5, budget=HedgeBudget(ratio=1.0), tracker=warm_tracker(0.001))
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.05)
+            return "ok"
+        raise RuntimeError("falha")
+
+    assert hedger.call(fn, "process_input") == "ok"
+
+
+def test_hedge_raises_when_all_attempts_fail():
+    """Testa que o erro é propagado quando todas as tentativas falham"""
+    hedger = Hedger(percentile=0.5, budget=HedgeBudget(ratio=1.0), tracker=warm_tracker(0.001))
+
+    def fn():
+        time.sleep(0.02)
+        raise RuntimeError("falha")
+
+    with pytest.raises(RuntimeError):
+        hedger.call(fn, "process_input")
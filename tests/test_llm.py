@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import MagicMock
+from langchain.schema.messages import HumanMessage
+from src.llm import GenerationOptions, PrefixCacheAdapter, SlotPinningPrefixCacheAdapter, invoke_with_prefix
+from src.prompts import build_prefixes
+
+
+@pytest.fixture
+def prefix():
+    return build_prefixes()["process_input"]
+
+
+def test_invoke_without_adapter_prepends_prefix(prefix):
+    """Testa que clientes comuns recebem o prefixo seguido das mensagens dinâmicas"""
+    llm = MagicMock()
+    message = HumanMessage(content="Qual é a capital do Brasil?")
+
+    invoke_with_prefix(llm, prefix, [message])
+
+    sent = llm.invoke.call_args.args[0]
+    assert sent[0] is prefix.messages[0]
+    assert sent[-1] is message
+
+
+def test_adapter_receives_prefix_separately(prefix):
+    """Testa que adaptadores com cache de prefixo recebem o prefixo separado"""
+    class RecordingAdapter(PrefixCacheAdapter):
+        def invoke_with_prefix(self, prefix, messages, **kwargs):
+            return (prefix, list(messages))
+
+    adapter = RecordingAdapter(MagicMock())
+    message = HumanMessage(content="oi")
+
+    assert invoke_with_prefix(adapter, prefix, [message]) == (prefix, [message])
+
+
+def test_slot_pinning_is_deterministic(prefix):
+    """Testa que o mesmo prefixo é sempre enviado ao mesmo slot com cache habilitado"""
+    llm = MagicMock()
+    adapter = SlotPinningPrefixCacheAdapter(llm, n_slots=4)
+
+    adapter.invoke_with_prefix(prefix, [HumanMessage(content="a")])
+    adapter.invoke_with_prefix(prefix, [HumanMessage(content="b")])
+
+    first, second = llm.invoke.call_args_list
+    assert first.kwargs["extra_body"] == second.kwargs["extra_body"]
+    assert first.kwargs["extra_body"]["cache_prompt"] is True
+    assert 0 <= first.kwargs["extra_body"]["id_slot"] < 4
+
+
+def test_adapter_delegates_attributes():
+    """Testa que o adaptador expõe os atributos do cliente original"""
+    llm = MagicMock()
+    llm.temperature = 0.3
+    adapter = SlotPinningPrefixCacheAdapter(llm)
+    assert adapter.temperature == 0.3
+
+
+def test_generation_options_kwargs():
+    """Testa a conversão das opções de geração em argumentos da chamada"""
+    assert GenerationOptions().to_kwargs() == {}
+    assert GenerationOptions(temperature=0.2, model="m").to_kwargs() == {"temperature": 0.2, "model": "m"}
+    with pytest.raises(ValueError):
+        GenerationOptions(temperature=3.0)
+    with pytest.raises(ValueError):
+        GenerationOptions(max_tokens=0)
+
+
+def test_invoke_with_prefix_forwards_options(prefix):
+    """Testa que as opções são repassadas à chamada, inclusive pelo adaptador"""
+    llm = MagicMock()
+    invoke_with_prefix(llm, prefix, [HumanMessage(content="oi")], temperature=0.1)
+    assert llm.invoke.call_args[1] == {"temperature": 0.1}
+
+    adapter = SlotPinningPrefixCacheAdapter(MagicMock(), n_slots=2)
+    invoke_with_prefix(adapter, prefix, [HumanMessage(content="oi")], max_tokens=8)
+    assert adapter.llm.invoke.call_args[1]["max_tokens"] == 8
+
+
+def test_groq_backend_requires_api_key():
+    """Testa que as configurações recusam o backend Groq sem chave de API"""
+    from pydantic import ValidationError
+    from src.config import Settings
+    
+    with pytest.raises(ValidationError, match="GROQ_API_KEY"):
+        Settings(_env_file=None, LLM_BACKEND="groq", GROQ_API_KEY=" ")
+    assert Settings(_env_file=None, LLM_BACKEND="fake", GROQ_API_KEY="").LLM_BACKEND == "fake"
+    assert Settings(_env_file=None, LLM_BACKEND="groq", GROQ_API_KEY="chave").GROQ_API_KEY == "chave"
@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+from langchain.schema.messages import AIMessage, HumanMessage, SystemMessage
+from src.prompts import count_tokens
+from src.memory import ConversationMemory, truncate_to_tokens
+
+
+def make_memory(summarizer=None, **kwargs):
+    summarizer = summarizer or MagicMock(return_value="resumo")
+    return ConversationMemory(summarizer=summarizer, **kwargs)
+
+
+def test_keeps_last_turns_verbatim():
+    """Testa que os últimos N turnos são mantidos literalmente"""
+    memory = make_memory(max_turns=2)
+    memory.add_turn("oi", "olá")
+    memory.add_turn("tudo bem?", "sim")
+    memory.add_turn("qual a capital?", "Brasília")
+    memory.wait()
+
+    messages = memory.get_messages()
+    assert len(memory) == 2
+    assert isinstance(messages[0], SystemMessage)
+    assert "resumo" in messages[0].content
+    assert [m.content for m in messages[1:]] == ["tudo bem?", "sim", "qual a capital?", "Brasília"]
+    assert isinstance(messages[1], HumanMessage)
+    assert isinstance(messages[2], AIMessage)
+
+
+def test_summary_is_incremental():
+    """Testa que o resumo anterior é passado ao resumidor junto com os turnos antigos"""
+    summarizer = MagicMock(side_effect=["resumo 1", "resumo 2"])
+    memory = make_memory(summarizer=summarizer, max_turns=1)
+    memory.add_turn("a", "1")
+    memory.add_turn("b", "2")
+    memory.wait()
+    memory.add_turn("c", "3")
+    memory.wait()
+
+    assert summarizer.call_args_list[0].args == ("", [("a", "1")])
+    assert summarizer.call_args_list[1].args == ("resumo 1", [("b", "2")])
+    assert memory.summary == "resumo 2"
+
+
+def test_token_budget_is_enforced():
+    """Testa que o histórico retornado respeita o orçamento de tokens"""
+    memory = make_memory(max_turns=10, max_tokens=50)
+    for i in range(10):
+        memory.add_turn("x" * 40, f"resposta {i}")
+
+    messages = memory.get_messages()
+    total = sum(count_tokens(m.content) for m in messages)
+    assert total <= 50
+    # Os turnos mantidos são os mais recentes
+    assert messages[-1].content == "resposta 9"
+
+
+def test_summarizer_failure_keeps_previous_summary():
+    """Testa que uma falha no resumo não propaga erro"""
+    summarizer = MagicMock(side_effect=Exception("LLM Error"))
+    memory = make_memory(summarizer=summarizer, max_turns=1)
+    memory.add_turn("a", "1")
+    memory.add_turn("b", "2")
+    memory.wait()
+
+    assert memory.summary == ""
+    assert len(memory.get_messages()) == 2
+
+
+def test_summary_is_truncated():
+    """Testa que o resumo é limitado pelo orçamento próprio"""
+    memory = make_memory(summarizer=MagicMock(return_value="x" * 1000), max_turns=1, summary_max_tokens=10)
+    memory.add_turn("a", "1")
+    memory.add_turn("b", "2")
+    memory.wait()
+
+    assert count_tokens(memory.summary) <= 10
+    assert truncate_to_tokens("abc", 10) == "abc"
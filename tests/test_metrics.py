@@ -0,0 +1,32 @@
+from src.metrics import MetricsRegistry
+
+
+def test_counters_gauges_and_histograms():
+    """Testa os tipos de métricas do registro"""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("requests_total", node="a")
+    registry.inc("requests_total", 2, node="a")
+    registry.set("in_flight", 3)
+    registry.add("in_flight", -1)
+    registry.observe("latency_seconds", 0.05, node="a")
+    registry.observe("latency_seconds", 0.5, node="a")
+
+    assert registry.get("requests_total", node="a") == 3
+    assert registry.get("requests_total", node="b") == 0
+    assert registry.get("in_flight") == 2
+    assert registry.get_histogram("latency_seconds", node="a") == {"count": 2, "sum": 0.55}
+
+
+def test_render_prometheus():
+    """Testa a exportação no formato do Prometheus"""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("requests_total", node="a")
+    registry.observe("latency_seconds", 0.5)
+
+    text = registry.render_prometheus()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{node="a"} 1.0' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert "latency_seconds_count 1" in text
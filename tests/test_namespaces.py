@@ -0,0 +1,93 @@
+import re
+
+import chromadb
+import pytest
+from langchain_chroma import Chroma
+from unittest.mock import MagicMock, patch
+
+from src.exact_index import ExactVectorStore
+from src.metrics import MetricsRegistry
+from src.namespaces import ShardRouter, scored_search, shard_name
+
+
+class KeywordEmbeddings:
+    """Embeddings determinísticos: uma dimensão por palavra-chave"""
+
+    KEYWORDS = ["terra", "sol", "água", "lua"]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float(word in text) + 0.01 for word in self.KEYWORDS]
+
+
+def test_shard_name_is_stable_and_valid():
+    """Testa nomes de coleção válidos e distintos para namespaces parecidos"""
+    name = shard_name("langchain", "Usuário 42/ACME")
+    assert name == shard_name("langchain", "Usuário 42/ACME")
+    assert name != shard_name("langchain", "usuário 42 acme")
+    assert re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9._-]{1,510}[a-zA-Z0-9]", name)
+
+
+def test_router_keeps_lru_of_open_shards():
+    """Testa que os shards menos usados são fechados além do limite"""
+    opened, closed = [], []
+
+    def open_shard(namespace, tier):
+        opened.append(namespace)
+        return MagicMock(name=namespace)
+
+    with patch("src.namespaces.metrics", MetricsRegistry()) as metrics:
+        router = ShardRouter(MagicMock(), open_shard, MagicMock(), max_open=2, close_shard=closed.append)
+        a = router.shard("a")
+        router.shard("b")
+        assert router.shard("a") is a
+        router.shard("c")
+
+        assert opened == ["a", "b", "c"]
+        assert [store._mock_name for store in closed] == ["b"]
+        assert len(router) == 2
+        assert router.shard(None) is router.global_store
+        assert metrics.get("namespace_shards_evicted_total") == 1
+
+
+def test_router_merges_namespace_and_global_results(tmp_path):
+    """Testa que a busca combina a coleção do namespace e a global por relevância"""
+    embeddings = KeywordEmbeddings()
+    global_store = ExactVectorStore(embeddings, str(tmp_path / "global"))
+    global_store.add_texts(["A Terra orbita o Sol", "A água ferve a 100°C"], ids=["g1", "g2"])
+    shards = {}
+
+    def open_shard(namespace, tier):
+        shards[namespace] = ExactVectorStore(embeddings, str(tmp_path / namespace))
+        return shards[namespace]
+
+    router = ShardRouter(global_store, open_shard, embeddings.embed_query)
+    router.shard("ana").add_texts(["A Lua orbita a Terra"], ids=["a1"])
+    router.shard("bia").add_texts(["A Lua tem fases"], ids=["b1"])
+
+    docs = router.search("Lua e Terra", "ana", k=2)
+    assert [doc.id for doc in docs] == ["a1", "g1"]
+    # Sem namespace, apenas a coleção global é consultada
+    assert {doc.id for doc in router.search("Lua", None, k=3)} == {"g1", "g2"}
+    assert "b1" not in {doc.id for doc in router.search("Lua", "ana", k=5)}
+
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_scored_search_uses_cosine_on_every_backend(tmp_path, space):
+    """Testa que a relevância do Chroma (qualquer métrica) e a do índice exato estão na mesma escala"""
+    embeddings = KeywordEmbeddings()
+    texts, ids = ["A Terra orbita o Sol", "A água ferve a 100°C", "A Lua orbita a Terra"], ["terra", "agua", "lua"]
+    exact = ExactVectorStore(embeddings, str(tmp_path / "exato"))
+    exact.add_texts(texts, ids=ids)
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    chroma = Chroma(client=client, collection_name="fatos", embedding_function=embeddings,
+                    collection_metadata={"hnsw:space": space})
+    chroma.add_texts(texts, ids=ids)
+
+    query = embeddings.embed_query("Terra e Lua")
+    expected = [(doc.id, round(score, 4)) for doc, score in scored_search(exact, query, 3, None)]
+    assert [(doc.id, round(score, 4)) for doc, score in scored_search(chroma, query, 3, None)] == expected
+    assert expected[0][0] in ("terra", "lua")
@@ -0,0 +1,33 @@
+from src.preferences import CONFLICT, NEGATED, extract_preferences, parse_llm_preferences
+
+
+def test_extracts_closed_vocabulary_values():
+    """Testa a extração local dos valores de cada preferência"""
+    extraction = extract_preferences("Quero respostas formais e concisas")
+    assert extraction.preferences == {"tom": "formal", "verbosidade": "concisa"}
+    assert extraction.confidence == 1.0
+
+    assert extract_preferences("Nem muito curtas nem muito longas").preferences == {"verbosidade": "balanceada"}
+    assert extract_preferences("Pode usar gírias, sem formalidades").preferences == {"formalidade": "informal"}
+
+
+def test_negation_inverts_value_with_lower_confidence():
+    """Testa que a negação leva ao valor oposto com confiança reduzida"""
+    extraction = extract_preferences("Não seja tão formal")
+    assert extraction.preferences == {"tom": "casual"}
+    assert extraction.confidence == NEGATED
+
+
+def test_unknown_or_conflicting_inputs_have_low_confidence():
+    """Testa a confiança baixa sem padrões reconhecidos ou com valores conflitantes"""
+    assert extract_preferences("Gosto de matemática").confidence == 0.0
+    extraction = extract_preferences("Seja breve mas detalhado")
+    assert extraction.preferences == {} and extraction.confidence == CONFLICT
+
+
+def test_parse_llm_preferences():
+    """Testa a leitura do JSON do LLM com bloco de código e valores inválidos"""
+    assert parse_llm_preferences('```json\n{"tom": "Formal", "cor": "azul"}\n```') == {"tom": "formal"}
+    assert parse_llm_preferences('{"verbosidade": "enorme"}') == {}
+    assert parse_llm_preferences("nenhuma preferência") == {}
+    assert parse_llm_preferences("{tom: formal}") is None
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+from typing import List, TypedDict
+
+from langgraph.graph import END, StateGraph
+
+from src import profiling
+from src.profiling import profile_directory, profile_request, profiled
+
+
+class State(TypedDict):
+    request_id: str
+    values: List[int]
+
+
+class Nodes:
+    @profiled
+    def compute(self, state: State) -> State:
+        time.sleep(0.05)
+        state["values"] = [1]
+        return state
+
+    @profiled
+    def allocate(self, state: State) -> State:
+        state["values"] = state["values"] + [0] * 200_000
+        return state
+
+
+def build_graph(nodes: Nodes):
+    graph = StateGraph(state_schema=State)
+    graph.add_node("compute", nodes.compute)
+    graph.add_node("allocate", nodes.allocate)
+    graph.add_edge("compute", "allocate")
+    graph.add_edge("allocate", END)
+    graph.set_entry_point("compute")
+    return graph.compile()
+
+
+def test_profile_written_per_node(tmp_path):
+    """Testa os relatórios de CPU e memória de cada nó de um grafo LangGraph"""
+    workflow = build_graph(Nodes())
+    with profile_request("req-1", True, str(tmp_path), interval=0.001) as profiler:
+        workflow.invoke({"request_id": "req-1", "values": []})
+
+    directory = tmp_path / os.path.basename(profile_directory(str(tmp_path), "req-1"))
+    summary = json.loads((directory / "summary.json").read_text())
+    assert summary["request_id"] == "req-1"
+    assert set(summary["scopes"]) == {"request", "compute", "allocate"}
+    assert summary["scopes"]["allocate"]["peak_bytes"] > 1_000_000
+    assert summary["scopes"]["request"]["peak_bytes"] >= summary["scopes"]["allocate"]["peak_bytes"]
+
+    stacks = (directory / "cpu.folded").read_text().splitlines()
+    assert any(line.startswith("request;compute;") and "compute (tests/test_profiling.py" in line for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    assert "== allocate:" in (directory / "allocations.txt").read_text()
+    assert profiler.scope_samples["compute"] > 0
+    assert not profiling._active and not profiling.tracemalloc.is_tracing()
+
+
+def test_disabled_profiling_is_a_passthrough(tmp_path):
+    """Testa que sem perfil ativo os nós executam diretamente e nada é gravado"""
+    with profile_request("req-2", False, str(tmp_path)) as profiler:
+        state = Nodes().compute({"request_id": "req-2", "values": []})
+    assert profiler is None and state["values"]
+    assert not list(tmp_path.iterdir())
+
+
+def test_profile_directory_stays_inside_base(tmp_path):
+    """Testa que um request_id com separadores de caminho não escapa do diretório de perfis"""
+    for request_id in ("../../fora", "/tmp/absoluto", "req-1"):
+        path = profile_directory(str(tmp_path), request_id)
+        assert os.path.dirname(path) == str(tmp_path)
+    assert profile_directory(str(tmp_path), "a") != profile_directory(str(tmp_path), "b")
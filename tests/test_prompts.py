@@ -0,0 +1,80 @@
+import pytest
+from dataclasses import FrozenInstanceError
+from unittest.mock import patch
+from langchain.schema.messages import HumanMessage, SystemMessage
+from src.prompts import (
+    MESSAGE_OVERHEAD_TOKENS,
+    PROCESS_INPUT_PROMPT,
+    build_prefixes,
+    compact,
+    count_message_tokens,
+    count_tokens,
+    format_context,
+    pack_context,
+)
+
+
+def test_compact_removes_indentation_and_blank_lines():
+    """Testa a remoção de espaços redundantes dos prompts"""
+    text = """
+        Linha um
+
+            Linha   dois
+    """
+    assert compact(text) == "Linha um\nLinha dois"
+    assert not PROCESS_INPUT_PROMPT.startswith(" ")
+    assert "\n\n" not in PROCESS_INPUT_PROMPT
+
+
+def test_count_tokens_grows_with_text():
+    """Testa a contagem de tokens"""
+    assert count_tokens("") == 0
+    assert count_tokens("A Terra é redonda") > 0
+    assert count_tokens("A Terra é redonda e gira em torno do Sol") > count_tokens("A Terra é redonda")
+
+
+def test_count_message_tokens_includes_overhead():
+    """Testa a contagem de tokens de mensagens de chat"""
+    messages = [SystemMessage(content="sistema"), HumanMessage(content="olá")]
+    expected = count_tokens("sistema") + count_tokens("olá") + 2 * MESSAGE_OVERHEAD_TOKENS
+    assert count_message_tokens(messages) == expected
+
+
+def test_pack_context_respects_budget_and_order():
+    """Testa o empacotamento de documentos por relevância dentro do orçamento"""
+    docs = [
+        {"content": "primeiro", "metadata": {}},
+        {"content": "segundo documento muito longo", "metadata": {}},
+        {"content": "terceiro", "metadata": {}},
+    ]
+    with patch("src.prompts.count_tokens", side_effect=lambda text: len(text.split())):
+        packed = pack_context(docs, budget=6)
+
+    # O segundo documento não cabe, mas o terceiro (menos relevante) ainda cabe
+    assert [doc["content"] for doc in packed] == ["primeiro", "terceiro"]
+    assert pack_context(docs, budget=0) == []
+
+
+def test_format_context():
+    """Testa a formatação do contexto"""
+    docs = [{"content": "  A Terra   é redonda ", "metadata": {}}]
+    assert format_context(docs) == "- A Terra é redonda"
+
+
+def test_static_prefixes_are_immutable():
+    """Testa que os prefixos estáticos são imutáveis e estáveis"""
+    first, second = build_prefixes(), build_prefixes()
+    assert first["generate_response"].key == second["generate_response"].key
+    assert "{" not in first["generate_response"].messages[0].content
+    with pytest.raises(TypeError):
+        first["process_input"] = None
+    with pytest.raises(FrozenInstanceError):
+        first["process_input"].key = "outro"
+
+
+def test_numbered_verdicts():
+    """Testa a formatação numerada e a leitura dos vereditos em lote"""
+    from src.prompts import format_numbered, parse_numbered_verdicts
+    assert format_numbered(["A Terra é redonda", "Azul é bonito"]) == "1. A Terra é redonda\n2. Azul é bonito"
+    assert parse_numbered_verdicts("1: true\n2: FALSE\n3: true", 2) == [True, False]
+    assert parse_numbered_verdicts("2: true", 3) == [False, True, False]
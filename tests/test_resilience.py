@@ -0,0 +1,191 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from src.metrics import MetricsRegistry
+from src.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    LLMGuard,
+    LLMSaturatedError,
+    RateLimiter,
+    TokenBucket,
+    is_retryable,
+)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics():
+    registry = MetricsRegistry()
+    with patch("src.resilience.metrics", registry):
+        yield registry
+
+
+def make_guard(**kwargs):
+    kwargs.setdefault("sleep", MagicMock())
+    return LLMGuard(**kwargs)
+
+
+def test_is_retryable():
+    """Testa a classificação de erros transitórios do provedor"""
+    assert is_retryable(ProviderError(429))
+    assert is_retryable(ProviderError(503))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ProviderError(401))
+    assert not is_retryable(ValueError("erro de parsing"))
+
+
+def test_token_bucket_rate():
+    """Testa o consumo e o reabastecimento do balde de tokens"""
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 1.0
+    with pytest.raises(LLMSaturatedError):
+        bucket.acquire(1, timeout=0.01)
+
+
+def test_rate_limiter_disabled_by_default():
+    """Testa que limites zerados não bloqueiam"""
+    limiter = RateLimiter()
+    assert limiter.acquire(tokens=10_000, timeout=0) == 0.0
+
+
+def test_retries_transient_errors_with_backoff(isolated_metrics):
+    """Testa retentativas com espera exponencial para erros transitórios"""
+    guard = make_guard(max_retries=3)
+    fn = MagicMock(side_effect=[ProviderError(429), ProviderError(503), "ok"])
+
+    assert guard.call(fn, node="process_input") == "ok"
+    assert fn.call_count == 3
+    assert guard._sleep.call_count == 2
+    assert isolated_metrics.get("llm_retries_total", node="process_input") == 2
+    assert isolated_metrics.get("llm_requests_total", node="process_input", outcome="success") == 1
+
+
+def test_deadline_limits_retries(isolated_metrics):
+    """Testa que não há nova tentativa quando a espera ultrapassaria o prazo"""
+    guard = make_guard(max_retries=3, base_delay=10.0, max_delay=10.0)
+    guard.backoff = lambda attempt: 10.0
+    fn = MagicMock(side_effect=ProviderError(503))
+
+    with pytest.raises(ProviderError):
+        guard.call(fn, node="generate_response", deadline=time.monotonic() + 5.0)
+    assert fn.call_count == 1
+    guard._sleep.assert_not_called()
+    assert isolated_metrics.get("llm_requests_total", node="generate_response", outcome="deadline") == 1
+
+    with pytest.raises(DeadlineExceededError):
+        guard.call(fn, deadline=time.monotonic() - 1.0)
+    assert fn.call_count == 1
+
+
+def test_non_retryable_errors_fail_fast():
+    """Testa que erros não transitórios não são repetidos nem abrem o disjuntor"""
+    guard = make_guard(breaker=CircuitBreaker(failure_threshold=1))
+    fn = MagicMock(side_effect=ValueError("erro"))
+
+    with pytest.raises(ValueError):
+        guard.call(fn)
+    assert fn.call_count == 1
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_backoff_has_jitter_and_cap():
+    """Testa os limites da espera com jitter"""
+    guard = make_guard(base_delay=0.5, max_delay=2.0)
+    delays = [guard.backoff(10) for _ in range(50)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_circuit_breaker_opens_and_fails_fast(isolated_metrics):
+    """Testa que o disjuntor abre após falhas e rejeita chamadas sem chamar o provedor"""
+    guard = make_guard(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    fn = MagicMock(side_effect=ProviderError(503))
+
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            guard.call(fn)
+    with pytest.raises(CircuitOpenError):
+        guard.call(fn, node="validate_fact")
+
+    assert fn.call_count == 2
+    assert isolated_metrics.get("llm_circuit_rejections_total", node="validate_fact") == 1
+    assert isolated_metrics.get("llm_circuit_open") == 1
+
+
+def test_circuit_breaker_half_open_recovery():
+    """Testa a recuperação do disjuntor após o intervalo"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.before_call()
+    # Apenas uma chamada de teste por vez no estado meio aberto
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_concurrency_cap():
+    """Testa o limite global de chamadas simultâneas"""
+    guard = make_guard(max_concurrency=2, queue_timeout=0.05)
+    release = threading.Event()
+    active = []
+    peak = []
+
+    def slow_call():
+        active.append(1)
+        peak.append(len(active))
+        release.wait(1)
+        active.pop()
+        return "ok"
+
+    threads = [threading.Thread(target=guard.call, args=(slow_call,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+
+    with pytest.raises(LLMSaturatedError):
+        guard.call(lambda: "ok")
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+    assert guard.call(lambda: "ok") == "ok"
+
+
+def test_rate_limit_refunded_when_no_slot():
+    """Testa que os tokens de taxa voltam ao balde quando não há vaga para a chamada"""
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1000)
+    guard = make_guard(rate_limiter=limiter, max_concurrency=1, queue_timeout=0.02)
+    assert guard.scheduler.acquire("interactive")
+    with pytest.raises(LLMSaturatedError):
+        guard.call(lambda: "ok", tokens=600)
+    guard.scheduler.release("interactive")
+
+    # Sem a devolução, o balde de tokens não teria saldo para outra chamada de 600
+    assert guard.call(lambda: "ok", tokens=600) == "ok"
+    assert limiter.requests.try_acquire() == 0.0
+
+
+def test_request_token_refunded_when_token_budget_exhausted():
+    """Testa que a requisição volta ao balde quando o limite de tokens a rejeita"""
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=100)
+    assert limiter.tokens.try_acquire(50) == 0.0
+    with pytest.raises(LLMSaturatedError):
+        limiter.acquire(tokens=100, timeout=0)
+    assert limiter.requests.try_acquire() == 0.0
@@ -0,0 +1,121 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from src.metrics import MetricsRegistry
+from src.scheduler import (
+    INGESTION,
+    INTERACTIVE,
+    SUMMARIZATION,
+    VALIDATION,
+    ScheduledEmbeddings,
+    WorkScheduler,
+    current_lane,
+    lane,
+    parse_lane_values,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics():
+    registry = MetricsRegistry()
+    with patch("src.scheduler.metrics", registry):
+        yield registry
+
+
+def wait_queued(scheduler, count):
+    deadline = time.monotonic() + 2
+    while len(scheduler._waiting) < count:
+        assert time.monotonic() < deadline, "chamada não entrou na fila"
+        time.sleep(0.001)
+
+
+def dispatch_order(scheduler, lanes):
+    """Enfileira as chamadas (na ordem dada) com o recurso ocupado e retorna a ordem de atendimento"""
+    order = []
+    assert scheduler.acquire(INGESTION)
+
+    def worker(name):
+        scheduler.acquire(name)
+        order.append(name)
+        scheduler.release(name)
+
+    threads = []
+    for i, name in enumerate(lanes):
+        thread = threading.Thread(target=worker, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_queued(scheduler, i + 1)
+    scheduler.release(INGESTION)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_parse_lane_values():
+    """Testa a leitura dos pesos e limites das configurações"""
+    assert parse_lane_values("interactive=8, validation=1,") == {"interactive": 8.0, "validation": 1.0}
+    with pytest.raises(ValueError):
+        parse_lane_values("batch=1")
+
+
+def test_lane_context():
+    """Testa a pista do contexto (interativa por padrão)"""
+    assert current_lane() == INTERACTIVE
+    with lane(VALIDATION):
+        assert current_lane() == VALIDATION
+    assert current_lane() == INTERACTIVE
+
+
+def test_interactive_jumps_ahead_of_background():
+    """Testa que a pista interativa é atendida antes do trabalho de fundo enfileirado antes"""
+    scheduler = WorkScheduler("llm", 1)
+    order = dispatch_order(scheduler, [VALIDATION, SUMMARIZATION, INTERACTIVE])
+    assert order[0] == INTERACTIVE
+
+
+def test_weighted_fair_queuing():
+    """Testa a divisão da capacidade entre pistas de fundo conforme os pesos"""
+    scheduler = WorkScheduler("llm", 1, weights={INGESTION: 3, VALIDATION: 1})
+    order = dispatch_order(scheduler, [VALIDATION] * 4 + [INGESTION] * 12)
+    assert order[:8].count(INGESTION) == 6
+    assert order[:8].count(VALIDATION) == 2
+
+
+def test_lane_limit():
+    """Testa o limite de chamadas simultâneas de uma pista"""
+    scheduler = WorkScheduler("embedding", 4, limits={INGESTION: 1})
+    assert scheduler.acquire(INGESTION)
+    assert not scheduler.acquire(INGESTION, timeout=0.02)
+    # Outras pistas usam as vagas restantes
+    assert scheduler.acquire(VALIDATION, timeout=0.02)
+    scheduler.release(INGESTION)
+    assert scheduler.acquire(INGESTION, timeout=0.02)
+
+
+def test_reserved_slots(isolated_metrics):
+    """Testa as vagas reservadas para a pista interativa"""
+    scheduler = WorkScheduler("llm", 2, reserved=1)
+    assert scheduler.acquire(VALIDATION)
+    assert not scheduler.acquire(SUMMARIZATION, timeout=0.02)
+    assert scheduler.acquire(INTERACTIVE, timeout=0.02)
+    assert isolated_metrics.get("scheduler_timeouts_total", resource="llm", lane=SUMMARIZATION) == 1
+    assert isolated_metrics.get("scheduler_in_flight", resource="llm", lane=INTERACTIVE) == 1
+    assert isolated_metrics.get_histogram("scheduler_queue_seconds", resource="llm", lane=INTERACTIVE)["count"] == 1
+
+
+def test_scheduled_embeddings():
+    """Testa que as chamadas de embeddings ocupam uma vaga na pista do contexto"""
+    scheduler = WorkScheduler("embedding", 1)
+    model = MagicMock()
+    seen = []
+    model.embed_documents.side_effect = lambda texts: seen.append(scheduler.lanes[INGESTION].in_flight) or [[0.0]] * len(texts)
+    embeddings = ScheduledEmbeddings(model, scheduler, timeout=0.02)
+
+    with lane(INGESTION):
+        assert embeddings.embed_documents(["a", "b"]) == [[0.0], [0.0]]
+    assert seen == [1]
+
+    assert scheduler.acquire(INTERACTIVE)
+    with pytest.raises(TimeoutError):
+        embeddings.embed_query("a")
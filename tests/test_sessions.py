@@ -0,0 +1,141 @@
+import json
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from src.memory import ConversationMemory
+from src.metrics import MetricsRegistry
+from src.sessions import SessionManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics():
+    registry = MetricsRegistry()
+    with patch("src.sessions.metrics", registry):
+        yield registry
+
+
+def make_memory():
+    return ConversationMemory(summarizer=MagicMock(return_value="resumo"), max_turns=2)
+
+
+def make_manager(tmp_path, **kwargs):
+    kwargs.setdefault("clock", FakeClock())
+    return SessionManager(make_memory, offload_directory=str(tmp_path), **kwargs)
+
+
+def test_idle_session_is_offloaded_and_restored(tmp_path, isolated_metrics):
+    """Testa que a sessão ociosa vai para o disco e volta de forma transparente"""
+    clock = FakeClock()
+    manager = make_manager(tmp_path, idle_ttl=60, sweep_interval=10, clock=clock)
+    manager.get("s1").add_turn("Olá", "Oi!")
+    manager.touch("s1")
+
+    clock.now = 120
+    manager.get("s2")
+    assert "s1" not in manager
+    assert len(os.listdir(tmp_path)) == 1
+    assert isolated_metrics.get("sessions_evicted_total", reason="idle") == 1
+
+    memory = manager.get("s1")
+    assert [m.content for m in memory.get_messages()] == ["Olá", "Oi!"]
+    assert os.listdir(tmp_path) == []
+    assert isolated_metrics.get("sessions_restored_total") == 1
+
+
+def test_memory_cap_evicts_least_recent(tmp_path, isolated_metrics):
+    """Testa que o limite global de memória descarrega as sessões menos recentes"""
+    manager = make_manager(tmp_path, max_bytes=100)
+    for session_id in ("a", "b", "c"):
+        manager.get(session_id).add_turn("x" * 40, "y")
+        manager.touch(session_id)
+    assert "a" not in manager and "c" in manager
+    assert manager.bytes_held <= 100
+    assert isolated_metrics.get("sessions_evicted_total", reason="memory") >= 1
+    assert isolated_metrics.get("session_memory_bytes") == manager.bytes_held
+
+
+def test_session_count_cap(tmp_path):
+    """Testa o limite de número de sessões"""
+    manager = make_manager(tmp_path, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        manager.get(session_id)
+    assert len(manager) == 2
+    assert "a" not in manager
+
+
+def test_eviction_without_directory_drops_session():
+    """Testa que, sem diretório, a sessão removida é descartada"""
+    manager = SessionManager(make_memory, max_sessions=1, clock=FakeClock())
+    manager.get("a").add_turn("Olá", "Oi!")
+    manager.get("b")
+    assert len(manager.get("a")) == 0
+
+
+def test_snapshot_includes_turns_being_summarized():
+    """Testa que turnos em resumo não se perdem ao salvar o estado"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        memory = ConversationMemory(summarizer=lambda s, t: "resumo", max_turns=1, executor=executor)
+        memory.add_turn("1", "a")
+        memory.add_turn("2", "b")
+        data = memory.to_dict()
+        memory.wait()
+    assert data["recent"] == [["2", "b"]]
+    assert ["1", "a"] in data["pending"] or data["summary"] == "resumo"
+
+    restored = make_memory()
+    restored.load_dict({"summary": "resumo", "recent": [["2", "b"]], "pending": []})
+    assert restored.summary == "resumo"
+    assert len(restored) == 1
+
+
+def test_offload_writes_outside_the_lock(tmp_path):
+    """Testa que a gravação em disco não bloqueia as outras sessões e que a sessão pode ser retomada durante ela"""
+    manager = make_manager(tmp_path, max_sessions=1)
+    manager.get("s1").add_turn("Olá", "Oi!")
+    manager.touch("s1")
+    seen = {}
+    original_dump = json.dump
+
+    def slow_dump(data, f, **kwargs):
+        # Outra thread acessa as sessões enquanto "s1" é gravada
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            seen["other"] = executor.submit(manager.get, "s3").result(timeout=2)
+            seen["s1"] = executor.submit(manager.get, "s1").result(timeout=2)
+        original_dump(data, f, **kwargs)
+
+    with patch("src.sessions.json.dump", side_effect=slow_dump):
+        manager.get("s2")
+    assert seen["other"] is not None
+    # Retomada da memória, não do disco; a gravação obsoleta é descartada
+    assert [m.content for m in seen["s1"].get_messages()] == ["Olá", "Oi!"]
+    assert "s1" in manager
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+    assert manager._path("s1") not in [os.path.join(str(tmp_path), name) for name in os.listdir(tmp_path)]
+
+
+def test_update_survives_concurrent_eviction(tmp_path):
+    """Testa que nenhum turno se perde quando as sessões são removidas e restauradas concorrentemente"""
+    manager = SessionManager(
+        lambda: ConversationMemory(summarizer=MagicMock(return_value="resumo"), max_turns=1000),
+        max_sessions=2, offload_directory=str(tmp_path)
+    )
+    sessions, turns = [f"s{i}" for i in range(6)], 40
+
+    def write(session_id):
+        for i in range(turns):
+            manager.update(session_id, lambda memory: memory.add_turn(f"{session_id}-{i}", "ok"))
+
+    with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+        list(executor.map(write, sessions))
+    manager.close()
+    for session_id in sessions:
+        assert len(manager.get(session_id)) == turns
@@ -0,0 +1,101 @@
+import chromadb
+import numpy as np
+import pytest
+
+from src.snapshot import (
+    decode_strings, encode_strings, export_all, export_snapshot, fact_collections, import_all, import_snapshot
+)
+from src.vector_index import collection_metadata, index_params
+
+
+@pytest.fixture
+def source(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "origem"))
+    collection = client.create_collection(
+        "fatos", metadata=collection_metadata("cosine", 16, 100, 100), embedding_function=None
+    )
+    rng = np.random.default_rng(0)
+    collection.add(
+        ids=[f"f{i}" for i in range(20)],
+        embeddings=rng.normal(size=(20, 8)).astype(np.float32),
+        documents=[f"Fato número {i} — com acentuação" for i in range(20)],
+        metadatas=[{"type": "fact", "status": "validated"} for _ in range(20)],
+    )
+    return collection
+
+
+def test_string_columns_round_trip():
+    """Testa a codificação colunar dos textos em UTF-8 com offsets"""
+    values = ["", "água", "A Terra orbita o Sol", "😀"]
+    assert decode_strings(*encode_strings(values)) == values
+
+
+def test_full_and_incremental_snapshots(source, tmp_path):
+    """Testa a exportação completa, a incremental e a aplicação numa réplica sem reembedding"""
+    full = str(tmp_path / "snapshots" / "base.npz")
+    stats = export_snapshot(source, full, batch_size=7)
+    assert stats["documents"] == 20 and stats["documents_per_second"] > 0
+
+    source.update(ids=["f1"], metadatas=[{"type": "fact", "status": "pending"}])
+    source.delete(ids=["f2"])
+    source.add(ids=["novo"], embeddings=[[1.0] * 8], documents=["Novo fato"])
+    delta = str(tmp_path / "snapshots" / "delta.npz")
+    stats = export_snapshot(source, delta, base=full, batch_size=7)
+    assert (stats["documents"], stats["deleted"]) == (2, 1)
+
+    replica = chromadb.PersistentClient(path=str(tmp_path / "replica"))
+    state_path = str(tmp_path / "replica" / "snapshots.json")
+    # O incremental não pode ser aplicado antes do snapshot base
+    with pytest.raises(ValueError):
+        import_snapshot(replica, delta, state_path=state_path)
+    import_snapshot(replica, full, state_path=state_path)
+    import_snapshot(replica, delta, state_path=state_path)
+
+    copy = replica.get_collection("fatos")
+    assert copy.count() == source.count() == 20
+    assert index_params(copy)["space"] == "cosine"
+    expected = source.get(include=["documents", "metadatas", "embeddings"])
+    actual = copy.get(ids=expected["ids"], include=["documents", "metadatas", "embeddings"])
+    order = [actual["ids"].index(doc_id) for doc_id in expected["ids"]]
+    assert [actual["documents"][i] for i in order] == expected["documents"]
+    assert [actual["metadatas"][i] for i in order] == expected["metadatas"]
+    assert np.allclose(np.asarray(actual["embeddings"])[order], expected["embeddings"])
+
+
+def test_full_snapshot_replaces_extra_documents(source, tmp_path):
+    """Testa que o snapshot completo remove da réplica documentos ausentes na origem"""
+    path = str(tmp_path / "base.npz")
+    export_snapshot(source, path)
+    replica = chromadb.PersistentClient(path=str(tmp_path / "replica"))
+    replica.create_collection("fatos", embedding_function=None).add(ids=["sobra"], embeddings=[[0.0] * 8])
+
+    import_snapshot(replica, path)
+    ids = replica.get_collection("fatos").get(include=[])["ids"]
+    assert "sobra" not in ids and len(ids) == 20
+
+
+def test_export_all_covers_namespace_and_cold_collections(source, tmp_path):
+    """Testa que --all exporta e importa as coleções dos namespaces e da camada fria"""
+    client = chromadb.PersistentClient(path=str(tmp_path / "origem"))
+    for name in ("fatos-acme-0123456789ab", "fatos-cold", "fatos-rebuild", "outra"):
+        client.create_collection(name, embedding_function=None).add(
+            ids=[f"{name}-1"], embeddings=[[0.5] * 8], documents=[f"Fato de {name}"]
+        )
+    base = str(tmp_path / "snapshots" / "base")
+    assert sorted(export_all(client, base, "fatos")) == ["fatos", "fatos-acme-0123456789ab", "fatos-cold"]
+
+    client.get_collection("fatos-cold").add(ids=["arquivado"], embeddings=[[0.1] * 8], documents=["Fato antigo"])
+    client.create_collection("fatos-novo-ba9876543210", embedding_function=None).add(
+        ids=["n1"], embeddings=[[0.2] * 8], documents=["Fato novo"]
+    )
+    delta = str(tmp_path / "snapshots" / "delta")
+    stats = export_all(client, delta, "fatos", base_directory=base)
+    assert stats["fatos-cold"]["documents"] == 1 and stats["fatos"]["documents"] == 0
+    assert stats["fatos-novo-ba9876543210"]["documents"] == 1
+
+    replica = chromadb.PersistentClient(path=str(tmp_path / "replica"))
+    state_path = str(tmp_path / "replica" / "snapshots.json")
+    import_all(replica, base, state_path=state_path)
+    import_all(replica, delta, state_path=state_path)
+    counts = {name: replica.get_collection(name).count() for name in fact_collections(replica, "fatos")}
+    assert counts == {"fatos": 20, "fatos-acme-0123456789ab": 1, "fatos-cold": 2, "fatos-novo-ba9876543210": 1}
@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import pytest
+from langchain_core.messages import AIMessageChunk
+from src.resilience import LLMGuard
+from src.speculation import CandidateReplayModel, SpeculationRegistry, SpeculativeGeneration
+
+
+def chunks(*tokens):
+    return [AIMessageChunk(content=token) for token in tokens]
+
+
+def test_speculative_generation_forwards_tokens():
+    """Testa que a candidata disponibiliza os tokens e a mensagem completa"""
+    candidate = SpeculativeGeneration()
+    candidate.start(lambda: candidate.consume(chunks("Olá", " mundo")))
+    assert [chunk.content for chunk in candidate.chunks()] == ["Olá", " mundo"]
+    assert candidate.result().content == "Olá mundo"
+
+
+def test_cancelled_candidate_stops_consuming():
+    """Testa que a candidata descartada interrompe o consumo do stream"""
+    started = threading.Event()
+    release = threading.Event()
+    consumed = []
+
+    def stream():
+        for token in ("a", "b", "c"):
+            consumed.append(token)
+            started.set()
+            release.wait(1)
+            yield AIMessageChunk(content=token)
+
+    candidate = SpeculativeGeneration()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        candidate.start(lambda: candidate.consume(stream()), executor)
+        started.wait(1)
+        candidate.cancel()
+        release.set()
+    assert consumed == ["a"]
+    assert candidate.result().content == ""
+
+
+def test_registry_returns_matching_candidate_and_cancels_other():
+    """Testa que o registro entrega a candidata do veredito e cancela a outra"""
+    registry = SpeculationRegistry()
+    valid, invalid = SpeculativeGeneration(), SpeculativeGeneration()
+    registry.put("req", {True: valid, False: invalid})
+    assert registry.take("req", True) is valid
+    assert invalid._cancelled.is_set()
+    assert not valid._cancelled.is_set()
+    assert registry.take("req", True) is None
+    assert len(registry) == 0
+
+
+def test_replay_model_reproduces_candidate():
+    """Testa que o modelo de reprodução transmite os tokens da candidata"""
+    candidate = SpeculativeGeneration()
+    candidate.start(lambda: candidate.consume(chunks("um", " dois")))
+    model = CandidateReplayModel(candidate=candidate)
+    assert [chunk.content for chunk in model.stream("x")] == ["um", " dois"]
+
+    candidate = SpeculativeGeneration()
+    candidate.start(lambda: candidate.consume(chunks("três")))
+    assert CandidateReplayModel(candidate=candidate).invoke("x").content == "três"
+
+
+def test_stream_failure_after_tokens_is_not_retried():
+    """Testa que uma falha no meio do stream não é repetida (os tokens já enviados não se repetem)"""
+    attempts = []
+
+    def stream():
+        attempts.append(1)
+        yield AIMessageChunk(content="Olá")
+        raise TimeoutError("conexão interrompida")
+
+    guard = LLMGuard(max_retries=3, sleep=MagicMock())
+    candidate = SpeculativeGeneration()
+    candidate.start(lambda: guard.call(lambda: candidate.consume(stream()), can_retry=candidate.can_retry))
+    assert [chunk.content for chunk in candidate.chunks()] == ["Olá"]
+    assert len(attempts) == 1
+    with pytest.raises(TimeoutError):
+        candidate.result()
+
+
+def test_stream_failure_before_tokens_is_retried():
+    """Testa que uma falha antes do primeiro token é repetida normalmente"""
+    streams = iter([TimeoutError("sobrecarga"), chunks("Olá", " mundo")])
+
+    def stream():
+        item = next(streams)
+        if isinstance(item, Exception):
+            raise item
+        yield from item
+
+    guard = LLMGuard(max_retries=3, sleep=MagicMock())
+    candidate = SpeculativeGeneration()
+    candidate.start(lambda: guard.call(lambda: candidate.consume(stream()), can_retry=candidate.can_retry))
+    assert [chunk.content for chunk in candidate.chunks()] == ["Olá", " mundo"]
+    assert candidate.result().content == "Olá mundo"
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import chromadb
+import pytest
+from langchain_chroma import Chroma
+
+from src.exact_index import ExactVectorStore
+from src.metrics import MetricsRegistry
+from src.namespaces import COLD, ShardRouter
+from src.tiering import FactTiering, move_documents
+
+DAY = 24 * 3600.0
+
+
+class KeywordEmbeddings:
+    """Embeddings determinísticos: uma dimensão por palavra-chave"""
+
+    KEYWORDS = ["terra", "sol", "água", "lua"]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float(word in text) + 0.01 for word in self.KEYWORDS]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def tiering(tmp_path):
+    embeddings = KeywordEmbeddings()
+    hot = ExactVectorStore(embeddings, str(tmp_path / "quente"))
+    hot.add_texts(
+        ["A Terra orbita o Sol", "A água ferve a 100°C", "A Lua orbita a Terra"],
+        metadatas=[{"type": "fact"}, {"type": "fact"}, {"type": "fact", "status": "pending"}],
+        ids=["terra", "agua", "lua"],
+    )
+    router = ShardRouter(hot, lambda namespace, tier: ExactVectorStore(embeddings, str(tmp_path / tier)),
+                         embeddings.embed_query)
+    clock = FakeClock()
+    with patch("src.tiering.metrics", MetricsRegistry()) as metrics:
+        yield FactTiering(router, ttl=7 * DAY, min_relevance=0.5, sweep_interval=365 * DAY, clock=clock), clock, metrics
+
+
+def test_hits_are_recorded_in_metadata(tiering):
+    """Testa o registro em lote do último acesso e do número de acessos"""
+    tiering, clock, _ = tiering
+    tiering.search("Terra e Sol", None, k=1)
+    tiering.search("Terra e Sol", None, k=1)
+    assert tiering.flush() == 1
+
+    metadata = tiering.router.global_store.get_by_ids(["terra"])[0].metadata
+    assert metadata == {"type": "fact", "hit_count": 2, "last_hit": clock.now}
+
+
+def test_idle_facts_move_to_cold_tier_and_back(tiering):
+    """Testa o arquivamento após o TTL e o retorno à camada quente quando encontrado na fria"""
+    tiering, clock, metrics = tiering
+    hot = tiering.router.global_store
+    # Primeira varredura apenas marca os documentos existentes
+    assert tiering.sweep() == 0
+    clock.now += 5 * DAY
+    tiering.search("A Terra orbita o Sol", None, k=1)
+    clock.now += 5 * DAY
+
+    assert tiering.sweep() == 1
+    cold = tiering.router.shard(None, COLD)
+    assert [doc.id for doc in cold.get_by_ids(["agua", "terra", "lua"])] == ["agua"]
+    # Fatos pendentes nunca são arquivados
+    assert {doc.id for doc in hot.get_by_ids(["terra", "lua"])} == {"terra", "lua"}
+
+    docs = tiering.search("água", None, k=1, filter={"status": {"$ne": "pending"}})
+    assert [doc.id for doc in docs] == ["agua"]
+    assert hot.get_by_ids(["agua"]) and not cold.get_by_ids(["agua"])
+    assert metrics.get("cold_tier_fallbacks_total") == 1
+    assert metrics.get("facts_rewarmed_total") == 1
+
+
+def test_move_documents_between_chroma_collections(tmp_path):
+    """Testa a movimentação no Chroma reaproveitando os embeddings"""
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    embeddings = KeywordEmbeddings()
+    hot = Chroma(client=client, collection_name="fatos", embedding_function=embeddings)
+    cold = Chroma(client=client, collection_name="fatos-cold", embedding_function=embeddings)
+    hot.add_texts(["A Terra orbita o Sol", "A água ferve"], metadatas=[{"hit_count": 3}, {"type": "fact"}], ids=["a", "b"])
+
+    assert move_documents(hot, cold, ["a"]) == 1
+    assert hot._collection.count() == 1
+    moved = cold._collection.get(ids=["a"], include=["metadatas", "embeddings", "documents"])
+    assert moved["documents"] == ["A Terra orbita o Sol"] and moved["metadatas"] == [{"hit_count": 3}]
+    assert list(moved["embeddings"][0]) == pytest.approx(embeddings.embed_query("A Terra orbita o Sol"))
@@ -0,0 +1,58 @@
+import gzip
+import json
+from src.traffic import TrafficRecorder, anonymize, read_trace
+
+
+def test_anonymize_preserves_shape():
+    """Testa que a anonimização mantém tamanhos, pontuação e repetições, mas não as palavras"""
+    salt = b"sal"
+    text = "Qual é a capital do Brasil? A capital tem 3 milhões"
+    anonymized = anonymize(text, salt)
+    assert len(anonymized) == len(text)
+    assert anonymized.endswith("?") is False and "?" in anonymized
+    assert "capital" not in anonymized and "Brasil" not in anonymized
+    words = anonymized.split()
+    # "capital" aparece duas vezes e continua igual; números continuam números
+    assert words[3] == words[7]
+    assert words[9].isdigit()
+    assert anonymize(text, salt) == anonymized
+    assert anonymize(text, b"outro") != anonymized
+
+
+def test_recorder_writes_compact_trace(tmp_path):
+    """Testa a gravação e a leitura do trace comprimido"""
+    path = str(tmp_path / "trace-{pid}.jsonl.gz")
+    clock = iter([100.0, 101.5])
+    recorder = TrafficRecorder(path, salt="sal", clock=lambda: next(clock))
+    result = {"intent": "preference", "is_valid": False, "preferences": {"tom": "formal"},
+              "llm_seconds": {"process_input": 0.123456}, "error": None}
+    recorder.record(recorder.now(), 0.5, "Prefiro um tom formal", result, session_id="s1")
+    recorder.record(recorder.now(), 0.7, "Oi", {"intent": "feedback", "error": "falhou"}, session_id="s1")
+
+    # Legível antes do close (cada linha é descarregada)
+    entries = read_trace([recorder.path])
+    recorder.close()
+    assert [entry["t"] for entry in entries] == [100.0, 101.5]
+    first, second = entries
+    assert first["input"] != "Prefiro um tom formal"
+    assert first["llm"] == {"process_input": 0.1235}
+    assert first["preferences"] == {"tom": "formal"}
+    assert first["session"] == second["session"] != "s1"
+    assert second["error"] is True
+    with gzip.open(recorder.path, "rt") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_read_trace_merges_files(tmp_path):
+    """Testa a leitura de vários arquivos em ordem de chegada, ignorando linhas incompletas"""
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    first.write_text(json.dumps({"t": 3}) + "\n" + json.dumps({"t": 1}) + "\n")
+    second.write_text(json.dumps({"t": 2}) + "\n{\"t\": 4, \"inp")
+    assert [entry["t"] for entry in read_trace([str(first), str(second)])] == [1, 2, 3]
+
+
+def test_sampling(tmp_path):
+    """Testa que nenhuma mensagem é gravada com taxa de amostragem zero"""
+    recorder = TrafficRecorder(str(tmp_path / "trace.jsonl"), sample_rate=0.0)
+    assert not recorder.record(0.0, 0.1, "Oi", {})
+    assert not (tmp_path / "trace.jsonl").exists()
@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+import chromadb
+
+from src.vector_index import collection_metadata, index_params, rebuild_collection, set_ef_search
+
+
+def test_collection_metadata_rejects_unknown_distance():
+    """Testa a validação da métrica de distância"""
+    assert collection_metadata("cosine", 32, 200, 64)["hnsw:space"] == "cosine"
+    with pytest.raises(ValueError):
+        collection_metadata("manhattan", 16, 100, 100)
+
+
+def test_index_params_and_set_ef_search(tmp_path):
+    """Testa a leitura dos parâmetros do índice e a alteração do ef_search"""
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.create_collection(
+        "fatos", metadata=collection_metadata("cosine", 32, 200, 64), embedding_function=None
+    )
+    assert index_params(collection) == {"space": "cosine", "m": 32, "ef_construction": 200, "ef_search": 64}
+
+    set_ef_search(collection, 128)
+    assert index_params(client.get_collection("fatos"))["ef_search"] == 128
+
+
+def test_set_ef_search_skips_unchanged_value():
+    """Testa que o ef_search atual não gera alteração na coleção"""
+    collection = MagicMock()
+    collection.configuration_json = {"hnsw": {"ef_search": 100}}
+    set_ef_search(collection, 100)
+    collection.modify.assert_not_called()
+
+
+def test_rebuild_collection_keeps_documents_and_name(tmp_path):
+    """Testa a reconstrução do índice com novos parâmetros sem perder documentos"""
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.create_collection("fatos", embedding_function=None)
+    collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+        documents=["um", "dois", "três"],
+        metadatas=[{"type": "fact"}, {"type": "fact"}, {"type": "preference"}],
+    )
+
+    copied = rebuild_collection(client, "fatos", collection_metadata("ip", 8, 50, 20), batch_size=2)
+
+    assert copied == 3
+    rebuilt = client.get_collection("fatos")
+    assert index_params(rebuilt)["space"] == "ip"
+    data = rebuilt.get(include=["documents", "metadatas"])
+    assert sorted(data["documents"]) == ["dois", "três", "um"]
+    assert [c.name for c in client.list_collections()] == ["fatos"]
+
+
+def test_maintenance_lock_excludes_running_application(tmp_path):
+    """Testa que rebuild e vacuum não obtêm a trava enquanto a aplicação mantém o diretório aberto"""
+    from src.vector_index import lock_store
+    
+    application = lock_store(str(tmp_path))
+    other_worker = lock_store(str(tmp_path))
+    with pytest.raises(RuntimeError, match="em uso"):
+        lock_store(str(tmp_path), exclusive=True)
+    application.close()
+    other_worker.close()
+    
+    maintenance = lock_store(str(tmp_path), exclusive=True)
+    with pytest.raises(RuntimeError, match="Manutenção"):
+        lock_store(str(tmp_path))
+    maintenance.close()
+
+
+def test_startup_keeps_stored_ef_search_unless_configured(tmp_path):
+    """Testa que a inicialização só altera o ef_search da coleção quando ele é configurado"""
+    from src.chatbot import Chatbot
+    
+    store = MagicMock()
+    with patch("src.chatbot.Chroma", return_value=store), \
+         patch("src.chatbot.collection_metadata_from_settings"), \
+         patch("src.chatbot.chroma_client_settings"), \
+         patch("src.chatbot.set_ef_search") as mock_set, \
+         patch("src.chatbot.settings.VECTOR_STORE_BACKEND", "chroma"), \
+         patch("src.chatbot.settings.CHROMA_HNSW_EF_SEARCH", 0):
+        chatbot = Chatbot.__new__(Chatbot)
+        chatbot.embeddings = MagicMock()
+        chatbot.create_vector_store()
+        mock_set.assert_not_called()
+        with patch("src.chatbot.settings.CHROMA_HNSW_EF_SEARCH", 64):
+            chatbot.create_vector_store()
+        mock_set.assert_called_once_with(store._collection, 64)